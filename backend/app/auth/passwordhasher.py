@@ -1,11 +1,123 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
+from app.config import settings
+
+
+def _build_context(time_cost: int, memory_cost: int, parallelism: int) -> CryptContext:
+    """
+    Build the argon2 context. Hashes made with other cost parameters still
+    verify, and are reported as needing an update so login can rehash them.
+    """
+    return CryptContext(
+        schemes=["argon2"],
+        deprecated="auto",
+        argon2__rounds=time_cost,
+        argon2__min_desired_rounds=time_cost,
+        argon2__memory_cost=memory_cost,
+        argon2__parallelism=parallelism,
+    )
+
+
+# Context of the current pool worker process, set by _init_worker
+_worker_context: Optional[CryptContext] = None
+
+
+def _init_worker(time_cost: int, memory_cost: int, parallelism: int):
+    global _worker_context
+    _worker_context = _build_context(time_cost, memory_cost, parallelism)
+
+
+def _hash(password: str) -> str:
+    return _worker_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return _worker_context.verify_and_update(password, hashed)
+
+
 class PasswordHasher:
-    def __init__(self):
-        self.context = CryptContext(schemes=["argon2"], deprecated="auto")
+    """
+    Runs argon2 on a small dedicated process pool so a burst of logins can't
+    starve the event loop (and every search sharing it).
+
+    At most PASSWORD_HASH_MAX_PENDING operations may be queued or running;
+    beyond that callers get a 503 straight away instead of waiting.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.PASSWORD_HASH_WORKERS,
+        max_pending: int = settings.PASSWORD_HASH_MAX_PENDING,
+        time_cost: int = settings.ARGON2_TIME_COST,
+        memory_cost: int = settings.ARGON2_MEMORY_COST,
+        parallelism: int = settings.ARGON2_PARALLELISM,
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.params = (time_cost, memory_cost, parallelism)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Not forked from the API process: it already runs threads (torch,
+            # motor, redis) whose locks a forked child could inherit held, and
+            # holds sockets the workers have no business sharing
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(start_method),
+                initializer=_init_worker,
+                initargs=self.params,
+            )
+        return self._pool
+
+    async def _submit(self, fn, *args):
+        if self._pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication is busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_pool(), fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        valid, _ = await self.verify_and_update(password, hashed)
+        return valid
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password. When it matches but was hashed with outdated cost
+        parameters, also return a fresh hash for the caller to store.
+        """
+        return await self._submit(_verify_and_update, password, hashed)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
 
-    def hash(self, password: str) -> str:
-        return self.context.hash(password)
 
-    def verify(self, password: str, hashed: str) -> bool:
-        return self.context.verify(password, hashed)
+# Global instance
+password_hasher = PasswordHasher()
@@ -0,0 +1,91 @@
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from app.cache.tiered import TieredCache
+from app.config import settings
+from app.models.image import Image
+
+
+class MediaCache:
+    """
+    Read-through cache for Image metadata, built on the "media" TieredCache
+    namespace (in-process LRU in front of Redis).
+
+    Documents are cached as their JSON dump and rebuilt on every read, so
+    callers never share a mutable Image. Missing ids are cached as None for
+    a shorter TTL so repeated requests for deleted or bogus ids don't reach
+    the database.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = settings.MEDIA_CACHE_MAX_BYTES,
+        ttl: int = settings.MEDIA_CACHE_TTL,
+        local_ttl: int = settings.MEDIA_CACHE_LOCAL_TTL,
+        negative_ttl: int = settings.MEDIA_CACHE_NEGATIVE_TTL,
+    ):
+        self.negative_ttl = negative_ttl
+        self.cache = TieredCache(
+            "media",
+            ttl=ttl,
+            local_ttl=local_ttl,
+            local_max_bytes=max_bytes,
+        )
+
+    @staticmethod
+    def _to_image(data: Optional[dict]) -> Optional[Image]:
+        return Image.model_validate(data) if data is not None else None
+
+    async def get(
+        self,
+        media_id: str,
+        loader: Callable[[str], Awaitable[Optional[Image]]]
+    ) -> Optional[Image]:
+        """Return the image for media_id, loading and caching it on a miss."""
+        async def load():
+            image = await loader(media_id)
+            return image.model_dump(mode="json") if image is not None else None
+
+        data = await self.cache.get_or_load(media_id, load, negative_ttl=self.negative_ttl)
+        return self._to_image(data)
+
+    async def get_many(
+        self,
+        media_ids: Iterable[str],
+        loader: Callable[[List[str]], Awaitable[List[Image]]]
+    ) -> Dict[str, Image]:
+        """
+        Resolve many ids at once, loading all misses with a single loader call.
+        Ids that don't exist are negatively cached and left out of the result.
+        """
+        media_ids = list(dict.fromkeys(media_ids))
+        cached = await self.cache.get_many(media_ids)
+        pending = [media_id for media_id in media_ids if media_id not in cached]
+
+        if pending:
+            loaded = {
+                str(image.id): image.model_dump(mode="json")
+                for image in await loader(pending)
+            }
+            await self.cache.set_many(loaded)
+            await self.cache.set_many(
+                {media_id: None for media_id in pending if media_id not in loaded},
+                ttl=self.negative_ttl
+            )
+            cached.update(loaded)
+
+        return {
+            media_id: self._to_image(cached[media_id])
+            for media_id in media_ids
+            if cached.get(media_id) is not None
+        }
+
+    async def invalidate(self, media_id: str):
+        """Drop a cached entry after the document was created, changed or deleted."""
+        await self.cache.delete(media_id)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+# Global instance shared by every ImageRepository
+media_cache = MediaCache()
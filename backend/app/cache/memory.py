@@ -0,0 +1,81 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+# Rough per-entry overhead (dict slot, tuple, key object) counted against the byte budget
+ENTRY_OVERHEAD_BYTES = 128
+
+
+class MemoryTier:
+    """
+    In-process TTL + LRU store for serialized values.
+
+    Bounded both by entry count and by total bytes; the least recently used
+    entries are evicted first. Values are bytes, so callers never share
+    mutable objects through the cache.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (expires_at or None, value, size in bytes)
+        self._data: "OrderedDict[str, Tuple[Optional[float], bytes, int]]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            self.delete(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self.delete(key)
+        size = len(value) + len(key) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._data[key] = (expires_at, value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes or len(self._data) > self.max_entries:
+            _, (_, _, evicted_size) = self._data.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry[2]
+        return True
+
+    def incr(self, key: str) -> int:
+        """Increment an integer counter stored as ASCII bytes (no expiry)."""
+        current = self.get(key)
+        value = int(current) + 1 if current is not None else 1
+        self.set(key, str(value).encode("ascii"))
+        return value
+
+    def clear(self):
+        self._data.clear()
+        self._bytes = 0
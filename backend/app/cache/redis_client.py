@@ -1,13 +1,28 @@
 import redis.asyncio as aioredis
 from app.config import settings
-from typing import Optional
+from app.cache.memory import MemoryTier
+from typing import Dict, List, Optional
 import json
 
 class RedisClient:
-    """Async Redis client for caching and temporary data storage"""
+    """
+    Async Redis client for caching and temporary data storage.
+
+    The string API (get/set/delete/exists/mget) falls back to an in-process
+    store while Redis is unavailable, so features such as password reset
+    tokens keep working on a single worker. The *_raw API is binary and is
+    used by the tiered cache; it reports misses when Redis is down and lets
+    the cache's own memory tier take over.
+    """
 
     def __init__(self):
         self.redis: Optional[aioredis.Redis] = None
+        self.raw: Optional[aioredis.Redis] = None
+        self.fallback = MemoryTier()
+
+    @property
+    def available(self) -> bool:
+        return self.redis is not None
 
     async def connect(self):
         """Connect to Redis"""
@@ -19,21 +34,27 @@ class RedisClient:
             )
             # Test connection
             await self.redis.ping()
+            # Binary connection for serialized cache values
+            self.raw = await aioredis.from_url(settings.REDIS_URL, decode_responses=False)
             print("✅ Connected to Redis")
         except Exception as e:
             print(f"⚠️  Redis connection failed: {e}")
-            print("   Password reset tokens will use in-memory storage (not production-safe)")
+            print("   Falling back to per-process in-memory storage (not shared between workers, not production-safe)")
             self.redis = None
+            self.raw = None
 
     async def disconnect(self):
         """Disconnect from Redis"""
         if self.redis:
             await self.redis.close()
+        if self.raw:
+            await self.raw.close()
 
     async def set(self, key: str, value: str, expire: int = None):
         """Set a key-value pair with optional expiration in seconds"""
         if not self.redis:
-            return False
+            self.fallback.set(key, value.encode("utf-8"), ttl=expire)
+            return True
         try:
             if expire:
                 await self.redis.setex(key, expire, value)
@@ -47,17 +68,31 @@ class RedisClient:
     async def get(self, key: str) -> Optional[str]:
         """Get value by key"""
         if not self.redis:
-            return None
+            value = self.fallback.get(key)
+            return value.decode("utf-8") if value is not None else None
         try:
             return await self.redis.get(key)
         except Exception as e:
             print(f"Redis get error: {e}")
             return None
 
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        """Get several keys in one round trip"""
+        if not keys:
+            return []
+        if not self.redis:
+            return [await self.get(key) for key in keys]
+        try:
+            return await self.redis.mget(keys)
+        except Exception as e:
+            print(f"Redis mget error: {e}")
+            return [None] * len(keys)
+
     async def delete(self, key: str):
         """Delete a key"""
         if not self.redis:
-            return False
+            self.fallback.delete(key)
+            return True
         try:
             await self.redis.delete(key)
             return True
@@ -65,15 +100,77 @@ class RedisClient:
             print(f"Redis delete error: {e}")
             return False
 
+    async def eval(self, script: str, keys: List[str], args: list):
+        """Run a Lua script atomically; returns None when Redis is unavailable"""
+        if not self.redis:
+            return None
+        try:
+            return await self.redis.eval(script, len(keys), *keys, *args)
+        except Exception as e:
+            print(f"Redis eval error: {e}")
+            return None
+
     async def exists(self, key: str) -> bool:
         """Check if key exists"""
         if not self.redis:
-            return False
+            return self.fallback.get(key) is not None
         try:
             return await self.redis.exists(key) > 0
         except Exception as e:
             print(f"Redis exists error: {e}")
             return False
 
+    async def mget_raw(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Get several binary values in one round trip; all misses when Redis is down"""
+        if not self.raw or not keys:
+            return [None] * len(keys)
+        try:
+            return await self.raw.mget(keys)
+        except Exception as e:
+            print(f"Redis mget error: {e}")
+            return [None] * len(keys)
+
+    async def mset_raw(self, values: Dict[str, bytes], expire: int = None) -> bool:
+        """Set several binary values with a shared TTL using one pipelined round trip"""
+        if not self.raw or not values:
+            return False
+        try:
+            async with self.raw.pipeline(transaction=False) as pipe:
+                for key, value in values.items():
+                    if expire:
+                        pipe.setex(key, expire, value)
+                    else:
+                        pipe.set(key, value)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Redis mset error: {e}")
+            return False
+
+    async def delete_many(self, keys: List[str]) -> bool:
+        """Delete several keys in one command"""
+        if not keys:
+            return True
+        if not self.redis:
+            for key in keys:
+                self.fallback.delete(key)
+            return True
+        try:
+            await self.redis.delete(*keys)
+            return True
+        except Exception as e:
+            print(f"Redis delete error: {e}")
+            return False
+
+    async def incr(self, key: str) -> Optional[int]:
+        """Atomically increment an integer counter"""
+        if not self.redis:
+            return self.fallback.incr(key)
+        try:
+            return await self.redis.incr(key)
+        except Exception as e:
+            print(f"Redis incr error: {e}")
+            return None
+
 # Global instance
 redis_client = RedisClient()
@@ -0,0 +1,81 @@
+"""
+Cache of ranked, scope-filtered search results.
+
+Entries are keyed by the query plus every generation scope the result
+depends on: "public" for public media, "user:<id>" for a user's own media
+and "collection:<id>" for collection membership. Writes bump the affected
+scopes, so a cached result can never show media that has since been
+deleted, made private or removed from a collection.
+"""
+from typing import Iterable, List, Optional
+
+from app.cache.serializers import JSONSerializer, ZlibCompressed
+from app.cache.tiered import TieredCache
+from app.config import settings
+
+# Generation lookups always go to Redis, so a local entry is never served
+# after a bump; the in-process tier can keep entries for the full TTL.
+search_cache = TieredCache(
+    "search",
+    serializer=ZlibCompressed(JSONSerializer()),
+    ttl=settings.SEARCH_CACHE_TTL,
+    local_ttl=settings.SEARCH_CACHE_TTL,
+    local_max_bytes=settings.SEARCH_CACHE_MAX_BYTES,
+)
+
+
+def result_scopes(scope: str, user_id: str, collection_id: Optional[str] = None) -> List[str]:
+    """Generation scopes a search with these parameters depends on."""
+    scopes = []
+    if scope in ("public", "all"):
+        scopes.append("public")
+    if scope in ("private", "all"):
+        scopes.append(f"user:{user_id}")
+    if collection_id:
+        scopes.append(f"collection:{collection_id}")
+    return scopes
+
+
+async def invalidate_media(owner_id: Optional[str], visibilities: Iterable[str]):
+    """
+    Invalidate results that could contain a media item of this owner.
+
+    Args:
+        owner_id: Owner of the media item
+        visibilities: Every visibility the item had before or after the change
+    """
+    scopes = []
+    if owner_id:
+        scopes.append(f"user:{owner_id}")
+    if "public" in visibilities:
+        scopes.append("public")
+    await search_cache.bump(*scopes)
+
+
+async def invalidate_collection(collection_id: str):
+    """Invalidate results scoped to a collection after its membership changed."""
+    await search_cache.bump(f"collection:{collection_id}")
+
+
+# Ranked id lists of recent searches, addressed by queryId. Sessions never
+# change after creation, so the in-process tier can hold them for the full TTL.
+session_cache = TieredCache(
+    "search_session",
+    serializer=ZlibCompressed(JSONSerializer()),
+    ttl=settings.SEARCH_SESSION_TTL,
+    local_ttl=settings.SEARCH_SESSION_TTL,
+    local_max_bytes=settings.SEARCH_CACHE_MAX_BYTES,
+)
+
+
+# Text and uploaded-image query embeddings, keyed by model and input digest.
+# A key always maps to the same vector, so both tiers keep it for the full TTL.
+# Repeated queries skip inference, and so does storing the query vector with
+# a result session after the search.
+embedding_cache = TieredCache(
+    "query_embedding",
+    serializer=ZlibCompressed(JSONSerializer()),
+    ttl=settings.SEARCH_SESSION_TTL,
+    local_ttl=settings.SEARCH_SESSION_TTL,
+    local_max_bytes=settings.SEARCH_CACHE_MAX_BYTES,
+)
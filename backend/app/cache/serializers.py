@@ -0,0 +1,77 @@
+"""
+Binary serializers for cached values.
+
+Every serializer turns a value into bytes and back. Large payloads can be
+wrapped with ZlibCompressed; a one-byte header records whether the body
+was compressed so small values stay uncompressed.
+"""
+import json
+import pickle
+import zlib
+from typing import Any, Protocol
+
+import numpy as np
+
+
+class Serializer(Protocol):
+    def dumps(self, value: Any) -> bytes: ...
+
+    def loads(self, data: bytes) -> Any: ...
+
+
+class JSONSerializer:
+    """Compact UTF-8 JSON. Portable and safe for data shared across services."""
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":"), default=str).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class PickleSerializer:
+    """Pickle for trusted, internal-only values such as tuples of ids and scores."""
+
+    def dumps(self, value: Any) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data: bytes) -> Any:
+        return pickle.loads(data)
+
+
+class NumpySerializer:
+    """float32 vectors and matrices: a small JSON shape header followed by raw bytes."""
+
+    def dumps(self, value: Any) -> bytes:
+        array = np.ascontiguousarray(value, dtype=np.float32)
+        header = json.dumps(list(array.shape)).encode("ascii")
+        return len(header).to_bytes(2, "big") + header + array.tobytes()
+
+    def loads(self, data: bytes) -> Any:
+        header_len = int.from_bytes(data[:2], "big")
+        shape = tuple(json.loads(data[2:2 + header_len]))
+        return np.frombuffer(data[2 + header_len:], dtype=np.float32).reshape(shape)
+
+
+class ZlibCompressed:
+    """Compress the wrapped serializer's output when it is larger than `threshold` bytes."""
+
+    RAW = b"\x00"
+    ZLIB = b"\x01"
+
+    def __init__(self, inner: Serializer, threshold: int = 1024, level: int = 1):
+        self.inner = inner
+        self.threshold = threshold
+        self.level = level
+
+    def dumps(self, value: Any) -> bytes:
+        body = self.inner.dumps(value)
+        if len(body) > self.threshold:
+            return self.ZLIB + zlib.compress(body, self.level)
+        return self.RAW + body
+
+    def loads(self, data: bytes) -> Any:
+        body = data[1:]
+        if data[:1] == self.ZLIB:
+            body = zlib.decompress(body)
+        return self.inner.loads(body)
@@ -0,0 +1,69 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one execution.
+
+    The first caller for a key starts the function in its own task; every
+    caller, the first included, awaits that task and shares its result (or
+    exception). A caller that is cancelled only stops waiting, so one client
+    going away doesn't fail the others; the task is cancelled once nobody
+    waits for it any more. Nothing is kept once the call completes.
+
+    The task runs in the first caller's context, so it is bound by that
+    request's deadline. When it times out or is cancelled, that is the
+    first caller's failure: the others run the function again (coalesced
+    among themselves) instead of sharing it.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self.calls = 0
+        self.shared = 0
+        self.retried = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                self.calls += 1
+                flight = _Flight(asyncio.ensure_future(fn()))
+                self._inflight[key] = flight
+                flight.task.add_done_callback(lambda _, flight=flight: self._forget(key, flight))
+            else:
+                self.shared += 1
+
+            flight.waiters += 1
+            try:
+                return await asyncio.shield(flight.task)
+            except (asyncio.CancelledError, TimeoutError):
+                # Our own cancellation, or the deadline of the run we started
+                if leader or asyncio.current_task().cancelling():
+                    raise
+                self.retried += 1
+            finally:
+                flight.waiters -= 1
+                if not flight.waiters and not flight.task.done():
+                    flight.task.cancel()
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        total = self.calls + self.shared
+        return {
+            "calls": self.calls,
+            "shared": self.shared,
+            "retried": self.retried,
+            "dedup_ratio": round(self.shared / total, 4) if total else 0.0,
+        }
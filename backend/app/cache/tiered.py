@@ -0,0 +1,224 @@
+"""
+Two-tier cache: a bounded in-process TTL/LRU tier in front of Redis.
+
+Each TieredCache owns a namespace. Keys are stored as "<namespace>:<key>",
+values go through the namespace's serializer, and hit/miss/latency counters
+are kept per namespace. Invalidation is either explicit (delete) or by
+generation: a key built with `scoped_key(..., scopes=[...])` embeds the
+current generation of each scope, so bumping a scope makes every entry
+derived from it unreachable without having to find and delete them.
+"""
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from app.cache.memory import MemoryTier
+from app.cache.redis_client import redis_client
+from app.cache.serializers import JSONSerializer, Serializer
+from app.cache.singleflight import SingleFlight
+
+# Returned by get() when a key is not cached (None is a valid cached value)
+MISS = object()
+
+# Every TieredCache registers itself here so stats can be reported together
+_registry: Dict[str, "TieredCache"] = {}
+
+
+class TieredCache:
+    def __init__(
+        self,
+        namespace: str,
+        serializer: Serializer = None,
+        ttl: int = 300,
+        local_ttl: Optional[int] = 30,
+        local_max_entries: int = 10000,
+        local_max_bytes: int = 32 * 1024 * 1024,
+        use_redis: bool = True,
+    ):
+        """
+        Args:
+            namespace: Key prefix and stats label
+            serializer: Value serializer (JSON by default)
+            ttl: Default TTL in seconds for Redis entries
+            local_ttl: Upper bound on how long the in-process tier keeps an
+                entry. Other workers only invalidate Redis, so keep it short.
+                None or 0 disables the in-process tier.
+            local_max_entries / local_max_bytes: In-process memory budget
+            use_redis: Set False for worker-local caches
+        """
+        self.namespace = namespace
+        self.serializer = serializer or JSONSerializer()
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.local = MemoryTier(local_max_entries, local_max_bytes) if local_ttl else None
+        self.use_redis = use_redis
+        self._flight = SingleFlight()
+        self._stats = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "deletes": 0,
+            "loads": 0,
+            "load_ms": 0.0,
+            "redis_calls": 0,
+            "redis_ms": 0.0,
+        }
+        _registry[namespace] = self
+
+    # -- keys -------------------------------------------------------------
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _generation_key(self, scope: str) -> str:
+        return f"{self.namespace}:gen:{scope}"
+
+    async def generations(self, scopes: Iterable[str]) -> Dict[str, int]:
+        """Current generation of each scope (0 if never bumped)."""
+        scopes = list(scopes)
+        values = await redis_client.mget([self._generation_key(s) for s in scopes])
+        return {scope: int(value or 0) for scope, value in zip(scopes, values)}
+
+    async def bump(self, *scopes: str):
+        """Invalidate every entry built from any of the given scopes."""
+        for scope in scopes:
+            await redis_client.incr(self._generation_key(scope))
+
+    async def scoped_key(self, key: str, scopes: Iterable[str]) -> str:
+        """Append the current generation of each scope to `key`."""
+        generations = await self.generations(scopes)
+        suffix = ",".join(f"{scope}={gen}" for scope, gen in sorted(generations.items()))
+        return f"{key}|{suffix}"
+
+    # -- reads ------------------------------------------------------------
+
+    def _local_ttl(self, ttl: int) -> int:
+        return min(ttl, self.local_ttl)
+
+    async def _redis_mget(self, full_keys: List[str]) -> List[Optional[bytes]]:
+        if not self.use_redis or not redis_client.available:
+            return [None] * len(full_keys)
+        started = time.perf_counter()
+        values = await redis_client.mget_raw(full_keys)
+        self._stats["redis_calls"] += 1
+        self._stats["redis_ms"] += (time.perf_counter() - started) * 1000
+        return values
+
+    async def get(self, key: str) -> Any:
+        """Return the cached value for key, or MISS."""
+        return (await self.get_many([key])).get(key, MISS)
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return {key: value} for the keys that are cached; checks Redis once for all local misses."""
+        found: Dict[str, bytes] = {}
+        pending: List[str] = []
+        for key in dict.fromkeys(keys):
+            data = self.local.get(self._key(key)) if self.local is not None else None
+            if data is None:
+                pending.append(key)
+            else:
+                self._stats["local_hits"] += 1
+                found[key] = data
+
+        if pending:
+            values = await self._redis_mget([self._key(key) for key in pending])
+            for key, data in zip(pending, values):
+                if data is None:
+                    self._stats["misses"] += 1
+                    continue
+                self._stats["redis_hits"] += 1
+                found[key] = data
+                if self.local is not None:
+                    self.local.set(self._key(key), data, ttl=self.local_ttl)
+
+        return {key: self.serializer.loads(data) for key, data in found.items()}
+
+    # -- writes -----------------------------------------------------------
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        await self.set_many({key: value}, ttl=ttl)
+
+    async def set_many(self, values: Dict[str, Any], ttl: Optional[int] = None):
+        """Store several values with a shared TTL (one pipelined Redis round trip)."""
+        if not values:
+            return
+        ttl = ttl or self.ttl
+        encoded = {self._key(key): self.serializer.dumps(value) for key, value in values.items()}
+        self._stats["sets"] += len(encoded)
+        if self.local is not None:
+            for full_key, data in encoded.items():
+                self.local.set(full_key, data, ttl=self._local_ttl(ttl))
+        if self.use_redis and redis_client.available:
+            started = time.perf_counter()
+            await redis_client.mset_raw(encoded, expire=ttl)
+            self._stats["redis_calls"] += 1
+            self._stats["redis_ms"] += (time.perf_counter() - started) * 1000
+
+    async def delete(self, *keys: str):
+        full_keys = [self._key(key) for key in keys]
+        self._stats["deletes"] += len(full_keys)
+        if self.local is not None:
+            for full_key in full_keys:
+                self.local.delete(full_key)
+        if self.use_redis and redis_client.available:
+            await redis_client.delete_many(full_keys)
+
+    # -- read-through -----------------------------------------------------
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        negative_ttl: Optional[int] = None,
+    ) -> Any:
+        """
+        Return the cached value, or run `loader` and cache its result.
+
+        Concurrent misses for the same key in this process share a single
+        loader call (stampede protection). A None result is cached with
+        `negative_ttl` when given, otherwise not at all.
+        """
+        value = await self.get(key)
+        if value is not MISS:
+            return value
+
+        async def load():
+            started = time.perf_counter()
+            result = await loader()
+            self._stats["loads"] += 1
+            self._stats["load_ms"] += (time.perf_counter() - started) * 1000
+            if result is not None:
+                await self.set(key, result, ttl=ttl)
+            elif negative_ttl:
+                await self.set(key, None, ttl=negative_ttl)
+            return result
+
+        return await self._flight.do(key, load)
+
+    # -- stats ------------------------------------------------------------
+
+    def stats(self) -> dict:
+        s = self._stats
+        hits = s["local_hits"] + s["redis_hits"]
+        lookups = hits + s["misses"]
+        return {
+            "local_hits": s["local_hits"],
+            "redis_hits": s["redis_hits"],
+            "misses": s["misses"],
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "sets": s["sets"],
+            "deletes": s["deletes"],
+            "loads": s["loads"],
+            "avg_load_ms": round(s["load_ms"] / s["loads"], 2) if s["loads"] else 0.0,
+            "avg_redis_ms": round(s["redis_ms"] / s["redis_calls"], 2) if s["redis_calls"] else 0.0,
+            "stampede_shared": self._flight.shared,
+            "local_entries": len(self.local) if self.local is not None else 0,
+            "local_bytes": self.local.size_bytes if self.local is not None else 0,
+            "local_evictions": self.local.evictions if self.local is not None else 0,
+        }
+
+
+def cache_stats() -> Dict[str, dict]:
+    """Stats of every namespace, keyed by namespace."""
+    return {namespace: cache.stats() for namespace, cache in _registry.items()}
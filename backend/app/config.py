@@ -25,6 +25,40 @@ class Settings:
     ELASTICSEARCH_INDEX: str = os.getenv("ELASTICSEARCH_INDEX", "media_embeddings")
     ELASTICSEARCH_USER: str = os.getenv("ELASTICSEARCH_USER", "elastic")
     ELASTICSEARCH_PASSWORD: str = os.getenv("ELASTICSEARCH_PASSWORD", "changeme")
+    ES_VERIFY_CERTS: bool = os.getenv("ES_VERIFY_CERTS", "false").lower() == "true"  # off for self-signed certs
+    ES_CONNECTIONS_PER_NODE: int = int(os.getenv("ES_CONNECTIONS_PER_NODE", "25"))  # pool size per worker and node
+    ES_REQUEST_TIMEOUT: float = float(os.getenv("ES_REQUEST_TIMEOUT", "10"))  # seconds
+    ES_MAX_RETRIES: int = int(os.getenv("ES_MAX_RETRIES", "2"))
+    ES_RETRY_ON_TIMEOUT: bool = os.getenv("ES_RETRY_ON_TIMEOUT", "true").lower() == "true"
+    ES_HTTP_COMPRESS: bool = os.getenv("ES_HTTP_COMPRESS", "true").lower() == "true"  # gzip request bodies
+    # Send a duplicate search to another shard copy when the first is slower than this percentile
+    ES_HEDGE_SEARCHES: bool = os.getenv("ES_HEDGE_SEARCHES", "false").lower() == "true"
+    ES_HEDGE_PERCENTILE: float = float(os.getenv("ES_HEDGE_PERCENTILE", "0.95"))
+    ES_HEDGE_MIN_DELAY_MS: int = int(os.getenv("ES_HEDGE_MIN_DELAY_MS", "20"))
+    # Vector index: hnsw (float32), int8_hnsw, int4_hnsw or bbq_hnsw (quantized, rescored)
+    ES_VECTOR_INDEX_TYPE: str = os.getenv("ES_VECTOR_INDEX_TYPE", "int8_hnsw")
+    ES_VECTOR_OVERSAMPLE: float = float(os.getenv("ES_VECTOR_OVERSAMPLE", "3.0"))  # 0 = no rescoring
+    ES_HNSW_M: int = int(os.getenv("ES_HNSW_M", "16"))
+    ES_HNSW_EF_CONSTRUCTION: int = int(os.getenv("ES_HNSW_EF_CONSTRUCTION", "100"))
+    ES_VECTOR_SEARCH: str = os.getenv("ES_VECTOR_SEARCH", "knn")  # knn, or exact (script_score)
+    # Two-stage retrieval: kNN on a PCA-reduced vector (scripts/fit_pca.py), rescored on the full one
+    SEARCH_PCA_DIMS: int = int(os.getenv("SEARCH_PCA_DIMS", "0"))  # 0 = off; applies to new index versions
+    SEARCH_PCA_OVERSAMPLE: float = float(os.getenv("SEARCH_PCA_OVERSAMPLE", "4.0"))  # candidates per result
+    # Time partitions: new index versions keep one index per period of upload time (scripts/compact_partitions.py)
+    ES_INDEX_PARTITIONS: str = os.getenv("ES_INDEX_PARTITIONS", "")  # "", month or year; applies to new index versions
+    ES_SEARCH_RECENT_PARTITIONS: int = int(os.getenv("ES_SEARCH_RECENT_PARTITIONS", "0"))  # 0 = search all partitions
+    # Owner routing: new index versions keep each user's images on one shard, for private-scope searches
+    ES_ROUTE_BY_OWNER: bool = os.getenv("ES_ROUTE_BY_OWNER", "false").lower() == "true"
+    ES_INDEX_SHARDS: int = int(os.getenv("ES_INDEX_SHARDS", "0"))  # 0 = cluster default; applies to new index versions
+    ES_ROUTING_PARTITION_SIZE: int = int(os.getenv("ES_ROUTING_PARTITION_SIZE", "1"))  # shards per owner, < ES_INDEX_SHARDS
+
+    # Vector Store Configuration
+    # "elasticsearch", or "local" for memory-mapped files (no cluster; tests, edge, ES outages)
+    VECTOR_STORE: str = os.getenv("VECTOR_STORE", "elasticsearch")
+    LOCAL_VECTOR_STORE_PATH: str = os.getenv("LOCAL_VECTOR_STORE_PATH", "./data/vectors")
+    LOCAL_VECTOR_STORE_BLOCK_ROWS: int = int(os.getenv("LOCAL_VECTOR_STORE_BLOCK_ROWS", "65536"))  # rows per matrix product
+    LOCAL_VECTOR_STORE_IVF_LISTS: int = int(os.getenv("LOCAL_VECTOR_STORE_IVF_LISTS", "0"))  # 0 = exact search only
+    LOCAL_VECTOR_STORE_NPROBE: int = int(os.getenv("LOCAL_VECTOR_STORE_NPROBE", "8"))  # IVF partitions scanned per query
 
     # AI Model Configuration - CLIP Models
     # CLIP_VIT_BASE_PATCH32: str = 'openai/clip-vit-base-patch32'
@@ -55,7 +89,57 @@ class Settings:
 
     # Search Configuration
     DEFAULT_TOP_K: int = int(os.getenv("DEFAULT_TOP_K", "10"))
+    # Minimum similarityScore ((1 + cosine) / 2) for search hits. 0.5 (cosine >= 0)
+    # only drops hits pointing away from the query, so results are what they were
+    # before the cutoff existed. CLIP text-to-image matches typically score 0.6-0.68
+    # (cosine 0.2-0.35) and near-duplicate images above 0.9; raise it to trim tails.
     DEFAULT_SIMILARITY_THRESHOLD: float = float(os.getenv("DEFAULT_SIMILARITY_THRESHOLD", "0.5"))
+    SEARCH_BATCH_MAX_QUERIES: int = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "32"))
+    # Text search retrieval: "vector" (CLIP only), "rrf" or "linear" (hybrid with BM25)
+    SEARCH_RETRIEVAL_MODE: str = os.getenv("SEARCH_RETRIEVAL_MODE", "vector")
+    HYBRID_VECTOR_WEIGHT: float = float(os.getenv("HYBRID_VECTOR_WEIGHT", "0.7"))  # linear mode only
+
+    # Precomputed "similar items" lists (scripts/compute_neighbors.py)
+    NEIGHBORS_TOP_K: int = int(os.getenv("NEIGHBORS_TOP_K", "200"))
+    NEIGHBORS_MAX_AGE: int = int(os.getenv("NEIGHBORS_MAX_AGE", "604800"))  # seconds, 7 days
+    NEIGHBORS_BATCH_SIZE: int = int(os.getenv("NEIGHBORS_BATCH_SIZE", "50"))  # queries per _msearch
+
+    # Search Result Cache Configuration
+    SEARCH_CACHE_TTL: int = int(os.getenv("SEARCH_CACHE_TTL", "300"))  # seconds
+    SEARCH_CACHE_MAX_BYTES: int = int(os.getenv("SEARCH_CACHE_MAX_BYTES", "67108864"))  # 64MB per worker
+    SEARCH_SESSION_TTL: int = int(os.getenv("SEARCH_SESSION_TTL", "900"))  # seconds a queryId stays valid
+    SEARCH_PIT_KEEP_ALIVE: str = os.getenv("SEARCH_PIT_KEEP_ALIVE", "5m")  # ES point in time kept between cursor pages
+
+    # Exact in-memory search for a collection or a private library up to this many items
+    SCOPED_SEARCH_MAX_SIZE: int = int(os.getenv("SCOPED_SEARCH_MAX_SIZE", "5000"))
+    SCOPED_SEARCH_CACHE_TTL: int = int(os.getenv("SCOPED_SEARCH_CACHE_TTL", "3600"))  # seconds
+    SCOPED_SEARCH_CACHE_MAX_BYTES: int = int(os.getenv("SCOPED_SEARCH_CACHE_MAX_BYTES", "134217728"))  # 128MB per worker
+
+    # Admission Control Configuration (per endpoint class)
+    ADMISSION_SEARCH_CONCURRENCY: int = int(os.getenv("ADMISSION_SEARCH_CONCURRENCY", "4"))
+    ADMISSION_SEARCH_QUEUE: int = int(os.getenv("ADMISSION_SEARCH_QUEUE", "16"))
+    ADMISSION_SEARCH_DEADLINE_MS: int = int(os.getenv("ADMISSION_SEARCH_DEADLINE_MS", "5000"))
+    ADMISSION_UPLOAD_CONCURRENCY: int = int(os.getenv("ADMISSION_UPLOAD_CONCURRENCY", "2"))
+    ADMISSION_UPLOAD_QUEUE: int = int(os.getenv("ADMISSION_UPLOAD_QUEUE", "8"))
+    ADMISSION_UPLOAD_DEADLINE_MS: int = int(os.getenv("ADMISSION_UPLOAD_DEADLINE_MS", "30000"))
+    ADMISSION_RETRY_AFTER: int = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))  # seconds
+
+    # Circuit breakers around Elasticsearch, MongoDB and the storage provider
+    CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))  # consecutive failures
+    CIRCUIT_RESET_SECONDS: float = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))  # open before a trial call
+    MONGO_CALL_TIMEOUT: float = float(os.getenv("MONGO_CALL_TIMEOUT", "5"))  # seconds, capped by the request deadline
+    STORAGE_CALL_TIMEOUT: float = float(os.getenv("STORAGE_CALL_TIMEOUT", "30"))  # seconds, capped by the request deadline
+    RATE_LIMIT_RATE: float = float(os.getenv("RATE_LIMIT_RATE", "2"))  # requests/s per user, 0 disables
+    RATE_LIMIT_BURST: int = int(os.getenv("RATE_LIMIT_BURST", "10"))
+
+    # Media Listing Configuration
+    MEDIA_COUNT_CACHE_TTL: int = int(os.getenv("MEDIA_COUNT_CACHE_TTL", "30"))  # seconds
+
+    # Media Metadata Cache Configuration
+    MEDIA_CACHE_MAX_BYTES: int = int(os.getenv("MEDIA_CACHE_MAX_BYTES", "33554432"))  # 32MB per worker
+    MEDIA_CACHE_TTL: int = int(os.getenv("MEDIA_CACHE_TTL", "300"))  # seconds, Redis tier
+    MEDIA_CACHE_LOCAL_TTL: int = int(os.getenv("MEDIA_CACHE_LOCAL_TTL", "30"))  # seconds, in-process tier
+    MEDIA_CACHE_NEGATIVE_TTL: int = int(os.getenv("MEDIA_CACHE_NEGATIVE_TTL", "30"))  # seconds, missing ids
 
     # JWT Authentication Configuration
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "")
@@ -63,6 +147,14 @@ class Settings:
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
     REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
 
+    # Password Hashing Configuration (argon2 runs on a dedicated process pool)
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+    # Defaults are passlib's, which every existing hash was made with, so login doesn't rehash them
+    ARGON2_TIME_COST: int = int(os.getenv("ARGON2_TIME_COST", "3"))
+    ARGON2_MEMORY_COST: int = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+    ARGON2_PARALLELISM: int = int(os.getenv("ARGON2_PARALLELISM", "4"))
+
     # User Storage Configuration
     DEFAULT_USER_QUOTA_GB: int = int(os.getenv("DEFAULT_USER_QUOTA_GB", "1"))
 
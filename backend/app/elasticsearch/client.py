@@ -1,94 +1,984 @@
+import math
 import os
-from elasticsearch import AsyncElasticsearch
-from typing import List
+import re
+import time
+import uuid
+from elasticsearch import ApiError, AsyncElasticsearch, NotFoundError
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.util.partitions import check_scheme, partition_of, recent_partitions
+from app.util.pca import PCAProjection
+from app.util.resilience import LatencyWindow, breaker, call_timeout, hedged, mark_partial
+from app.vectorstore.store import PageExpired
+
+# Lexical fields searched by BM25 in hybrid retrieval; tags are matched
+# exactly (keyword) and by words (text)
+TEXT_FIELDS = {
+    "title": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
+    "description": {"type": "text"},
+    "tags": {"type": "keyword", "fields": {"text": {"type": "text"}}},
+}
+LEXICAL_FIELDS = ["title^2", "description", "tags^3", "tags.text^2"]
+
+RETRIEVAL_MODES = ("vector", "rrf", "linear")
+
+# HNSW graph over float32, int8, int4 or 1-bit (BBQ) quantized vectors. The
+# quantized types keep the float vectors on disk to rescore candidates.
+VECTOR_INDEX_TYPES = ("hnsw", "int8_hnsw", "int4_hnsw", "bbq_hnsw")
+# knn: approximate search on the HNSW graph; exact: script_score over every vector
+VECTOR_SEARCH_METHODS = ("knn", "exact")
+# Elasticsearch's upper limit for kNN num_candidates
+MAX_NUM_CANDIDATES = 10000
+# Indexed PCA-reduced copy of the embedding in two-stage indices
+SHORT_FIELD = "embedding_short"
+
+
+def _unhealthy(e: BaseException) -> bool:
+    """Whether an error counts against the breaker; rejected requests (bad query, unknown PIT) don't."""
+    return not (isinstance(e, ApiError) and 400 <= e.meta.status < 500 and e.meta.status != 429)
+
 
 class ESClient:
     def __init__(self):
-        es_url = os.getenv("ELASTICSEARCH_URL", "https://localhost:9200")
-        es_user = os.getenv("ELASTICSEARCH_USER", "elastic")
-        es_pass = os.getenv("ELASTICSEARCH_PASSWORD", "dm_4Moz_XGVWIRHG910C")
-
+        # One connection pool per node; the API shares a single ESClient
+        # (see get_vector_store) and closes it on shutdown
+        self.connections_per_node = settings.ES_CONNECTIONS_PER_NODE
         self.es = AsyncElasticsearch(
-            es_url,
-            basic_auth=(es_user, es_pass),
-            verify_certs=False  # optional if you're using self-signed certs
+            settings.ELASTICSEARCH_URL,
+            basic_auth=(settings.ELASTICSEARCH_USER, settings.ELASTICSEARCH_PASSWORD),
+            verify_certs=settings.ES_VERIFY_CERTS,
+            connections_per_node=self.connections_per_node,
+            request_timeout=settings.ES_REQUEST_TIMEOUT,
+            max_retries=settings.ES_MAX_RETRIES,
+            retry_on_timeout=settings.ES_RETRY_ON_TIMEOUT,
+            # Vector queries and bulk bodies are large and compress well
+            http_compress=settings.ES_HTTP_COMPRESS
         )
 
-        self.index_name = os.getenv("ELASTICSEARCH_INDEX", "media_embeddings")
+        # Read alias over versioned indices (<alias>_v1, <alias>_v2, ...);
+        # create_index() pins index_name to the version matching our model
+        self.alias = os.getenv("ELASTICSEARCH_INDEX", "media_embeddings")
+        self.index_name = self.alias
+        self.model = os.getenv("DEFAULT_CLIP_MODEL", "openai/clip-vit-base-patch32")
         # Get embedding dimension from env, default to 512 for clip-vit-base-patch32
         self.embedding_dims = int(os.getenv("EMBEDDING_DIMS", "512"))
 
-    async def create_index(self):
+        self.index_type = os.getenv("ES_VECTOR_INDEX_TYPE", "int8_hnsw")
+        self.oversample = float(os.getenv("ES_VECTOR_OVERSAMPLE", "3.0"))
+        self.hnsw_m = int(os.getenv("ES_HNSW_M", "16"))
+        self.hnsw_ef_construction = int(os.getenv("ES_HNSW_EF_CONSTRUCTION", "100"))
+        self.search_method = os.getenv("ES_VECTOR_SEARCH", "knn")
+
+        # Two-stage retrieval: new versions index a PCA-reduced vector of
+        # SEARCH_PCA_DIMS (0 = off) and keep the full one unindexed
+        self.pca_dims = int(os.getenv("SEARCH_PCA_DIMS", "0"))
+        self.pca_oversample = float(os.getenv("SEARCH_PCA_OVERSAMPLE", "4.0"))
+        # Projection of the index in use, set by use_index()
+        self.projection: Optional[PCAProjection] = None
+
+        # Time partitioning: new versions keep documents in one index per
+        # ES_INDEX_PARTITIONS period ("month" or "year", empty = off) by upload
+        # time; ES_SEARCH_RECENT_PARTITIONS > 0 searches only the newest ones
+        self.partition_scheme = settings.ES_INDEX_PARTITIONS
+        self.recent_partitions = settings.ES_SEARCH_RECENT_PARTITIONS
+        # Layout of the index in use, set by use_index()
+        self.partition_by: Optional[str] = None
+        self._partitions: set = set()  # partitions known to exist
+
+        # Owner routing: new versions store each document on the shard of its
+        # owner (routing=owner_id) when ES_ROUTE_BY_OWNER is set, so a search
+        # of one user's images reads one shard (ES_ROUTING_PARTITION_SIZE
+        # shards, to spread large owners); public searches still read all
+        self.route_by_owner = settings.ES_ROUTE_BY_OWNER
+        self.shards = settings.ES_INDEX_SHARDS
+        self.routing_partition_size = settings.ES_ROUTING_PARTITION_SIZE
+        # Whether the index in use is owner-routed, set by use_index()
+        self.routed = False
+
+        # How long a deep-pagination point in time stays open between pages
+        self.pit_keep_alive = os.getenv("SEARCH_PIT_KEEP_ALIVE", "5m")
+
+        # Searches run through a breaker, within the request's deadline, and
+        # are duplicated to another shard copy when slower than the recent p95
+        self.breaker = breaker("elasticsearch", _unhealthy)
+        self.hedge = settings.ES_HEDGE_SEARCHES
+        self.search_latency = LatencyWindow()
+
+    def _index_options(self, index_type: Optional[str] = None, oversample: Optional[float] = None) -> dict:
+        index_type = index_type or self.index_type
+        oversample = self.oversample if oversample is None else oversample
+        if index_type not in VECTOR_INDEX_TYPES:
+            raise ValueError(f"ES_VECTOR_INDEX_TYPE must be one of {', '.join(VECTOR_INDEX_TYPES)}, got {index_type!r}")
+        options = {"type": index_type, "m": self.hnsw_m, "ef_construction": self.hnsw_ef_construction}
+        if index_type != "hnsw" and oversample:
+            # Quantized candidates are rescored on the float vectors
+            options["rescore_vector"] = {"oversample": oversample}
+        return options
+
+    def _embedding_mapping(self, dims: int, index_type: Optional[str] = None, oversample: Optional[float] = None) -> dict:
+        return {
+            "type": "dense_vector",
+            "dims": dims,
+            "index": True,
+            "similarity": "cosine",
+            "index_options": self._index_options(index_type, oversample)
+        }
+
+    def _mapping(
+        self,
+        model: str,
+        dims: int,
+        index_type: Optional[str] = None,
+        oversample: Optional[float] = None,
+        projection: Optional[PCAProjection] = None,
+        routed: bool = False
+    ) -> dict:
+        if projection is None:
+            vectors = {"embedding": self._embedding_mapping(dims, index_type, oversample)}
+            # Which model filled the index; read back by index_versions()
+            meta = {"model": model, "dims": dims}
+        else:
+            # Only the short vector gets a graph; the full one is read to rescore
+            vectors = {
+                "embedding": {"type": "dense_vector", "dims": dims, "index": False},
+                SHORT_FIELD: self._embedding_mapping(projection.dims, index_type, oversample),
+            }
+            meta = {"model": model, "dims": dims, "pca_dims": projection.dims, "pca": projection.fingerprint}
         mapping = {
-            "mappings": {
-                "properties": {
-                    "image_id": {"type": "keyword"},
-                    "embedding": {"type": "dense_vector", "dims": self.embedding_dims}
-                }
+            "_meta": meta,
+            "properties": {
+                "image_id": {"type": "keyword"},
+                **vectors,
+                **TEXT_FIELDS
             }
         }
+        if routed:
+            # Every write and lookup must say which shard; owner_id also filters owned searches
+            meta["routing"] = "owner_id"
+            mapping["_routing"] = {"required": True}
+            mapping["properties"]["owner_id"] = {"type": "keyword"}
+        return mapping
+
+    async def index_versions(self) -> Dict[str, dict]:
+        """
+        Every index behind the alias, plus a pre-versioning index named like
+        the alias: {name: {"model", "dims", "live", "backfill_after",
+        "partitions", ...}}. The model of a pre-versioning index is unknown
+        (None) until create_index() records it. Time partitions (<name>-<period>) are listed under their
+        version, not as versions of their own.
+        """
+        indices = await self.es.indices.get(
+            index=f"{self.alias},{self.alias}_v*", allow_no_indices=True, ignore_unavailable=True
+        )
+        is_partition = re.compile(rf"^{re.escape(self.alias)}_v\d+-")
+        partitions: Dict[str, List[str]] = {}
+        versions = {}
+        for name, index in indices.items():
+            if is_partition.match(name):
+                partitions.setdefault(name.rsplit("-", 1)[0], []).append(name)
+                continue
+            mappings = index.get("mappings", {})
+            meta = mappings.get("_meta", {})
+            properties = mappings.get("properties", {})
+            indexed = properties.get(SHORT_FIELD if meta.get("pca") else "embedding", {})
+            versions[name] = {
+                "model": meta.get("model"),
+                "dims": properties.get("embedding", {}).get("dims"),
+                "index_options": indexed.get("index_options"),
+                "pca_dims": meta.get("pca_dims"),
+                "pca": meta.get("pca"),
+                "live": name == self.alias or self.alias in index.get("aliases", {}),
+                "backfill_after": meta.get("backfill_after"),
+                "partition_by": meta.get("partition_by"),
+                "routing": meta.get("routing"),
+                "meta": meta,
+            }
+        for name, version in versions.items():
+            version["partitions"] = sorted(partitions.get(name, []))
+        return versions
+
+    def _serves(self, version: dict, model: str, dims: int) -> bool:
+        return version["dims"] == dims and version["model"] == model
+
+    async def _stamp_legacy(self, versions: Dict[str, dict]):
+        """
+        Record the configured model in the _meta of a pre-versioning index
+        whose dims agree. It was filled by the model configured before
+        versioning, which is the one the first upgraded process still runs;
+        once stamped, only that exact model is served from it.
+        """
+        for name, version in versions.items():
+            if version["model"] is not None or version["dims"] != self.embedding_dims:
+                continue
+            meta = {**version["meta"], "model": self.model, "dims": self.embedding_dims}
+            # _meta is replaced as a whole
+            await self.es.indices.put_mapping(index=name, meta=meta)
+            version.update(model=self.model, meta=meta)
+            print(f"📝 Recorded {self.model} as the model of pre-versioning index {name}")
+
+    def use_index(self, name: str, version: dict) -> bool:
+        """
+        Read and write `name` from now on. For a two-stage index this loads
+        the PCA projection it was built with; if that fit is missing, search
+        falls back to exact script_score over the full vectors. Returns
+        whether two-stage retrieval is active.
+        """
+        self.index_name = name
+        self.partition_by = version.get("partition_by")
+        self._partitions = set(version.get("partitions", []))
+        self.routed = bool(version.get("routing"))
+        self.projection = None
+        if not version.get("pca"):
+            return False
+        path = PCAProjection.path_for(version["model"] or self.model, version["pca_dims"])
         try:
-            if not await self.es.indices.exists(index=self.index_name):
-                print(f"📝 Creating Elasticsearch index: {self.index_name}")
-                await self.es.indices.create(index=self.index_name, body=mapping)
-                print(f"✅ Index created with {self.embedding_dims} dims")
+            projection = PCAProjection.load(path)
+        except FileNotFoundError:
+            projection = None
+        if projection is None or projection.fingerprint != version["pca"]:
+            print(f"⚠️  {name} was built with PCA fit {version['pca']}, which is missing from {path} "
+                  f"or was refitted; searching it exactly instead")
+            self.search_method = "exact"
+            return False
+        self.projection = projection
+        return True
+
+    def _new_projection(self, model: str) -> Optional[PCAProjection]:
+        if not self.pca_dims:
+            return None
+        path = PCAProjection.path_for(model, self.pca_dims)
+        try:
+            return PCAProjection.load(path)
+        except FileNotFoundError:
+            raise ValueError(f"SEARCH_PCA_DIMS={self.pca_dims} but {path} is missing; run scripts/fit_pca.py")
+
+    def builds(self, version: dict, model: str, dims: int) -> bool:
+        """Whether `version` has the layout a new version would get (model, dims, PCA fit, partitions, routing)."""
+        projection = self._new_projection(model)
+        return (
+            version["model"] == model
+            and version["dims"] == dims
+            and version["pca"] == (projection.fingerprint if projection else None)
+            and version["partition_by"] == (self.partition_scheme or None)
+            and bool(version["routing"]) == self.route_by_owner
+        )
+
+    async def create_version(self, model: str, dims: int) -> str:
+        """
+        Create the next <alias>_vN index for model/dims, two-stage when
+        SEARCH_PCA_DIMS is set, partitioned by ES_INDEX_PARTITIONS and
+        owner-routed with ES_ROUTE_BY_OWNER; it is not live until
+        swap_alias(). Partitions are created on first write.
+        """
+        numbers = [
+            int(name.rsplit("_v", 1)[1])
+            for name in await self.index_versions()
+            if name.startswith(f"{self.alias}_v") and name.rsplit("_v", 1)[1].isdigit()
+        ]
+        name = f"{self.alias}_v{max(numbers, default=0) + 1}"
+        projection = self._new_projection(model)
+        mappings = self._mapping(model, dims, projection=projection, routed=self.route_by_owner)
+        if self.partition_scheme:
+            check_scheme(self.partition_scheme)
+            mappings["_meta"]["partition_by"] = self.partition_scheme
+        await self.es.indices.create(index=name, mappings=mappings, settings=self._index_settings())
+        layout = f", two-stage via {projection.dims}-dim PCA" if projection else ""
+        if self.partition_scheme:
+            layout += f", partitioned by {self.partition_scheme}"
+        if self.route_by_owner:
+            layout += ", routed by owner"
+        print(f"✅ Created index {name} for {model} ({dims} dims, {self.index_type}{layout})")
+        return name
+
+    def _index_settings(self) -> Optional[dict]:
+        settings_ = {}
+        if self.shards:
+            settings_["number_of_shards"] = self.shards
+        if self.route_by_owner and self.routing_partition_size > 1:
+            # Needs more shards than this; each owner's documents spread over this many
+            settings_["routing_partition_size"] = self.routing_partition_size
+        return settings_ or None
+
+    async def set_backfill_checkpoint(self, index: str, meta: dict, after: str):
+        """Record how far a backfill into `index` got (last MongoDB _id done)."""
+        # _meta is replaced as a whole
+        await self.es.indices.put_mapping(index=index, meta={**meta, "backfill_after": after})
+
+    async def swap_alias(self, index: str):
+        """
+        Point the alias at `index` (and its partitions) in one atomic
+        update_aliases call. A pre-versioning index named like the alias has
+        to be removed in the same call, since an alias cannot share its name
+        with an index.
+        """
+        actions = []
+        versions = await self.index_versions()
+        for name, version in versions.items():
+            if name == index or not version["live"]:
+                continue
+            if name == self.alias:
+                actions.append({"remove_index": {"index": name}})
+                continue
+            actions.append({"remove": {"index": name, "alias": self.alias}})
+            for partition in version["partitions"]:
+                actions.append({"remove": {"index": partition, "alias": self.alias, "must_exist": False}})
+        actions.append({"add": {"index": index, "alias": self.alias, "is_write_index": True}})
+        for partition in versions[index]["partitions"]:
+            actions.append({"add": {"index": partition, "alias": self.alias}})
+        await self.es.indices.update_aliases(actions=actions)
+        print(f"🔀 Alias {self.alias} now points at {index}")
+
+    async def create_index(self):
+        """
+        Make sure the alias exists and pin this process to the index that
+        holds embeddings of its model and dims. Nothing is ever deleted:
+        after a model or dims change the old index keeps serving until
+        scripts/reindex_embeddings.py has backfilled a new version and
+        swapped the alias.
+        """
+        try:
+            versions = await self.index_versions()
+            if not versions:
+                print(f"📝 Creating Elasticsearch index behind alias {self.alias}")
+                index = await self.create_version(self.model, self.embedding_dims)
+                await self.swap_alias(index)
+                versions = await self.index_versions()
+                self.use_index(index, versions[index])
+                return
+
+            await self._stamp_legacy(versions)
+            matching = [
+                name for name, version in versions.items()
+                if self._serves(version, self.model, self.embedding_dims)
+            ]
+            live = [name for name in matching if versions[name]["live"]]
+            if live:
+                self.use_index(live[0], versions[live[0]])
+            elif matching:
+                # Mid-migration: read the new version until the alias is swapped
+                self.use_index(sorted(matching)[-1], versions[sorted(matching)[-1]])
+                print(f"⚠️  Alias {self.alias} serves another model; using {self.index_name} for {self.model}")
             else:
-                # Check if existing index has the correct dims
-                try:
-                    index_settings = await self.es.indices.get(index=self.index_name)
-                    existing_dims = index_settings[self.index_name]["mappings"]["properties"]["embedding"].get("dims")
-                    if existing_dims != self.embedding_dims:
-                        print(f"⚠️  Index has {existing_dims} dims but model expects {self.embedding_dims} dims")
-                        print(f"🔄 Recreating index {self.index_name}...")
-                        await self.es.indices.delete(index=self.index_name)
-                        await self.es.indices.create(index=self.index_name, body=mapping)
-                        print(f"✅ Index recreated with {self.embedding_dims} dims")
-                except Exception as e:
-                    print(f"⚠️  Error checking index: {e}")
-                    print(f"🔄 Forcing index recreation...")
-                    try:
-                        await self.es.indices.delete(index=self.index_name)
-                    except:
-                        pass
-                    await self.es.indices.create(index=self.index_name, body=mapping)
-                    print(f"✅ Index recreated")
+                print(f"⚠️  No index holds {self.model} ({self.embedding_dims} dims) embeddings; "
+                      f"run scripts/reindex_embeddings.py. Searches return nothing until then.")
+                return
+
+            # Adding fields is allowed on a live index
+            try:
+                await self.es.indices.put_mapping(index=self.read_indices(recent=0), properties=TEXT_FIELDS)
+            except Exception as e:
+                print(f"⚠️  Could not add text fields to {self.index_name}: {e}")
+            await self._update_index_options(versions[self.index_name]["index_options"])
         except Exception as e:
             print(f"❌ Error creating/checking index: {e}")
             raise
 
-    async def index_image(self, image_id: str, embedding: List[float]):
-        doc = {"image_id": image_id, "embedding": embedding}
-        await self.es.index(index=self.index_name, id=image_id, document=doc)
-        await self.es.indices.refresh(index=self.index_name)  # <--- important
+    async def _update_index_options(self, current: Optional[dict]):
+        """
+        Apply ES_VECTOR_INDEX_TYPE / ES_VECTOR_OVERSAMPLE to the index in use.
+        Elasticsearch only allows moving to a smaller type (hnsw -> int8 ->
+        int4 -> bbq); newly written segments use it, older ones are
+        converted as they merge. Anything else needs a new version built
+        with scripts/reindex_embeddings.py.
+        """
+        wanted = self._index_options()
+        if current and all(current.get(key) == value for key, value in wanted.items()):
+            return
+        if self.projection is not None:
+            field, dims = SHORT_FIELD, self.projection.dims
+        else:
+            field, dims = "embedding", self.embedding_dims
+        try:
+            await self.es.indices.put_mapping(
+                index=self.read_indices(recent=0),
+                properties={field: self._embedding_mapping(dims)}
+            )
+            print(f"✅ {self.index_name} vector index options set to {wanted}")
+        except Exception as e:
+            print(f"⚠️  Keeping {self.index_name} vector index options {current}: {e}")
 
-        
+    def read_indices(self, recent: Optional[int] = None) -> str:
+        """
+        What searches read: the index in use or, when it is partitioned, the
+        version with all its partitions, or only those of the `recent` newest
+        periods (default ES_SEARCH_RECENT_PARTITIONS, 0 = all). Elasticsearch
+        takes the top hits of every shard and merges them, so one request
+        covers all partitions.
+        """
+        if not self.partition_by:
+            return self.index_name
+        recent = self.recent_partitions if recent is None else recent
+        if not recent:
+            return f"{self.index_name},{self.index_name}-*"
+        return ",".join(recent_partitions(self.index_name, self.partition_by, recent))
+
+    def _read_params(self) -> dict:
+        if not self.partition_by:
+            return {"index": self.index_name}
+        # A recent period may have no uploads, and so no partition, yet
+        return {"index": self.read_indices(), "ignore_unavailable": True}
+
+    async def _fetch(
+        self,
+        image_ids: List[str],
+        source: Any,
+        index: Optional[str] = None,
+        version: Optional[dict] = None,
+        owner_id: Optional[str] = None
+    ) -> List[dict]:
+        """
+        The stored documents of image_ids that exist ({"_id", "_index",
+        "_routing", "_source"}), in `index` with the layout of `version` (its
+        index_versions() entry), default the index in use. In an owner-routed
+        index, ids of one known owner are read from its shard; otherwise
+        every shard is asked in one search.
+        """
+        if index is None or index == self.index_name:
+            index, partition_by, routed = self.index_name, self.partition_by, self.routed
+        else:
+            partition_by, routed = (version or {}).get("partition_by"), bool((version or {}).get("routing"))
+        if routed and owner_id is None:
+            response = await self.es.search(
+                index=f"{index},{index}-*" if partition_by else index,
+                query={"ids": {"values": image_ids}},
+                size=len(image_ids),
+                source=source
+            )
+            return response["hits"]["hits"]
+        docs = [{"_index": partition_of(index, img_id, partition_by), "_id": img_id} for img_id in image_ids]
+        if routed:
+            for doc in docs:
+                doc["routing"] = owner_id
+        response = await self.es.mget(docs=docs, source=source)
+        return [doc for doc in response["docs"] if doc.get("found")]
+
+    async def _write_target(self, image_id: str, owner_id: Optional[str] = None) -> dict:
+        """Index (and routing) image_id is written to, creating its partition on first use."""
+        name = partition_of(self.index_name, image_id, self.partition_by)
+        if name != self.index_name and name not in self._partitions:
+            await self._create_partition(name)
+        # Documents without an owner are spread by their own id
+        return {"index": name, "routing": owner_id or image_id} if self.routed else {"index": name}
 
-    async def search_similar(self, query_embedding: List[float], top_k: int = 10) -> List[str]:
+    async def _doc_targets(self, docs: List[dict]) -> Dict[str, dict]:
+        """
+        Where each of docs ({"image_id", "owner_id"?}) is stored in the index
+        in use. Routing of documents whose owner isn't given is looked up.
+        """
+        targets = {
+            doc["image_id"]: {"index": partition_of(self.index_name, doc["image_id"], self.partition_by)}
+            for doc in docs
+        }
+        if not self.routed:
+            return targets
+        unknown = [doc["image_id"] for doc in docs if not doc.get("owner_id")]
+        found = {hit["_id"]: hit.get("_routing") for hit in await self._fetch(unknown, False)} if unknown else {}
+        for doc in docs:
+            image_id = doc["image_id"]
+            targets[image_id]["routing"] = doc.get("owner_id") or found.get(image_id) or image_id
+        return targets
+
+    async def _create_partition(self, name: str):
+        """A partition gets the mapping and shards of the index in use, and the alias if that is live."""
+        base = (await self.es.indices.get(index=self.index_name))[self.index_name]
+        aliases = {self.alias: {}} if self.alias in base.get("aliases", {}) else None
+        index_settings = {
+            key: value for key, value in base.get("settings", {}).get("index", {}).items()
+            if key in ("number_of_shards", "routing_partition_size")
+        }
+        try:
+            await self.es.indices.create(
+                index=name, mappings=base["mappings"], settings=index_settings or None, aliases=aliases
+            )
+            print(f"✅ Created partition {name}")
+        except ApiError as e:
+            # Another worker created it first
+            if e.error != "resource_already_exists_exception":
+                raise
+        self._partitions.add(name)
+
+    async def existing_ids(self, image_ids: List[str], index: Optional[str] = None, version: Optional[dict] = None) -> set:
+        """Which of image_ids are indexed (in `index` with the layout of `version`, default the one in use)."""
+        if not image_ids:
+            return set()
+        return {doc["_id"] for doc in await self._fetch(image_ids, False, index, version)}
+
+    def _document(self, doc: dict) -> dict:
+        document = {
+            "image_id": doc["image_id"],
+            "embedding": doc["embedding"],
+            "title": doc.get("title"),
+            "description": doc.get("description"),
+            "tags": doc.get("tags") or []
+        }
+        if self.routed:
+            document["owner_id"] = doc.get("owner_id")
+        if self.projection is not None:
+            document[SHORT_FIELD] = self.projection.project([doc["embedding"]])[0].tolist()
+        return document
+
+    async def index_image(
+        self,
+        image_id: str,
+        embedding: List[float],
+        title: Optional[str] = None,
+        description: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        owner_id: Optional[str] = None
+    ):
+        doc = self._document({
+            "image_id": image_id,
+            "embedding": embedding,
+            "title": title,
+            "description": description,
+            "tags": tags,
+            "owner_id": owner_id
+        })
+        target = await self._write_target(image_id, owner_id)
+        await self.es.index(**target, id=image_id, document=doc)
+        await self.es.indices.refresh(index=target["index"])  # <--- important
+
+    async def bulk_index(self, docs: List[dict]) -> int:
+        """
+        Index many {"image_id", "embedding", "title", "description", "tags",
+        "owner_id"} docs in one _bulk request, each into its partition and
+        onto its owner's shard if the index in use is laid out so. Returns the
+        number of documents indexed.
+        """
+        operations = []
+        for doc in docs:
+            target = await self._write_target(doc["image_id"], doc.get("owner_id"))
+            action = {"_index": target["index"], "_id": doc["image_id"]}
+            if "routing" in target:
+                action["routing"] = target["routing"]
+            operations.append({"index": action})
+            operations.append(self._document(doc))
+        if not operations:
+            return 0
+        response = await self.es.bulk(operations=operations, refresh=True)
+        return sum(1 for item in response["items"] if item["index"].get("status") in (200, 201))
+
+    def _similarity_query(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        min_score: Optional[float] = None,
+        filter: Optional[dict] = None
+    ) -> dict:
+        """
+        kNN on the HNSW graph, or exact cosine ranking with
+        ES_VECTOR_SEARCH=exact. On a two-stage index the kNN runs on the
+        short PCA vector for top_k * SEARCH_PCA_OVERSAMPLE candidates, which
+        are then rescored on the full vector in the same request. Scores are
+        (1 + cosine) / 2 of the full vectors, in [0, 1], in every case; hits
+        below min_score are dropped inside ES. `filter` restricts the
+        documents considered (applied during the kNN, not after it).
+        """
+        if self.search_method == "knn" and self.projection is None:
+            knn = self._knn(query_embedding, top_k, min_score)
+            if filter:
+                knn["filter"] = filter
+            return {"size": top_k, "_source": ["image_id"], "knn": knn}
+        candidates = {"bool": {"filter": filter}} if filter else {"match_all": {}}
+        if self.search_method == "knn":
+            k = min(MAX_NUM_CANDIDATES, math.ceil(top_k * self.pca_oversample))
+            candidates = {"knn": {
+                "field": SHORT_FIELD,
+                "query_vector": self.projection.project([query_embedding])[0].tolist(),
+                "k": k,
+                "num_candidates": self._num_candidates(k)
+            }}
+            if filter:
+                candidates["knn"]["filter"] = filter
+        query = {"size": top_k, "_source": ["image_id"], "query": self._exact_query(query_embedding, candidates)}
+        if min_score:
+            query["min_score"] = min_score
+        return query
+
+    @staticmethod
+    def _exact_query(query_embedding: List[float], candidates: dict) -> dict:
+        """Score `candidates` by (1 + cosine) / 2 against the full stored vectors."""
+        return {
+            "script_score": {
+                "query": candidates,
+                "script": {
+                    "source": "(cosineSimilarity(params.query_vector, 'embedding') + 1.0) / 2.0",
+                    "params": {"query_vector": query_embedding}
+                }
+            }
+        }
+
+    async def _guarded(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run an ES read through the breaker, cancelled when the request's deadline passes."""
+        # The client enforces ES_REQUEST_TIMEOUT itself; only the deadline cuts it shorter
+        return await self.breaker.call(call)
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge:
+            return None
+        p = self.search_latency.percentile(settings.ES_HEDGE_PERCENTILE)
+        return None if p is None else max(p, settings.ES_HEDGE_MIN_DELAY_MS / 1000)
+
+    @staticmethod
+    def _check_partial(response: dict):
+        """Flag results some shards didn't contribute to (timed out or failed)."""
+        if response.get("timed_out") or response.get("_shards", {}).get("failed"):
+            mark_partial("elasticsearch")
+
+    async def _search(self, body: dict, hedge: bool = True, **params) -> dict:
+        """
+        Guarded search. Within a request deadline, shards are told to stop at
+        80% of it and return what they have (partial results) rather than let
+        the client time out. A hedge goes to a random shard copy via
+        `preference` (the first request uses adaptive replica selection).
+        """
+        timeout = call_timeout()
+        if timeout is not None:
+            body = {**body, "timeout": f"{max(1, int(timeout * 800))}ms"}
+
+        async def attempt(n: int):
+            preference = {"preference": f"hedge-{uuid.uuid4().hex[:8]}"} if n else {}
+            return await self.es.search(body=body, **params, **preference)
+
+        delay = self._hedge_delay() if hedge else None
+        started = time.perf_counter()
+        response = await self.breaker.call(lambda: hedged(attempt, delay))
+        self.search_latency.record(time.perf_counter() - started)
+        self._check_partial(response)
+        return response
+
+    @staticmethod
+    def _hits(hits: List[dict], with_scores: bool) -> list:
+        if with_scores:
+            return [(hit["_source"]["image_id"], hit["_score"]) for hit in hits]
+        return [hit["_source"]["image_id"] for hit in hits]
+
+    async def search_similar(
+        self,
+        query_embedding: List[float],
+        top_k: int = 10,
+        min_score: Optional[float] = None,
+        with_scores: bool = False
+    ) -> list:
+        """
+        Returns image ids in rank order, or (image_id, score) pairs when
+        with_scores is set. See _similarity_query for the score scale.
+        """
         # Validate embedding dimension
         if len(query_embedding) != self.embedding_dims:
             print(f"❌ Embedding dimension mismatch: got {len(query_embedding)}, expected {self.embedding_dims}")
             print(f"⚠️  This usually means the model was changed but index wasn't recreated")
             return []
         
+        query = self._similarity_query(query_embedding, top_k, min_score)
+        try:
+            response = await self._search(query, **self._read_params())
+            return self._hits(response["hits"]["hits"], with_scores)
+        except Exception as e:
+            print(f"❌ Elasticsearch search error: {e}")
+            print(f"Query: {query}")
+            raise
+
+    async def search_owned(
+        self,
+        query_embedding: List[float],
+        owner_id: str,
+        top_k: int = 10,
+        min_score: Optional[float] = None
+    ) -> Optional[List[Tuple[str, float]]]:
+        """
+        (image_id, score) hits among owner_id's images only, read from the
+        owner's shard. None if the index in use is not owner-routed; the
+        caller then searches everything and filters.
+        """
+        if not self.routed:
+            return None
+        if len(query_embedding) != self.embedding_dims:
+            print(f"❌ Embedding dimension mismatch: got {len(query_embedding)}, expected {self.embedding_dims}")
+            return []
+        query = self._similarity_query(query_embedding, top_k, min_score, filter={"term": {"owner_id": owner_id}})
+        response = await self._search(query, routing=owner_id, **self._read_params())
+        return self._hits(response["hits"]["hits"], with_scores=True)
+
+    async def msearch_similar(
+        self,
+        query_embeddings: List[List[float]],
+        top_ks: List[int],
+        min_score: Optional[float] = None,
+        with_scores: bool = False
+    ) -> List[list]:
+        """
+        Run several similarity queries in one _msearch round trip.
+
+        Returns one list of image ids per query, in order, or of
+        (image_id, score) pairs when with_scores is set. A query whose
+        embedding has the wrong dimension, or that failed inside ES, yields [].
+        """
+        searches = []
+        positions = []
+        for position, (embedding, top_k) in enumerate(zip(query_embeddings, top_ks)):
+            if len(embedding) != self.embedding_dims:
+                print(f"❌ Embedding dimension mismatch: got {len(embedding)}, expected {self.embedding_dims}")
+                continue
+            searches.append({})
+            searches.append(self._similarity_query(embedding, top_k, min_score))
+            positions.append(position)
+
+        results: List[list] = [[] for _ in query_embeddings]
+        if not searches:
+            return results
+        try:
+            response = await self._guarded(lambda: self.es.msearch(searches=searches, **self._read_params()))
+        except Exception as e:
+            print(f"❌ Elasticsearch msearch error: {e}")
+            raise
+
+        for position, item in zip(positions, response["responses"]):
+            if "error" in item:
+                print(f"⚠️  Elasticsearch msearch item error: {item['error']}")
+                mark_partial("elasticsearch")
+                continue
+            self._check_partial(item)
+            results[position] = self._hits(item["hits"]["hits"], with_scores)
+        return results
+
+    async def search_page(
+        self,
+        query_embedding: List[float],
+        size: int,
+        min_score: Optional[float] = None,
+        after: Optional[Tuple[float, str]] = None,
+        pit_id: Optional[str] = None
+    ) -> Tuple[List[Tuple[str, float]], Optional[str]]:
+        """
+        One page of the exact ranking, for paging past the kNN window.
+
+        Pages are read from a point in time (opened when pit_id is None) and
+        continue with search_after on (score desc, image_id asc), so each
+        request returns only its own `size` hits and later pages are not
+        shifted by concurrent writes. The PIT is closed once fewer than
+        `size` hits come back. Raises PageExpired if it timed out
+        (SEARCH_PIT_KEEP_ALIVE between pages).
+
+        Returns:
+            (hits as (image_id, score), pit_id for the next page or None)
+        """
+        if len(query_embedding) != self.embedding_dims:
+            print(f"❌ Embedding dimension mismatch: got {len(query_embedding)}, expected {self.embedding_dims}")
+            return [], None
+        if pit_id is None:
+            pit_id = (await self._guarded(
+                lambda: self.es.open_point_in_time(keep_alive=self.pit_keep_alive, **self._read_params())
+            ))["id"]
+
         query = {
-            "size": top_k,
-            "query": {
-                "script_score": {
-                    "query": {"match_all": {}},
-                    "script": {
-                        "source": "cosineSimilarity(params.query_vector, 'embedding') + 1.0",
-                        "params": {"query_vector": query_embedding}
+            "size": size,
+            "_source": ["image_id"],
+            "query": self._exact_query(query_embedding, {"match_all": {}}),
+            "sort": [{"_score": "desc"}, {"image_id": "asc"}],
+            "pit": {"id": pit_id, "keep_alive": self.pit_keep_alive},
+            "track_total_hits": False
+        }
+        if min_score:
+            query["min_score"] = min_score
+        if after:
+            query["search_after"] = list(after)
+        try:
+            # The PIT pins shard copies, so there is nothing to hedge to
+            response = await self._search(query, hedge=False)
+        except NotFoundError as e:
+            raise PageExpired("Search cursor expired") from e
+
+        hits = [(hit["_source"]["image_id"], hit["sort"][0]) for hit in response["hits"]["hits"]]
+        pit_id = response.get("pit_id", pit_id)
+        if len(hits) < size:
+            try:
+                await self.es.close_point_in_time(id=pit_id)
+            except Exception as e:
+                print(f"⚠️  Failed to close point in time: {e}")
+            pit_id = None
+        return hits, pit_id
+
+    async def get_embeddings(
+        self,
+        image_ids: List[str],
+        index: Optional[str] = None,
+        version: Optional[dict] = None,
+        owner_id: Optional[str] = None
+    ) -> Dict[str, List[float]]:
+        """
+        Fetch stored embeddings for several images in one _mget (from `index`
+        with the layout of `version`, default the one in use); missing ids
+        are left out. Pass owner_id when all of them belong to that owner, so
+        an owner-routed index reads one shard.
+        """
+        if not image_ids:
+            return {}
+        docs = await self._guarded(lambda: self._fetch(image_ids, ["embedding"], index, version, owner_id))
+        return {doc["_id"]: doc["_source"]["embedding"] for doc in docs}
+
+    async def get_embedding(self, image_id: str, owner_id: Optional[str] = None) -> Optional[List[float]]:
+        """Fetch the stored embedding of one image, or None if it isn't indexed."""
+        return (await self.get_embeddings([image_id], owner_id=owner_id)).get(image_id)
+
+    async def update_metadata(
+        self,
+        image_id: str,
+        title: Optional[str],
+        description: Optional[str],
+        tags: Optional[List[str]],
+        owner_id: Optional[str] = None
+    ):
+        """Update the lexical fields of an indexed image after a metadata edit."""
+        target = (await self._doc_targets([{"image_id": image_id, "owner_id": owner_id}]))[image_id]
+        await self.es.update(
+            **target,
+            id=image_id,
+            doc={"title": title, "description": description, "tags": tags or []}
+        )
+
+    async def bulk_update_metadata(self, docs: List[dict]) -> int:
+        """
+        Partial-update title/description/tags of many indexed images in one
+        _bulk request. Each doc needs "image_id" (and "owner_id" saves a
+        lookup in an owner-routed index); images missing from the index are
+        skipped. Returns the number of documents updated.
+        """
+        targets = await self._doc_targets(docs) if docs else {}
+        operations = []
+        for doc in docs:
+            target = targets[doc["image_id"]]
+            action = {"_index": target["index"], "_id": doc["image_id"]}
+            if "routing" in target:
+                action["routing"] = target["routing"]
+            operations.append({"update": action})
+            operations.append({"doc": {
+                "title": doc.get("title"),
+                "description": doc.get("description"),
+                "tags": doc.get("tags") or []
+            }})
+        if not operations:
+            return 0
+        response = await self.es.bulk(operations=operations)
+        return sum(1 for item in response["items"] if item["update"].get("status") == 200)
+
+    def _lexical_query(self, query_text: str) -> dict:
+        return {"multi_match": {"query": query_text, "fields": LEXICAL_FIELDS}}
+
+    def _num_candidates(self, top_k: int) -> int:
+        """
+        Candidates gathered per shard. A quantized graph ranks less precisely,
+        so gather at least as many as the rescoring step will look at.
+        """
+        factor = 2.0
+        if self.index_type != "hnsw" and self.oversample:
+            factor = max(factor, 2.0 * self.oversample)
+        return min(MAX_NUM_CANDIDATES, max(100, math.ceil(top_k * factor)))
+
+    def _knn(self, query_embedding: List[float], top_k: int, min_score: Optional[float] = None) -> dict:
+        if self.projection is not None:
+            # Short vectors: their similarity is not comparable to min_score
+            return {
+                "field": SHORT_FIELD,
+                "query_vector": self.projection.project([query_embedding])[0].tolist(),
+                "k": top_k,
+                "num_candidates": self._num_candidates(top_k)
+            }
+        knn = {
+            "field": "embedding",
+            "query_vector": query_embedding,
+            "k": top_k,
+            "num_candidates": self._num_candidates(top_k)
+        }
+        if min_score:
+            # kNN similarity is the raw cosine, not the [0, 1] score
+            knn["similarity"] = 2 * min_score - 1
+        return knn
+
+    async def search_hybrid(
+        self,
+        query_text: str,
+        query_embedding: List[float],
+        top_k: int = 10,
+        mode: str = "rrf",
+        vector_weight: float = 0.7,
+        min_score: Optional[float] = None
+    ) -> List[str]:
+        """
+        BM25 over title/description/tags and kNN over embeddings in one request,
+        fused inside Elasticsearch.
+
+        Modes:
+            rrf: reciprocal rank fusion retriever (rank-based, no score tuning)
+            linear: sum of the BM25 score weighted by 1 - vector_weight and
+                the kNN score weighted by vector_weight. BM25 scores are not
+                bounded, so the weight needs tuning per corpus.
+
+        RRF needs a license that includes it; if the cluster rejects it the
+        query is retried in linear mode. min_score only restricts the kNN
+        side, so keyword matches are kept. Fused scores are not similarities
+        and are not returned.
+        """
+        if len(query_embedding) != self.embedding_dims:
+            print(f"❌ Embedding dimension mismatch: got {len(query_embedding)}, expected {self.embedding_dims}")
+            return []
+
+        if mode == "rrf":
+            body = {
+                "size": top_k,
+                "_source": ["image_id"],
+                "retriever": {
+                    "rrf": {
+                        "retrievers": [
+                            {"standard": {"query": self._lexical_query(query_text)}},
+                            {"knn": self._knn(query_embedding, top_k, min_score)}
+                        ],
+                        "rank_window_size": max(100, top_k),
+                        "rank_constant": 60
                     }
                 }
             }
+            try:
+                response = await self._search(body, **self._read_params())
+                return [hit["_source"]["image_id"] for hit in response["hits"]["hits"]]
+            except Exception as e:
+                print(f"⚠️  RRF hybrid search failed, falling back to linear fusion: {e}")
+
+        lexical = self._lexical_query(query_text)
+        lexical["multi_match"]["boost"] = 1.0 - vector_weight
+        body = {
+            "size": top_k,
+            "_source": ["image_id"],
+            "query": lexical,
+            "knn": {**self._knn(query_embedding, top_k, min_score), "boost": vector_weight}
         }
         try:
-            response = await self.es.search(index=self.index_name, body=query)
+            response = await self._search(body, **self._read_params())
             return [hit["_source"]["image_id"] for hit in response["hits"]["hits"]]
         except Exception as e:
-            print(f"❌ Elasticsearch search error: {e}")
-            print(f"Query: {query}")
+            print(f"❌ Elasticsearch hybrid search error: {e}")
             raise
 
-    async def delete_document(self, image_id: str):
-        await self.es.delete(index=self.index_name, id=image_id)
+    async def delete_document(self, image_id: str, owner_id: Optional[str] = None):
+        target = (await self._doc_targets([{"image_id": image_id, "owner_id": owner_id}]))[image_id]
+        await self.es.delete(**target, id=image_id)
+
+    def stats(self) -> dict:
+        """Connection pool use of each node in this worker, for /metrics."""
+        nodes = {}
+        for node in self.es.transport.node_pool.all():
+            # aiohttp creates the session on the node's first request
+            connector = getattr(getattr(node, "session", None), "connector", None)
+            in_use = len(getattr(connector, "_acquired", ()))
+            idle = sum(len(conns) for conns in getattr(connector, "_conns", {}).values())
+            nodes[node.base_url] = {
+                "in_use": in_use,
+                "idle": idle,
+                "limit": self.connections_per_node,
+                "utilization": round(in_use / self.connections_per_node, 4) if self.connections_per_node else 0.0,
+            }
+        return {"index": self.read_indices(), "routed": self.routed, "nodes": nodes}
+
+    async def close(self):
+        await self.es.close()
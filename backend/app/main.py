@@ -1,11 +1,16 @@
 # app/main.py
-from fastapi import FastAPI
+import math
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
-from app.routes import auth, use, media, collections
+from app.routes import auth, use, media, collections, metrics
 from app.persistance.db import init_db
 from app.cache.redis_client import redis_client
+from app.auth.passwordhasher import password_hasher
 from app.config import settings
+from app.vectorstore.store import get_vector_store, close_vector_store
+from app.util.resilience import CircuitOpen
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -24,13 +29,21 @@ async def lifespan(app: FastAPI):
 
     await redis_client.connect()
 
+    # Pins the index matching the configured model; never drops an index
+    try:
+        await get_vector_store().create_index()
+    except Exception as e:
+        print(f"⚠️  Vector index check failed, search may be unavailable: {e}")
+
     print(f"✅ API running at http://{settings.API_HOST}:{settings.API_PORT}")
     print(f"✅ Frontend origin: {settings.FRONTEND_ORIGIN}")
 
     yield
 
     # Shutdown code
+    await close_vector_store()
     await redis_client.disconnect()
+    password_hasher.shutdown()
     print("👋 Server is shutting down...")
 
 def create_app() -> FastAPI:
@@ -67,6 +80,20 @@ def create_app() -> FastAPI:
     app.include_router(use.router, prefix="/api/v1")
     app.include_router(media.router, prefix="/api/v1")
     app.include_router(collections.router, prefix="/api/v1")
+    app.include_router(metrics.router, prefix="/api/v1")
+
+    @app.exception_handler(CircuitOpen)
+    async def circuit_open(request: Request, exc: CircuitOpen):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": str(exc)},
+            headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+        )
+
+    @app.exception_handler(TimeoutError)
+    async def dependency_timeout(request: Request, exc: TimeoutError):
+        # A dependency call ran out of the request's deadline
+        return JSONResponse(status_code=504, content={"detail": "Request timed out"})
 
     return app
 
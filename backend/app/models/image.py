@@ -1,4 +1,5 @@
 from beanie import Document
+from pymongo import IndexModel, ASCENDING, DESCENDING
 from typing import Optional, List
 from PIL import Image as PILImage
 from datetime import datetime
@@ -29,11 +30,20 @@ class Image(Document):
 
     class Settings:
         name = "images" # Collection name in the database
+        # Support keyset pagination of the public and per-owner listings
+        indexes = [
+            IndexModel([("visibility", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("owner_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        ]
 
     @staticmethod
     def generate_text_embedding(text: str) -> List[float]:
         return text_embedder.get_text_embeddings(text)
 
+    @staticmethod
+    def generate_text_embeddings(texts: List[str]) -> List[List[float]]:
+        return text_embedder.get_texts_embeddings(texts)
+
     @staticmethod
     def generate_image_embedding(image_path: str) -> List[float]:
         image = PILImage.open(image_path).convert("RGB")
@@ -0,0 +1,26 @@
+from beanie import Document, Indexed
+from pymongo import IndexModel
+from typing import List, Optional
+from datetime import datetime
+
+# Scale of the stored scores; lists written before it was recorded hold raw
+# cosine similarities and are rebuilt
+SCORE_SCALE = "(1+cos)/2"
+
+
+class Neighbors(Document):
+    """Precomputed nearest neighbours of one media item, best match first."""
+    media_id: Indexed(str, unique=True)
+    neighbor_ids: List[str] = []
+    # Similarity score of each neighbour ((1 + cosine) / 2), aligned with neighbor_ids
+    scores: List[float] = []
+    score_scale: Optional[str] = None
+    # Number of neighbours requested when the list was built
+    top_k: int
+    model: str
+    computed_at: datetime
+
+    class Settings:
+        name = "media_neighbors"
+        # Find the lists an image appears in when it is deleted or made private
+        indexes = [IndexModel("neighbor_ids")]
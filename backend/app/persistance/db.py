@@ -5,13 +5,14 @@ from beanie import init_beanie
 from app.models.image import Image  # our class
 from app.models.collection import Collection
 from app.models.user import User
+from app.models.neighbors import Neighbors
 
 load_dotenv()
 
 async def init_db():
     client = AsyncIOMotorClient(os.getenv("MONGODB_URL"))
     db = client[os.getenv("MONGODB_DB", "mydatabase")]  # MongoDB database name
-    await init_beanie(database=db, document_models=[Image,Collection,User])
+    await init_beanie(database=db, document_models=[Image,Collection,User,Neighbors])
 
 #drop db
 async def drop_db():
@@ -19,4 +20,5 @@ async def drop_db():
     db = client[os.getenv("MONGODB_DB", "mydatabase")]
     await db.drop_collection(Image)
     await db.drop_collection(Collection)
-    await db.drop_collection(User)
\ No newline at end of file
+    await db.drop_collection(User)
+    await db.drop_collection(Neighbors)
\ No newline at end of file
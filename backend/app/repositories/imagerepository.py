@@ -1,47 +1,140 @@
+from typing import Dict, List
+from bson import ObjectId
+from pymongo import DESCENDING
+from pymongo.errors import PyMongoError
 from app.models.image import Image
+from app.cache.media_cache import media_cache
+from app.cache.tiered import TieredCache
+from app.config import settings
+from app.util.pagination import keyset_filter, encode_cursor
+from app.util.resilience import breaker
+
+# Newest first, with _id as a tie-breaker so the order is total
+LISTING_SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+# Listing totals; the in-process tier is kept very short because other
+# workers only invalidate Redis
+count_cache = TieredCache("media_count", ttl=settings.MEDIA_COUNT_CACHE_TTL, local_ttl=5)
+
+# Metadata reads on the search path; malformed ids and the like don't trip it
+mongo_breaker = breaker("mongodb", lambda e: isinstance(e, (PyMongoError, TimeoutError)))
+
 
 class ImageRepository:
     async def insert(self, image: Image):
         await image.insert()
+        await media_cache.invalidate(str(image.id))
         return image
 
     async def find_all(self, page: int = 1, limit: int = 10):
         skip = (page - 1) * limit
         return await Image.find_all().skip(skip).limit(limit).to_list()
 
-    async def find_public(self, page: int = 1, limit: int = 20):
-        """Find all public images with pagination."""
-        skip = (page - 1) * limit
-        return await Image.find({"visibility": "public"}).skip(skip).limit(limit).to_list()
+    async def _find_page(self, query: dict, page: int, limit: int, cursor: str = None):
+        """
+        Fetch one page of a listing in (created_at, _id) order.
+
+        With a cursor the page is located by index seek; without one we fall
+        back to skip/limit so plain `page` numbers keep working. One extra row
+        is fetched to detect whether another page exists.
+
+        Returns:
+            (images, next_cursor) where next_cursor is None on the last page
+        """
+        if cursor:
+            finder = Image.find({"$and": [query, keyset_filter(cursor)]})
+        else:
+            finder = Image.find(query).skip((page - 1) * limit)
+
+        images = await finder.sort(LISTING_SORT).limit(limit + 1).to_list()
+        if len(images) <= limit:
+            return images, None
+
+        images = images[:limit]
+        last = images[-1]
+        return images, encode_cursor(last.created_at, last.id)
+
+    async def find_public(self, page: int = 1, limit: int = 20, cursor: str = None):
+        """Find a page of public images, newest first."""
+        return await self._find_page({"visibility": "public"}, page, limit, cursor)
 
     async def count_public(self):
-        """Count total public images."""
-        return await Image.find({"visibility": "public"}).count()
+        """Count total public images (cached for a short TTL)."""
+        return await self._cached_count("public", {"visibility": "public"})
 
-    async def find_by_owner(self, owner_id: str, page: int = 1, limit: int = 20, visibility: str = None):
-        """Find images by owner with optional visibility filter."""
-        skip = (page - 1) * limit
+    async def find_by_owner(self, owner_id: str, page: int = 1, limit: int = 20, visibility: str = None, cursor: str = None):
+        """Find a page of images by owner with optional visibility filter."""
         query = {"owner_id": owner_id}
         if visibility:
             query["visibility"] = visibility
-        return await Image.find(query).skip(skip).limit(limit).to_list()
+        return await self._find_page(query, page, limit, cursor)
 
     async def count_by_owner(self, owner_id: str, visibility: str = None):
-        """Count images by owner with optional visibility filter."""
+        """Count images by owner with optional visibility filter (cached for a short TTL)."""
         query = {"owner_id": owner_id}
         if visibility:
             query["visibility"] = visibility
-        return await Image.find(query).count()
+        return await self._cached_count(f"owner:{owner_id}:{visibility or 'all'}", query)
+
+    async def _cached_count(self, key: str, query: dict) -> int:
+        """Return a cached count, computing and storing it on a miss."""
+        return await count_cache.get_or_load(key, lambda: Image.find(query).count())
+
+    async def invalidate_counts(self, owner_id: str = None):
+        """
+        Drop cached listing totals after an insert, delete or visibility change.
+        Ingestion scripts write to Mongo directly and rely on the TTL instead.
+        """
+        keys = ["public"]
+        if owner_id:
+            keys += [f"owner:{owner_id}:{visibility}" for visibility in ("all", "public", "private")]
+        await count_cache.delete(*keys)
 
     async def find_by_id(self, id: str):
-        return await Image.get(id)
+        """Get an image by id through the metadata cache."""
+        return await media_cache.get(id, self._load_one)
+
+    @staticmethod
+    async def _load_one(id: str):
+        return await mongo_breaker.call(lambda: Image.get(id), settings.MONGO_CALL_TIMEOUT)
+
+    async def find_by_ids(self, ids: List[str]) -> Dict[str, Image]:
+        """
+        Resolve many ids at once (e.g. search hits). Cache misses are loaded
+        with a single $in query. Unknown or malformed ids are omitted.
+        """
+        return await media_cache.get_many(ids, self._load_many)
+
+    @staticmethod
+    async def _load_many(ids: List[str]) -> List[Image]:
+        object_ids = [ObjectId(i) for i in ids if ObjectId.is_valid(i)]
+        if not object_ids:
+            return []
+        return await mongo_breaker.call(
+            lambda: Image.find({"_id": {"$in": object_ids}}).to_list(),
+            settings.MONGO_CALL_TIMEOUT
+        )
+
+    async def public_ids(self, after: str = None, limit: int = 100) -> List[str]:
+        """Ids of public images in _id order, starting after `after` (for batch jobs)."""
+        query = {"visibility": "public"}
+        if after:
+            query["_id"] = {"$gt": ObjectId(after)}
+        cursor = Image.get_pymongo_collection().find(query, {"_id": 1}).sort("_id", 1).limit(limit)
+        return [str(doc["_id"]) async for doc in cursor]
+
+    async def invalidate(self, id: str):
+        """Drop cached metadata for an image changed outside this repository."""
+        await media_cache.invalidate(id)
 
     async def update(self, image: Image):
         await image.save()
+        await media_cache.invalidate(str(image.id))
         return image
 
     async def delete(self, id: str):
-        image = await self.find_by_id(id)
+        image = await Image.get(id)
         if image:
             await image.delete()
+            await media_cache.invalidate(id)
         return image
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from pymongo import UpdateOne
+from app.models.neighbors import Neighbors, SCORE_SCALE
+from app.config import settings
+
+
+class NeighborRepository:
+    async def find(self, media_id: str) -> Optional[Neighbors]:
+        return await Neighbors.find_one(Neighbors.media_id == media_id)
+
+    async def find_many(self, media_ids: List[str]) -> Dict[str, Neighbors]:
+        found = await Neighbors.find({"media_id": {"$in": media_ids}}).to_list()
+        return {n.media_id: n for n in found}
+
+    async def find_containing(self, media_id: str) -> List[Neighbors]:
+        """Lists that rank media_id among their neighbours."""
+        return await Neighbors.find({"neighbor_ids": media_id}).to_list()
+
+    @staticmethod
+    def is_fresh(neighbors: Optional[Neighbors]) -> bool:
+        """True if the list was built for the current model and score scale within NEIGHBORS_MAX_AGE."""
+        if neighbors is None or neighbors.model != settings.DEFAULT_CLIP_MODEL:
+            return False
+        if neighbors.score_scale != SCORE_SCALE:
+            return False
+        return neighbors.computed_at >= datetime.utcnow() - timedelta(seconds=settings.NEIGHBORS_MAX_AGE)
+
+    async def find_fresh(self, media_id: str) -> Optional[Neighbors]:
+        neighbors = await self.find(media_id)
+        return neighbors if self.is_fresh(neighbors) else None
+
+    async def upsert_many(self, lists: List[Neighbors]):
+        """Write many lists with one bulk upsert keyed by media_id."""
+        if not lists:
+            return
+        operations = [
+            UpdateOne(
+                {"media_id": n.media_id},
+                {"$set": n.model_dump(exclude={"id", "revision_id"})},
+                upsert=True
+            )
+            for n in lists
+        ]
+        await Neighbors.get_pymongo_collection().bulk_write(operations, ordered=False)
+
+    async def delete(self, media_id: str):
+        await Neighbors.find(Neighbors.media_id == media_id).delete()
@@ -1,19 +1,22 @@
 """
 Media management endpoints for upload, retrieval, and deletion.
 """
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, UploadFile, File, HTTPException, Query
 from fastapi.responses import RedirectResponse
 from typing import Optional
+import asyncio
 import tempfile
 import os
 from datetime import datetime
 
 from app.util.current_user import get_current_user
+from app.util.admission import admit, ensure_within_deadline
 from app.models.user import User
 from app.models.image import Image
 from app.services.cloudinaryservice import cloudinary_service
 from app.services.imageservice import ImageService
-from app.elasticsearch.client import ESClient
+from app.services.neighborservice import neighbor_service
+from app.vectorstore.store import get_vector_store
 from app.schemas.responses import (
     MediaItemResponse,
     UploadResponse,
@@ -21,10 +24,62 @@ from app.schemas.responses import (
     MessageResponse
 )
 from app.config import settings
+from app.util.pagination import InvalidCursor
+from app.util.resilience import CircuitOpen, breaker
+from app.cache.search_cache import invalidate_media
 
 router = APIRouter(prefix="/media", tags=["media"])
 image_service = ImageService()
-es_client = ESClient()
+vector_store = get_vector_store()
+storage_breaker = breaker("storage")
+
+
+# Uploads a request stopped waiting for, kept referenced until cleaned up
+_abandoned_uploads = set()
+
+
+async def _store_upload(**upload_args) -> dict:
+    """
+    Upload to Cloudinary off the event loop, within STORAGE_CALL_TIMEOUT and
+    the request deadline. The worker thread can't be stopped, so an upload
+    the request gives up on may still complete; its asset is deleted then
+    instead of being left behind with nothing recording it.
+    """
+    upload = None
+
+    def start():
+        nonlocal upload
+        upload = asyncio.ensure_future(asyncio.to_thread(cloudinary_service.upload_image, **upload_args))
+        return asyncio.shield(upload)
+
+    try:
+        return await storage_breaker.call(start, settings.STORAGE_CALL_TIMEOUT)
+    except (TimeoutError, asyncio.CancelledError):
+        if upload is not None:
+            task = asyncio.create_task(_discard_upload(upload))
+            _abandoned_uploads.add(task)
+            task.add_done_callback(_abandoned_uploads.discard)
+        raise
+
+
+async def _discard_upload(upload: asyncio.Future):
+    """Delete the asset of an abandoned upload once it finishes."""
+    try:
+        result = await upload
+    except Exception:
+        return  # Nothing was stored
+    try:
+        await asyncio.to_thread(cloudinary_service.delete_image, result["public_id"])
+    except Exception as e:
+        print(f"Warning: Failed to delete abandoned upload {result['public_id']}: {e}")
+
+
+async def _update_neighbors(action, *args):
+    """Run a similar-item list update after the response; failures only cost freshness."""
+    try:
+        await action(*args)
+    except Exception as e:
+        print(f"Warning: Failed to update similar-item lists: {e}")
 
 
 def _image_to_media_response(
@@ -53,8 +108,9 @@ def _image_to_media_response(
     )
 
 
-@router.post("/upload", response_model=UploadResponse, status_code=201)
+@router.post("/upload", response_model=UploadResponse, status_code=201, dependencies=[Depends(admit("upload"))])
 async def upload_media(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     title: Optional[str] = Query(None, description="Media title"),
     description: Optional[str] = Query(None, description="Media description"),
@@ -70,7 +126,7 @@ async def upload_media(
     2. Upload to Cloudinary
     3. Generate CLIP embedding
     4. Save metadata to MongoDB
-    5. Index embedding in Elasticsearch
+    5. Index embedding in the vector store
 
     Returns:
         UploadResponse with media ID and URLs
@@ -95,14 +151,17 @@ async def upload_media(
     # Reset file pointer
     await file.seek(0)
 
+    # Drop the upload if it queued past its deadline, before any side effects
+    ensure_within_deadline()
+
     try:
         # Save to temporary file for Cloudinary upload
         with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_file:
             temp_file.write(file_content)
             temp_path = temp_file.name
 
-        # Upload to Cloudinary
-        upload_result = cloudinary_service.upload_image(
+        # Upload to Cloudinary, off the event loop and within the request deadline
+        upload_result = await _store_upload(
             file_path=temp_path,
             user_id=str(current_user.id),
             tags=tags.split(',') if tags else []
@@ -131,12 +190,25 @@ async def upload_media(
 
         # Save to MongoDB
         await image.insert()
+        await image_service.repo.invalidate(str(image.id))
+        await image_service.repo.invalidate_counts(image.owner_id)
 
         # Generate CLIP embedding from the temporary file
-        embedding = Image.generate_image_embedding(temp_path)
-
-        # Index in Elasticsearch
-        await es_client.index_image(str(image.id), embedding)
+        embedding = await asyncio.to_thread(Image.generate_image_embedding, temp_path)
+
+        # Index in the vector store
+        await vector_store.index_image(
+            str(image.id),
+            embedding,
+            title=image.title,
+            description=image.description,
+            tags=image.tags,
+            owner_id=image.owner_id
+        )
+        await invalidate_media(image.owner_id, [image.visibility])
+        background_tasks.add_task(
+            _update_neighbors, neighbor_service.add_image, str(image.id), image.visibility == "public"
+        )
 
         # Clean up temporary file
         os.unlink(temp_path)
@@ -156,27 +228,34 @@ async def upload_media(
         # Clean up temp file if it exists
         if 'temp_path' in locals() and os.path.exists(temp_path):
             os.unlink(temp_path)
+        if isinstance(e, (CircuitOpen, HTTPException, TimeoutError)):
+            raise
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
 @router.get("/public", response_model=PaginatedResponse)
 async def list_public_media(
     page: int = Query(1, ge=1, description="Page number"),
-    page_size: int = Query(20, ge=1, le=100, description="Items per page")
+    page_size: int = Query(20, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor")
 ):
     """
     List public media items with pagination. No authentication required.
 
+    Pass `cursor` from the previous response to page by keyset; `page` is
+    still honoured when no cursor is given.
+
     Returns:
         PaginatedResponse with public media items
     """
     try:
-        # Get public images with proper database-level pagination
-        public_images = await image_service.repo.find_public(page=page, limit=page_size)
+        public_images, next_cursor = await image_service.repo.find_public(
+            page=page,
+            limit=page_size,
+            cursor=cursor
+        )
         total = await image_service.repo.count_public()
 
-        print(f"[DEBUG] Found {len(public_images)} public images, total: {total}, page: {page}, page_size: {page_size}")
-
         items = [_image_to_media_response(img) for img in public_images]
 
         return PaginatedResponse(
@@ -184,9 +263,12 @@ async def list_public_media(
             total=total,
             page=page,
             page_size=page_size,
-            has_more=(page * page_size) < total
+            has_more=next_cursor is not None,
+            next_cursor=next_cursor
         )
 
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list public media: {str(e)}")
 
@@ -203,7 +285,7 @@ async def get_media(media_id: str):
         MediaItemResponse with full metadata
     """
     try:
-        image = await Image.get(media_id)
+        image = await image_service.repo.find_by_id(media_id)
         if not image:
             raise HTTPException(status_code=404, detail="Media not found")
 
@@ -225,7 +307,7 @@ async def get_media_file(media_id: str):
         Redirect to Cloudinary URL
     """
     try:
-        image = await Image.get(media_id)
+        image = await image_service.repo.find_by_id(media_id)
         if not image:
             raise HTTPException(status_code=404, detail="Media not found")
 
@@ -241,26 +323,29 @@ async def list_user_media(
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Items per page"),
     visibility: Optional[str] = Query(None, description="Filter by visibility"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor"),
     current_user: User = Depends(get_current_user)
 ):
     """
     List media items for the current user with pagination.
 
     Args:
-        page: Page number (1-indexed)
+        page: Page number (1-indexed), used when no cursor is given
         page_size: Number of items per page
         visibility: Optional filter by visibility (public/private)
+        cursor: Opaque keyset cursor returned as next_cursor by the previous page
 
     Returns:
         PaginatedResponse with user's media items
     """
     try:
         # Efficiently query user images from database
-        user_images = await image_service.repo.find_by_owner(
+        user_images, next_cursor = await image_service.repo.find_by_owner(
             owner_id=str(current_user.id),
             page=page,
             limit=page_size,
-            visibility=visibility
+            visibility=visibility,
+            cursor=cursor
         )
 
         # Get total count
@@ -277,9 +362,12 @@ async def list_user_media(
             total=total,
             page=page,
             page_size=page_size,
-            has_more=page * page_size < total
+            has_more=next_cursor is not None,
+            next_cursor=next_cursor
         )
 
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list media: {str(e)}")
 
@@ -287,6 +375,7 @@ async def list_user_media(
 @router.patch("/{media_id}", response_model=MediaItemResponse)
 async def update_media(
     media_id: str,
+    background_tasks: BackgroundTasks,
     title: Optional[str] = Query(None, description="New title"),
     description: Optional[str] = Query(None, description="New description"),
     tags: Optional[str] = Query(None, description="Comma-separated tags"),
@@ -316,6 +405,8 @@ async def update_media(
         if getattr(image, 'owner_id', '') != str(current_user.id):
             raise HTTPException(status_code=403, detail="You don't have permission to edit this media")
 
+        previous_visibility = image.visibility
+
         # Update fields if provided
         if title is not None:
             image.title = title
@@ -330,6 +421,20 @@ async def update_media(
 
         # Save to MongoDB
         await image.save()
+        await image_service.repo.invalidate(media_id)
+        try:
+            await vector_store.update_metadata(
+                media_id, image.title, image.description, image.tags, owner_id=image.owner_id
+            )
+        except Exception as e:
+            print(f"Warning: Failed to update indexed metadata: {e}")
+        await invalidate_media(image.owner_id, {previous_visibility, image.visibility})
+        if image.visibility != previous_visibility:
+            await image_service.repo.invalidate_counts(image.owner_id)
+            if image.visibility == "public":
+                background_tasks.add_task(_update_neighbors, neighbor_service.compute, [media_id])
+            else:
+                background_tasks.add_task(_update_neighbors, neighbor_service.remove_image, media_id)
 
         return _image_to_media_response(image)
 
@@ -342,6 +447,7 @@ async def update_media(
 @router.delete("/{media_id}", response_model=MessageResponse)
 async def delete_media(
     media_id: str,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -349,7 +455,7 @@ async def delete_media(
 
     Process:
     1. Verify ownership
-    2. Delete from Elasticsearch
+    2. Delete from the vector store
     3. Delete from Cloudinary
     4. Delete from MongoDB
 
@@ -369,21 +475,28 @@ async def delete_media(
         if getattr(image, 'owner_id', '') != str(current_user.id):
             raise HTTPException(status_code=403, detail="You don't have permission to delete this media")
 
-        # Delete from Elasticsearch
+        # Delete from the vector store
         try:
-            await es_client.delete_document(media_id)
+            await vector_store.delete_document(media_id, owner_id=image.owner_id)
         except Exception as e:
-            print(f"Warning: Failed to delete from Elasticsearch: {e}")
+            print(f"Warning: Failed to delete from the vector store: {e}")
 
         # Delete from Cloudinary
         if hasattr(image, 'cloudinary_public_id') and image.cloudinary_public_id:
             try:
-                cloudinary_service.delete_image(image.cloudinary_public_id)
+                await storage_breaker.call(
+                    lambda: asyncio.to_thread(cloudinary_service.delete_image, image.cloudinary_public_id),
+                    settings.STORAGE_CALL_TIMEOUT
+                )
             except Exception as e:
                 print(f"Warning: Failed to delete from Cloudinary: {e}")
 
         # Delete from MongoDB
         await image.delete()
+        await image_service.repo.invalidate(media_id)
+        await image_service.repo.invalidate_counts(image.owner_id)
+        await invalidate_media(image.owner_id, [image.visibility])
+        background_tasks.add_task(_update_neighbors, neighbor_service.remove_image, media_id)
 
         return MessageResponse(
             message="Media deleted successfully",
@@ -0,0 +1,26 @@
+"""
+Operational metrics for caches and other in-process components.
+Values are per worker process.
+"""
+from fastapi import APIRouter
+
+from app.cache.tiered import cache_stats
+from app.auth.passwordhasher import password_hasher
+from app.services.searchservice import coalescing_stats
+from app.util import admission, resilience
+from app.vectorstore.store import get_vector_store
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("")
+async def get_metrics():
+    """Return counters for in-process components of this worker."""
+    return {
+        "caches": cache_stats(),
+        "password_hasher": password_hasher.stats(),
+        "admission": admission.stats(),
+        "search_coalescing": coalescing_stats(),
+        "vector_store": get_vector_store().stats(),
+        "resilience": resilience.stats(),
+    }
@@ -1,17 +1,175 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Query
+from fastapi import APIRouter, Depends, UploadFile, File, Query, HTTPException, status
+from fastapi.responses import StreamingResponse
 from app.util.current_user import get_current_user
+from app.util.admission import admit
 from app.services.collectionservice import CollectionService
 from app.services.searchservice import SearchService
 from app.models.image import Image
 from app.services.imageservice import ImageService
-from app.schemas.responses import PaginatedResponse
+from app.schemas.responses import PaginatedSearchResponse, BatchSearchResponse, BatchSearchResult
+from app.config import settings
+from app.util.vectors import decode_vector, InvalidVector
+from app.util.pagination import InvalidCursor
+from app.vectorstore.store import PageExpired
+from app.util.resilience import track_partial, is_partial
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import hashlib
+import json
+import time
 
 router = APIRouter(prefix="/use", tags=["use"])
+
+
+class BatchQuery(BaseModel):
+    text: Optional[str] = None
+    media_id: Optional[str] = None
+    top_k: int = Field(20, ge=1, le=200)
+
+    @model_validator(mode="after")
+    def check_one_target(self):
+        if bool(self.text) == bool(self.media_id):
+            raise ValueError("Each query needs exactly one of text or media_id")
+        return self
+
+
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+
+def _stream_response(events: AsyncIterator[Dict], fmt: str) -> StreamingResponse:
+    """
+    Encode search events as NDJSON lines or Server-Sent Events.
+    Errors after the stream has started are sent as an "error" event.
+    """
+    def encode(event: Dict) -> str:
+        data = json.dumps(event)
+        if fmt == "sse":
+            return f"event: {event['event']}\ndata: {data}\n\n"
+        return data + "\n"
+
+    async def body():
+        try:
+            async for event in events:
+                yield encode(event)
+        except HTTPException as e:
+            yield encode({"event": "error", "status": e.status_code, "detail": e.detail})
+        except Exception as e:
+            print(f"❌ Streaming search failed: {e}")
+            yield encode({"event": "error", "status": 500, "detail": "Search failed"})
+
+    return StreamingResponse(
+        body(),
+        media_type=STREAM_MEDIA_TYPES[fmt],
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+class VectorSearchRequest(BaseModel):
+    vector: str = Field(..., description="Base64 of the little-endian float32 query embedding")
+    model: str = Field(..., description="CLIP model that produced the embedding")
+    scope: str = Field('public', pattern='^(public|private|all)$')
+    collection_id: Optional[str] = None
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchQuery] = Field(..., min_length=1, max_length=settings.SEARCH_BATCH_MAX_QUERIES)
+    scope: str = Field('public', pattern='^(public|private|all)$')
+    min_score: Optional[float] = Field(None, ge=0.0, le=1.0)
+
 coll_service = CollectionService()
 search_service = SearchService()
 image_service = ImageService()
 
 
+async def _ranked_response(
+    started: float,
+    user_id: str,
+    scope: Optional[str],
+    page: int,
+    page_size: int,
+    query_id: Optional[str],
+    cursor: Optional[str],
+    run_search: Callable[[], Awaitable[List[Dict[str, Any]]]],
+    embed: Optional[Callable[[], Awaitable[Optional[List[float]]]]] = None,
+    min_score: Optional[float] = None,
+    exclude_id: Optional[str] = None,
+    search: Optional[Dict[str, Any]] = None
+) -> PaginatedSearchResponse:
+    """
+    Serve a page of a result session, or with a cursor the page after it.
+    Past the session, page and total count the results served so far.
+    partial is set when some shards didn't answer in time. `search`
+    (see _search_params) ties the session to the request that started it.
+    """
+    try:
+        with track_partial():
+            if cursor:
+                items, offset, query_id, next_cursor = await search_service.continue_page(
+                    cursor, user_id, scope, page_size, search=search
+                )
+                page = offset // page_size + 1
+                total = offset + len(items)
+            else:
+                items, total, query_id, next_cursor = await search_service.ranked_page(
+                    query_id, user_id, scope, page, page_size, run_search,
+                    embed=embed, min_score=min_score, exclude_id=exclude_id, search=search
+                )
+            partial = is_partial()
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except PageExpired as e:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(e))
+
+    return PaginatedSearchResponse(
+        items=items,
+        total=total,
+        page=page,
+        page_size=page_size,
+        has_more=next_cursor is not None or page * page_size < total,
+        next_cursor=next_cursor,
+        queryId=query_id,
+        searchTimeMs=int((time.perf_counter() - started) * 1000),
+        partial=partial
+    )
+
+
+def _search_params(
+    endpoint: str,
+    query: Optional[str],
+    scope: Optional[str],
+    collection_id: Optional[str],
+    min_score: Optional[float],
+    **extra: Any
+) -> Dict[str, Any]:
+    """What a result session was stored for; a queryId of another search starts a new one."""
+    return {
+        "endpoint": endpoint, "query": query, "scope": scope,
+        "collection_id": collection_id, "min_score": min_score, **extra
+    }
+
+
+def _normalized(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+async def _upload_digest(file: Optional[UploadFile]) -> Optional[str]:
+    """Digest of an uploaded image, or None when later pages are requested without it."""
+    if file is None:
+        return None
+    digest = hashlib.sha1(await file.read()).hexdigest()
+    await file.seek(0)
+    return digest
+
+
+def _require_upload(file: Optional[UploadFile], query_id: Optional[str], cursor: Optional[str]):
+    if file is None and not query_id and not cursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload an image, or pass the queryId of a previous search"
+        )
+
+
 @router.get("/profile")
 async def profile(current_user=Depends(get_current_user)):
     return {"id": str(current_user.id), "email": current_user.email, "username": current_user.username}
@@ -57,112 +215,265 @@ async def add_image_to_collection(collection_id: str, image_id: str, current_use
         return {"error": "Image not found"}
     return {"error": "Collection not found in your profile"}
 
-@router.post("/search/text")
+@router.post("/search/text", dependencies=[Depends(admit("search"))])
 async def search_text(
     query: str,
     scope: str = Query('public', regex='^(public|private|all)$'),
     collection_id: str = Query(None),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    query_id: str = Query(None),
+    cursor: str = Query(None, description="next_cursor of a previous response, to page past the result session"),
+    min_score: float = Query(None, ge=0.0, le=1.0),
+    retrieval: str = Query(None, regex='^(vector|rrf|linear)$'),
     current_user=Depends(get_current_user)
 ):
     """
     Search by text query with pagination.
     Returns media items matching the text query.
     Optionally filter by collection_id to search within a specific collection.
+    Pass the queryId of a previous response to page through its results
+    without re-running the search.
+    retrieval overrides SEARCH_RETRIEVAL_MODE: vector (CLIP only), or rrf /
+    linear to fuse it with keyword matching on title, description and tags.
+    min_score (0-1, default DEFAULT_SIMILARITY_THRESHOLD) drops weaker
+    matches inside Elasticsearch, before they are fetched or hydrated.
+    The page that reaches the end of the session's results carries a
+    next_cursor (vector retrieval without a collection only); pass it as
+    cursor to keep paging through the whole index.
     """
+    started = time.perf_counter()
+    user_id = str(current_user.id)
+
     # Fetch a fixed large set of similar results (enough for most use cases)
     # This prevents fetching different result sets for each page and avoids
     # loading non-similar results when similarity results are exhausted
     max_similar_results = 200
 
-    results = await search_service.search_by_text(query, top_k=max_similar_results)
-
-    # Filter by collection if collection_id is provided
-    if collection_id:
-        collection = await coll_service.get_collection_by_id(collection_id)
-        if collection and collection.images:
-            # Get set of media IDs in this collection
-            collection_media_ids = {str(img.id) for img in collection.images}
-            # Filter results to only include media in this collection
-            results = [r for r in results if r.get('id') in collection_media_ids]
-
-    # Filter by scope
-    if scope == 'public':
-        results = [r for r in results if r.get('visibility') == 'public']
-    elif scope == 'private':
-        results = [r for r in results if r.get('owner_id') == str(current_user.id)]
-
-    # Paginate the fixed result set
-    total = len(results)
-    start_idx = (page - 1) * page_size
-    end_idx = start_idx + page_size
-    items = results[start_idx:end_idx]
-
-    return PaginatedResponse(
-        items=items,
-        total=total,
-        page=page,
-        page_size=page_size,
-        has_more=end_idx < total
+    async def run_search():
+        # Scoped results are cached until an upload, edit, delete or collection
+        # change invalidates them
+        return await search_service.search_text_scoped(
+            query,
+            scope=scope,
+            user_id=user_id,
+            collection_id=collection_id,
+            top_k=max_similar_results,
+            retrieval=retrieval,
+            min_score=min_score
+        )
+
+    async def embed():
+        return await search_service.text_embedding(query)
+
+    # Only the plain vector ranking of the whole index can be continued
+    continuable = not collection_id and (retrieval or settings.SEARCH_RETRIEVAL_MODE) == "vector"
+    search = _search_params(
+        "text", _normalized(query), scope, collection_id, min_score,
+        retrieval=retrieval or settings.SEARCH_RETRIEVAL_MODE
+    )
+    return await _ranked_response(
+        started, user_id, scope, page, page_size, query_id, cursor, run_search,
+        embed=embed if continuable else None, min_score=min_score, search=search
     )
 
-@router.post("/search/image")
+@router.post("/search/image", dependencies=[Depends(admit("search"))])
 async def search_image(
-    file: UploadFile = File(...),
+    file: UploadFile = File(None),
     scope: str = Query('public', regex='^(public|private|all)$'),
     collection_id: str = Query(None),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    query_id: str = Query(None),
+    cursor: str = Query(None, description="next_cursor of a previous response, to page past the result session"),
+    min_score: float = Query(None, ge=0.0, le=1.0),
     current_user=Depends(get_current_user)
 ):
     """
     Search by image with pagination.
     Upload an image to find visually similar media items.
     Optionally filter by collection_id to search within a specific collection.
+    Later pages can be requested with the queryId of the first response
+    instead of uploading the image again, and pages past its results with
+    next_cursor (without a collection).
     """
+    started = time.perf_counter()
+    user_id = str(current_user.id)
+
     # Fetch a fixed large set of similar results (enough for most use cases)
     # This prevents fetching different result sets for each page and avoids
     # loading non-similar results when similarity results are exhausted
     max_similar_results = 200
 
-    image_data = await file.read()
-    results = await search_service.search_by_image(image_data, top_k=max_similar_results)
-
-    # Filter by collection if collection_id is provided
-    if collection_id:
-        collection = await coll_service.get_collection_by_id(collection_id)
-        if collection and collection.images:
-            # Get set of media IDs in this collection
-            collection_media_ids = {str(img.id) for img in collection.images}
-            # Filter results to only include media in this collection
-            results = [r for r in results if r.get('id') in collection_media_ids]
-
-    # Filter by scope
-    if scope == 'public':
-        results = [r for r in results if r.get('visibility') == 'public']
-    elif scope == 'private':
-        results = [r for r in results if r.get('owner_id') == str(current_user.id)]
-
-    # Paginate the fixed result set
-    total = len(results)
-    start_idx = (page - 1) * page_size
-    end_idx = start_idx + page_size
-    items = results[start_idx:end_idx]
-
-    return PaginatedResponse(
-        items=items,
-        total=total,
-        page=page,
-        page_size=page_size,
-        has_more=end_idx < total
+    _require_upload(file, query_id, cursor)
+    search = _search_params("image", await _upload_digest(file), scope, collection_id, min_score)
+
+    async def run_search():
+        if file is None:
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Search session expired, please upload the image again"
+            )
+        image_data = await file.read()
+
+        # Small scopes (a collection, a private library) are ranked exactly;
+        # otherwise the global results are restricted to the scope
+        return await search_service.search_image_scoped(
+            image_data,
+            scope=scope,
+            user_id=user_id,
+            collection_id=collection_id,
+            top_k=max_similar_results,
+            min_score=min_score
+        )
+
+    async def embed():
+        await file.seek(0)
+        return await search_service.image_embedding(await file.read())
+
+    return await _ranked_response(
+        started, user_id, scope, page, page_size, query_id, cursor, run_search,
+        embed=None if collection_id else embed, min_score=min_score, search=search
     )
 
-@router.get("/search/similar/{media_id}")
+@router.post("/search/composite", dependencies=[Depends(admit("search"))])
+async def search_composite(
+    query: str,
+    file: UploadFile = File(None),
+    text_weight: float = Query(0.5, ge=0.0, le=1.0),
+    scope: str = Query('public', regex='^(public|private|all)$'),
+    collection_id: str = Query(None),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    query_id: str = Query(None),
+    cursor: str = Query(None, description="next_cursor of a previous response, to page past the result session"),
+    min_score: float = Query(None, ge=0.0, le=1.0),
+    current_user=Depends(get_current_user)
+):
+    """
+    Search by an image refined with text, as one fused vector query.
+    text_weight sets how much the text counts against the image (0 = image only,
+    1 = text only). Later pages can be requested with the queryId of the
+    first response instead of uploading the image again, and pages past its
+    results with next_cursor (without a collection).
+    """
+    started = time.perf_counter()
+    user_id = str(current_user.id)
+
+    # Fetch a fixed large set of similar results (enough for most use cases)
+    max_similar_results = 200
+
+    _require_upload(file, query_id, cursor)
+    search = _search_params(
+        "composite", await _upload_digest(file), scope, collection_id, min_score,
+        text=_normalized(query), text_weight=text_weight
+    )
+
+    async def run_search():
+        if file is None:
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Search session expired, please upload the image again"
+            )
+        image_data = await file.read()
+        try:
+            results = await search_service.search_composite(
+                query, image_data, text_weight=text_weight, top_k=max_similar_results, min_score=min_score
+            )
+        except InvalidVector as e:
+            # e.g. text and image pull in exactly opposite directions
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return await search_service.filter_results(
+            results,
+            scope=scope,
+            user_id=user_id,
+            collection_id=collection_id
+        )
+
+    async def embed():
+        await file.seek(0)
+        try:
+            return await search_service.composite_embedding(query, await file.read(), text_weight)
+        except InvalidVector as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return await _ranked_response(
+        started, user_id, scope, page, page_size, query_id, cursor, run_search,
+        embed=None if collection_id else embed, min_score=min_score, search=search
+    )
+
+@router.get("/search/vector/info")
+async def vector_search_info(current_user=Depends(get_current_user)):
+    """Model and dimension a vector passed to /search/vector must match."""
+    return {
+        "model": settings.DEFAULT_CLIP_MODEL,
+        "dims": search_service.vector_store.embedding_dims,
+        "encoding": "base64 little-endian float32"
+    }
+
+@router.post("/search/vector", dependencies=[Depends(admit("search"))])
+async def search_vector(
+    request: VectorSearchRequest,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    query_id: str = Query(None),
+    cursor: str = Query(None, description="next_cursor of a previous response, to page past the result session"),
+    min_score: float = Query(None, ge=0.0, le=1.0),
+    current_user=Depends(get_current_user)
+):
+    """
+    Search with an embedding computed by the client (no server-side inference).
+    The vector must come from the same CLIP model as the index and have the
+    index's dimension; see /search/vector/info. Without a collection_id,
+    next_cursor pages past the first results.
+    """
+    started = time.perf_counter()
+    user_id = str(current_user.id)
+
+    if request.model != settings.DEFAULT_CLIP_MODEL:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Vector was produced by {request.model}, the index uses {settings.DEFAULT_CLIP_MODEL}"
+        )
+    try:
+        query_embedding = decode_vector(request.vector, search_service.vector_store.embedding_dims)
+    except InvalidVector as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # Fetch a fixed large set of similar results (enough for most use cases)
+    max_similar_results = 200
+
+    async def run_search():
+        results = await search_service.search_by_vector(
+            query_embedding, top_k=max_similar_results, min_score=min_score
+        )
+        return await search_service.filter_results(
+            results,
+            scope=request.scope,
+            user_id=user_id,
+            collection_id=request.collection_id
+        )
+
+    async def embed():
+        return query_embedding
+
+    search = _search_params(
+        "vector", hashlib.sha1(request.vector.encode()).hexdigest(),
+        request.scope, request.collection_id, min_score
+    )
+    return await _ranked_response(
+        started, user_id, request.scope, page, page_size, query_id, cursor, run_search,
+        embed=None if request.collection_id else embed, min_score=min_score, search=search
+    )
+
+@router.get("/search/similar/{media_id}", dependencies=[Depends(admit("search"))])
 async def find_similar(
     media_id: str,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    query_id: str = Query(None),
+    cursor: str = Query(None, description="next_cursor of a previous response, to page past the result session"),
+    min_score: float = Query(None, ge=0.0, le=1.0),
     current_user=Depends(get_current_user)
 ):
     """
@@ -172,30 +483,130 @@ async def find_similar(
         media_id: The ID of the media item to find similar items for
         page: Page number for pagination
         page_size: Number of items per page
+        query_id: queryId of a previous response, to page without re-searching
+        cursor: next_cursor of a previous response, to page past its results
 
     Returns:
         Paginated list of similar media items
     """
+    started = time.perf_counter()
+
     # Fetch a fixed large set of similar results (enough for most use cases)
     # This prevents fetching different result sets for each page
     max_similar_results = 200
 
-    results = await search_service.search_by_media_id(media_id, top_k=max_similar_results)
+    user_id = str(current_user.id)
 
-    # Total available similar items
-    total = len(results)
+    async def run_search():
+        results = await search_service.search_by_media_id(
+            media_id, top_k=max_similar_results, min_score=min_score
+        )
+        # Public media plus the user's own; later pages are re-checked against the same scope
+        return await search_service.filter_results(results, scope="all", user_id=user_id)
 
-    # Paginate the fixed result set
-    start_idx = (page - 1) * page_size
-    end_idx = start_idx + page_size
-    items = results[start_idx:end_idx]
+    return await _ranked_response(
+        started, user_id, "all", page, page_size, query_id, cursor, run_search,
+        embed=lambda: search_service.media_embedding(media_id), min_score=min_score, exclude_id=media_id,
+        search=_search_params("similar", media_id, "all", None, min_score)
+    )
 
-    return PaginatedResponse(
-        items=items,
-        total=total,
-        page=page,
-        page_size=page_size,
-        has_more=end_idx < total
+@router.get("/search/text/stream", dependencies=[Depends(admit("search"))])
+async def search_text_stream(
+    query: str,
+    scope: str = Query('public', regex='^(public|private|all)$'),
+    collection_id: str = Query(None),
+    top_k: int = Query(200, ge=1, le=200),
+    chunk_size: int = Query(20, ge=1, le=100),
+    format: str = Query('ndjson', regex='^(ndjson|sse)$'),
+    min_score: float = Query(None, ge=0.0, le=1.0),
+    current_user=Depends(get_current_user)
+):
+    """
+    Streaming text search.
+    Sends stage timings and then result cards chunk by chunk as NDJSON or
+    Server-Sent Events, so the first results can be rendered before the
+    whole ranking is hydrated.
+    """
+    events = search_service.stream_search(
+        lambda: search_service.text_embedding(query),
+        top_k=top_k,
+        scope=scope,
+        user_id=str(current_user.id),
+        collection_id=collection_id,
+        chunk_size=chunk_size,
+        min_score=min_score
+    )
+    return _stream_response(events, format)
+
+@router.post("/search/image/stream", dependencies=[Depends(admit("search"))])
+async def search_image_stream(
+    file: UploadFile = File(...),
+    scope: str = Query('public', regex='^(public|private|all)$'),
+    collection_id: str = Query(None),
+    top_k: int = Query(200, ge=1, le=200),
+    chunk_size: int = Query(20, ge=1, le=100),
+    format: str = Query('ndjson', regex='^(ndjson|sse)$'),
+    min_score: float = Query(None, ge=0.0, le=1.0),
+    current_user=Depends(get_current_user)
+):
+    """Streaming image search; same events as the streaming text search."""
+    # Read the upload now, it is closed once the handler returns
+    image_data = await file.read()
+    events = search_service.stream_search(
+        lambda: search_service.image_embedding(image_data),
+        top_k=top_k,
+        scope=scope,
+        user_id=str(current_user.id),
+        collection_id=collection_id,
+        chunk_size=chunk_size,
+        min_score=min_score
+    )
+    return _stream_response(events, format)
+
+@router.get("/search/similar/{media_id}/stream", dependencies=[Depends(admit("search"))])
+async def find_similar_stream(
+    media_id: str,
+    top_k: int = Query(200, ge=1, le=200),
+    chunk_size: int = Query(20, ge=1, le=100),
+    format: str = Query('ndjson', regex='^(ndjson|sse)$'),
+    min_score: float = Query(None, ge=0.0, le=1.0),
+    current_user=Depends(get_current_user)
+):
+    """
+    Streaming similar-media search; same events as the streaming text search.
+    Like /search/similar, only public media and the user's own are streamed.
+    """
+    events = search_service.stream_search(
+        lambda: search_service.media_embedding(media_id),
+        top_k=top_k,
+        scope="all",
+        user_id=str(current_user.id),
+        exclude_id=media_id,
+        chunk_size=chunk_size,
+        min_score=min_score
+    )
+    return _stream_response(events, format)
+
+@router.post("/search/batch", dependencies=[Depends(admit("search"))])
+async def search_batch(request: BatchSearchRequest, current_user=Depends(get_current_user)):
+    """
+    Run several text and/or media-id searches in one request.
+    Text queries are embedded together and all vector queries go to
+    Elasticsearch in a single round trip. Results are returned per query,
+    in request order, restricted to the requested scope.
+    """
+    started = time.perf_counter()
+
+    results = await search_service.search_batch(
+        [query.model_dump() for query in request.queries],
+        scope=request.scope,
+        user_id=str(current_user.id),
+        min_score=request.min_score
+    )
+
+    return BatchSearchResponse(
+        results=[BatchSearchResult(items=items, total=len(items)) for items in results],
+        searchTimeMs=int((time.perf_counter() - started) * 1000)
     )
 
 @router.get("/images")
@@ -76,6 +76,7 @@ class PaginatedResponse(BaseModel):
     page: int = Field(..., description="Current page number")
     page_size: int = Field(..., description="Items per page")
     has_more: bool = Field(..., description="Whether more pages exist")
+    next_cursor: Optional[str] = Field(None, description="Opaque cursor for the next page, if any")
 
     class Config:
         json_schema_extra = {
@@ -84,7 +85,28 @@ class PaginatedResponse(BaseModel):
                 "total": 42,
                 "page": 1,
                 "page_size": 20,
-                "has_more": True
+                "has_more": True,
+                "next_cursor": "eyJjIjoiMjAyNS0xMi0xMVQxMjowMDowMCIsImkiOiI1MDdmMWY3N2JjZjg2Y2Q3OTk0MzkwMTEifQ"
+            }
+        }
+
+
+class PaginatedSearchResponse(PaginatedResponse):
+    """Paginated search results with the ranked result session they came from."""
+    queryId: str = Field(..., description="Pass as query_id to fetch further pages without re-running the search")
+    searchTimeMs: Optional[int] = Field(None, description="Server time spent on this page in milliseconds")
+    partial: bool = Field(False, description="Some index shards did not answer in time; results may be incomplete")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "items": [],
+                "total": 180,
+                "page": 2,
+                "page_size": 20,
+                "has_more": True,
+                "queryId": "q_3f9a1c0e5b7d4e2f8a6c1b0d9e7f5a3c",
+                "searchTimeMs": 12
             }
         }
 
@@ -107,6 +129,26 @@ class SearchResponse(BaseModel):
         }
 
 
+class BatchSearchResult(BaseModel):
+    """Results of one query in a batch search."""
+    items: List[MediaItemResponse] = Field(..., description="Search result items")
+    total: int = Field(..., description="Number of items returned for this query")
+
+
+class BatchSearchResponse(BaseModel):
+    """Response model for batch search, one result per query in request order."""
+    results: List[BatchSearchResult] = Field(..., description="Per-query results")
+    searchTimeMs: Optional[int] = Field(None, description="Search time in milliseconds")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "results": [{"items": [], "total": 0}],
+                "searchTimeMs": 85
+            }
+        }
+
+
 class TokenResponse(BaseModel):
     """Response model for authentication tokens."""
     accessToken: str = Field(..., description="JWT access token")
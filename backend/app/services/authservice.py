@@ -1,5 +1,5 @@
 from app.repositories.userrepository import UserRepository
-from app.auth.passwordhasher import PasswordHasher
+from app.auth.passwordhasher import password_hasher
 from app.auth.jwt import JwtHandler
 from app.models.user import User
 from app.cache.redis_client import redis_client
@@ -12,7 +12,7 @@ class AuthService:
     def __init__(self):
         self.repo = UserRepository()
         self.jwt_handler = JwtHandler()
-        self.hasher = PasswordHasher()
+        self.hasher = password_hasher
         self.email_service = email_service
 
     async def register(self, username: str, email: str, password: str):
@@ -23,7 +23,7 @@ class AuthService:
             raise Exception("Email already used")
         
         
-        hashed =  self.hasher.hash(password)
+        hashed = await self.hasher.hash(password)
 
         user = User(
             username=username,
@@ -42,12 +42,18 @@ class AuthService:
                 detail="Invalid email or password"
             )
 
-        if not self.hasher.verify(password, user.password_hash):
+        valid, new_hash = await self.hasher.verify_and_update(password, user.password_hash)
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid email or password"
             )
 
+        # Upgrade hashes made with older argon2 cost parameters
+        if new_hash:
+            user.password_hash = new_hash
+            await user.save()
+
         token = self.jwt_handler.encode_token({"user_id": str(user.id)})
 
         return {"token": token, "user": user}
@@ -104,7 +110,7 @@ class AuthService:
             )
 
         # Hash new password
-        hashed_password = self.hasher.hash(new_password)
+        hashed_password = await self.hasher.hash(new_password)
 
         # Update password
         user.password_hash = hashed_password
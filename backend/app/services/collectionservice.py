@@ -1,5 +1,6 @@
 from app.models.collection import Collection
 from app.repositories.collectionrepository import CollectionRepository
+from app.cache.search_cache import invalidate_collection
 
 class CollectionService:
     def __init__(self):
@@ -16,10 +17,14 @@ class CollectionService:
         return await self.repo.find_by_id(id)
 
     async def update_collection(self, collection: Collection):
-        return await self.repo.update(collection)
+        updated = await self.repo.update(collection)
+        await invalidate_collection(str(collection.id))
+        return updated
 
     async def delete_collection(self, id: str):
-        return await self.repo.delete(id)
+        deleted = await self.repo.delete(id)
+        await invalidate_collection(id)
+        return deleted
     
     async def add_collection_to_user(self, user, collection: Collection):
         if not user.collections:
@@ -1,17 +1,17 @@
 from app.models.image import Image
 from app.repositories.imagerepository import ImageRepository
-from app.elasticsearch.client import ESClient
+from app.vectorstore.store import get_vector_store
 
 class ImageService:
     def __init__(self):
         self.repo = ImageRepository()
-        self.es_client = ESClient()
+        self.vector_store = get_vector_store()
 
     async def create_image(self, title: str, description: str, file_path: str):
         img = Image(title=title, description=description, file_path=file_path)
         inserted_img = await self.repo.insert(img)
         embedding = inserted_img.generate_embedding()
-        await self.es_client.index_image(str(inserted_img.id), embedding)
+        await self.vector_store.index_image(str(inserted_img.id), embedding, owner_id=inserted_img.owner_id)
         return inserted_img
 
 
@@ -0,0 +1,139 @@
+"""
+Precomputed nearest-neighbour lists for "similar items".
+
+Lists are built for public images by scripts/compute_neighbors.py (batched
+_msearch over the stored embeddings) and kept current incrementally: an
+upload only touches the new image's list and the lists it now ranks in,
+and deleting an image or making it private strips it from them. Lists can
+rank private images, since the vector index holds every image; the similar
+search keeps only public ones and the user's own.
+"""
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from app.config import settings
+from app.vectorstore.store import VectorStore, get_vector_store
+from app.models.neighbors import Neighbors, SCORE_SCALE
+from app.repositories.imagerepository import ImageRepository
+from app.repositories.neighborrepository import NeighborRepository
+
+
+class NeighborService:
+    def __init__(self, vector_store: VectorStore = None):
+        self.repo = NeighborRepository()
+        self.images = ImageRepository()
+        self.vector_store = vector_store or get_vector_store()
+        self.top_k = settings.NEIGHBORS_TOP_K
+        self.batch_size = settings.NEIGHBORS_BATCH_SIZE
+
+    async def neighbors_for(
+        self,
+        media_id: str,
+        top_k: int,
+        min_score: Optional[float] = None
+    ) -> Optional[List[Tuple[str, float]]]:
+        """
+        Precomputed (neighbour id, score) pairs scoring at least min_score,
+        if a fresh list covers top_k; else None.
+        """
+        neighbors = await self.repo.find_fresh(media_id)
+        if neighbors is None or neighbors.top_k < top_k:
+            return None
+        hits = list(zip(neighbors.neighbor_ids, neighbors.scores))[:top_k]
+        return [(img_id, score) for img_id, score in hits if score >= (min_score or 0.0)]
+
+    def _build(self, media_id: str, hits: List[Tuple[str, float]]) -> Neighbors:
+        hits = [(img_id, score) for img_id, score in hits if img_id != media_id][:self.top_k]
+        return Neighbors(
+            media_id=media_id,
+            neighbor_ids=[img_id for img_id, _ in hits],
+            scores=[score for _, score in hits],
+            score_scale=SCORE_SCALE,
+            top_k=self.top_k,
+            model=settings.DEFAULT_CLIP_MODEL,
+            computed_at=datetime.utcnow()
+        )
+
+    async def _search(self, media_ids: List[str]) -> List[Neighbors]:
+        """Neighbour lists for indexed media ids, one _msearch per batch."""
+        embeddings = await self.vector_store.get_embeddings(media_ids)
+        media_ids = [media_id for media_id in media_ids if media_id in embeddings]
+        lists = []
+        for start in range(0, len(media_ids), self.batch_size):
+            batch = media_ids[start:start + self.batch_size]
+            hits = await self.vector_store.msearch_similar(
+                [embeddings[media_id] for media_id in batch],
+                # One extra hit for the item itself
+                [self.top_k + 1] * len(batch),
+                with_scores=True
+            )
+            lists += [self._build(media_id, item_hits) for media_id, item_hits in zip(batch, hits)]
+        return lists
+
+    async def compute(self, media_ids: List[str]) -> int:
+        """Rebuild and store the lists of the given media ids; returns how many were stored."""
+        lists = await self._search(media_ids)
+        await self.repo.upsert_many(lists)
+        return len(lists)
+
+    async def refresh_all(self, page_size: int = 500, stale_only: bool = False) -> int:
+        """Rebuild the lists of every public image (or only missing/stale ones)."""
+        total = 0
+        after = None
+        while True:
+            media_ids = await self.images.public_ids(after=after, limit=page_size)
+            if not media_ids:
+                return total
+            after = media_ids[-1]
+            if stale_only:
+                existing = await self.repo.find_many(media_ids)
+                media_ids = [m for m in media_ids if not self.repo.is_fresh(existing.get(m))]
+            total += await self.compute(media_ids)
+            print(f"   {total} neighbour lists written")
+
+    async def add_image(self, media_id: str, public: bool):
+        """
+        Account for a newly indexed image: store its own list (public images
+        only) and insert it into the lists of its neighbours where it now
+        ranks within their top_k.
+        """
+        lists = await self._search([media_id])
+        if not lists:
+            return
+        own = lists[0]
+        updated = [own] if public else []
+
+        existing = await self.repo.find_many(own.neighbor_ids)
+        for neighbor_id, score in zip(own.neighbor_ids, own.scores):
+            neighbors = existing.get(neighbor_id)
+            if neighbors is None or media_id in neighbors.neighbor_ids:
+                continue
+            if len(neighbors.neighbor_ids) >= neighbors.top_k and score <= neighbors.scores[-1]:
+                continue
+            # Scores are sorted best first
+            position = next((i for i, s in enumerate(neighbors.scores) if s < score), len(neighbors.scores))
+            neighbors.neighbor_ids.insert(position, media_id)
+            neighbors.scores.insert(position, score)
+            del neighbors.neighbor_ids[neighbors.top_k:]
+            del neighbors.scores[neighbors.top_k:]
+            updated.append(neighbors)
+
+        await self.repo.upsert_many(updated)
+
+    async def remove_image(self, media_id: str):
+        """
+        Account for an image that was deleted or made private: drop its own
+        list and strip it from the lists it ranks in. Those lists stay one
+        short until they are next rebuilt.
+        """
+        await self.repo.delete(media_id)
+        lists = await self.repo.find_containing(media_id)
+        for neighbors in lists:
+            position = neighbors.neighbor_ids.index(media_id)
+            del neighbors.neighbor_ids[position]
+            del neighbors.scores[position]
+        await self.repo.upsert_many(lists)
+
+
+# Global instance used by the media routes and the search service
+neighbor_service = NeighborService()
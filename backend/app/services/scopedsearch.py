@@ -0,0 +1,95 @@
+"""
+Exact in-memory search for small scopes: one collection or one user's
+private library.
+
+The member vectors of a scope are fetched from the vector store once
+(_mget on Elasticsearch) and cached as a row-normalized float32 matrix.
+The cache key embeds the scope's search-cache generation, which is bumped
+whenever membership or visibility changes, so a stale matrix is never used. Ranking is then a
+single matrix-vector product over every member: complete results, unlike
+intersecting a global top-k with the scope.
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.cache.search_cache import search_cache
+from app.cache.serializers import PickleSerializer
+from app.cache.tiered import TieredCache
+from app.config import settings
+from app.vectorstore.store import VectorStore, get_vector_store
+from app.models.image import Image
+from app.repositories.collectionrepository import CollectionRepository
+from app.util.vectors import normalize_rows, rank_exact
+
+# Cached value for scopes over the size limit, so they aren't re-counted
+TOO_LARGE = {"too_large": True}
+
+
+class ScopedVectorIndex:
+    def __init__(self, vector_store: VectorStore = None, max_size: int = settings.SCOPED_SEARCH_MAX_SIZE):
+        self.vector_store = vector_store or get_vector_store()
+        self.collection_repo = CollectionRepository()
+        self.max_size = max_size
+        self.cache = TieredCache(
+            "scope_vectors",
+            serializer=PickleSerializer(),
+            ttl=settings.SCOPED_SEARCH_CACHE_TTL,
+            # Keys change with every membership change, so entries never go stale
+            local_ttl=settings.SCOPED_SEARCH_CACHE_TTL,
+            local_max_bytes=settings.SCOPED_SEARCH_CACHE_MAX_BYTES,
+        )
+
+    @staticmethod
+    def scope_key(scope: str, user_id: str, collection_id: Optional[str]) -> Optional[str]:
+        """Generation scope the search is confined to, or None if it isn't small by nature."""
+        if collection_id:
+            return f"collection:{collection_id}"
+        if scope == "private":
+            return f"user:{user_id}"
+        return None
+
+    async def _member_ids(self, scope_key: str) -> Optional[List[str]]:
+        """Ids in the scope, or None if there are more than max_size."""
+        kind, scope_id = scope_key.split(":", 1)
+        if kind == "collection":
+            collection = await self.collection_repo.find_by_id(scope_id)
+            ids = [str(img.id) for img in (collection.images or [])] if collection else []
+        else:
+            cursor = Image.get_pymongo_collection().find({"owner_id": scope_id}, {"_id": 1}).limit(self.max_size + 1)
+            ids = [str(doc["_id"]) async for doc in cursor]
+        return ids if len(ids) <= self.max_size else None
+
+    async def _build(self, scope_key: str) -> dict:
+        ids = await self._member_ids(scope_key)
+        if ids is None:
+            return TOO_LARGE
+        # A private library lives on its owner's shard in an owner-routed index
+        owner_id = scope_key.split(":", 1)[1] if scope_key.startswith("user:") else None
+        embeddings = await self.vector_store.get_embeddings(ids, owner_id=owner_id)
+        ids = [img_id for img_id in ids if img_id in embeddings]
+        matrix = np.asarray([embeddings[img_id] for img_id in ids], dtype=np.float32)
+        return {"ids": ids, "matrix": normalize_rows(matrix) if len(ids) else matrix}
+
+    async def load(self, scope: str, user_id: str, collection_id: Optional[str]) -> Optional[dict]:
+        """
+        The scope's {"ids", "matrix"}, built on first use, or None when the
+        scope is not eligible (not confined, or larger than max_size) and the
+        caller should use the global index instead.
+        """
+        scope_key = self.scope_key(scope, user_id, collection_id)
+        if scope_key is None:
+            return None
+        generation = (await search_cache.generations([scope_key]))[scope_key]
+        key = f"{scope_key}|{generation}|{settings.DEFAULT_CLIP_MODEL}"
+
+        data = await self.cache.get_or_load(key, lambda: self._build(scope_key))
+        return None if data.get("too_large") else data
+
+    @staticmethod
+    def rank(data: dict, query_embedding: List[float], top_k: int, min_score: float) -> List[Tuple[str, float]]:
+        """Exact (id, score) hits over every member of a loaded scope, best first."""
+        return rank_exact(data["ids"], data["matrix"], query_embedding, top_k, min_score)
+
+# Global instance shared by every SearchService
+scoped_index = ScopedVectorIndex()
@@ -1,117 +1,750 @@
 from app.models.image import Image
 from app.repositories.imagerepository import ImageRepository
-from app.elasticsearch.client import ESClient
-from typing import List, Dict, Any
+from app.repositories.collectionrepository import CollectionRepository
+from app.vectorstore.store import get_vector_store
+from app.services.neighborservice import neighbor_service
+from app.services.scopedsearch import scoped_index
+from app.cache.search_cache import search_cache, session_cache, embedding_cache, result_scopes
+from app.cache.tiered import MISS
+from app.cache.singleflight import SingleFlight
+from app.config import settings
+from app.util.admission import ensure_within_deadline
+from app.util.pagination import InvalidCursor, SearchCursor, encode_search_cursor, decode_search_cursor
+from app.util.resilience import is_partial, mark_partial, partial_reasons, track_partial
+from app.util.vectors import combine_vectors
+from app.vectorstore.store import PageExpired
+from typing import List, Dict, Any, Optional, Set, Tuple, Callable, Awaitable, AsyncIterator
+import asyncio
+import hashlib
 import tempfile
+import time
+import uuid
 import os
 
+# Concurrent identical work is collapsed into one execution per process.
+# Results are shared between callers and must not be mutated. A run that
+# times out or is cancelled on its first caller's account is re-run for the
+# other callers rather than failing them too.
+_flights = {
+    "search": SingleFlight(),
+    "embedding": SingleFlight(),
+    "hydrate": SingleFlight(),
+}
+
+# Vector store pages read per cursor request when scope filtering or
+# already-served ids leave the page short
+MAX_PAGE_FETCHES = 3
+
+
+async def _coalesced(key, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Run a search once for concurrent identical callers. The shared run has
+    a context of its own, so shards it reports missing are collected there,
+    returned with its results and marked partial for every caller.
+    """
+    async def run():
+        with track_partial():
+            return await fn(), partial_reasons()
+
+    results, reasons = await _flights["search"].do(key, run)
+    for reason in reasons:
+        mark_partial(reason)
+    return results
+
+
+def coalescing_stats() -> Dict[str, dict]:
+    """Single-flight counters (calls, shared, retried, dedup_ratio) per stage."""
+    return {stage: flight.stats() for stage, flight in _flights.items()}
+
+
 class SearchService:
     def __init__(self):
         self.repo = ImageRepository()
-        self.es_client = ESClient()
-
-    async def search_by_text(self, query: str, top_k: int = 10) -> List[Dict[str, Any]]:
-        query_embedding = Image.generate_text_embedding(query)
-        image_ids = await self.es_client.search_similar(query_embedding, top_k)
-        images = []
-        for img_id in image_ids:
-            img = await self.repo.find_by_id(img_id)
-            if img:
-                images.append({
-                    "id": str(img.id),
-                    "filename": img.title or "Untitled",
-                    "title": img.title,
-                    "description": img.description,
-                    "mediaUrl": img.file_path or "",
-                    "thumbnailUrl": img.thumbnail_url or img.file_path or "",
-                    "mediaType": "image",
-                    "fileSize": img.file_size or 0,
-                    "uploadDate": img.created_at.isoformat() if img.created_at else "",
-                    "tags": img.tags or [],
-                    "visibility": img.visibility or "public",
-                    "ownerId": str(img.owner_id) if img.owner_id else ""
-                })
-        return images
-
-    async def search_by_image(self, image_file: bytes, top_k: int = 10) -> List[Dict[str, Any]]:
-        # Save temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as temp_file:
-            temp_file.write(image_file)
-            temp_path = temp_file.name
-        try:
-            query_embedding = Image.generate_image_embedding(temp_path)
-            image_ids = await self.es_client.search_similar(query_embedding, top_k)
-            images = []
-            for img_id in image_ids:
-                img = await self.repo.find_by_id(img_id)
-                if img:
-                    images.append({
-                        "id": str(img.id),
-                        "filename": img.title or "Untitled",
-                        "title": img.title,
-                        "description": img.description,
-                        "mediaUrl": img.file_path or "",
-                        "thumbnailUrl": img.thumbnail_url or img.file_path or "",
-                        "mediaType": "image",
-                        "fileSize": img.file_size or 0,
-                        "uploadDate": img.created_at.isoformat() if img.created_at else "",
-                        "tags": img.tags or [],
-                        "visibility": img.visibility or "public",
-                        "ownerId": str(img.owner_id) if img.owner_id else ""
-                    })
-            return images
-        finally:
-            os.unlink(temp_path)
-
-    async def search_by_media_id(self, media_id: str, top_k: int = 10) -> List[Dict[str, Any]]:
+        self.collection_repo = CollectionRepository()
+        self.vector_store = get_vector_store()
+        # Keeps background prefetch tasks referenced until they finish
+        self._background = set()
+
+    @staticmethod
+    def _to_result(img: Image) -> Dict[str, Any]:
+        return {
+            "id": str(img.id),
+            "filename": img.title or "Untitled",
+            "title": img.title,
+            "description": img.description,
+            "mediaUrl": img.file_path or "",
+            "thumbnailUrl": img.thumbnail_url or img.file_path or "",
+            "mediaType": "image",
+            "fileSize": img.file_size or 0,
+            "uploadDate": img.created_at.isoformat() if img.created_at else "",
+            "tags": img.tags or [],
+            "visibility": img.visibility or "public",
+            "ownerId": str(img.owner_id) if img.owner_id else ""
+        }
+
+    async def _hydrate(self, image_ids: List[str]) -> List[Dict[str, Any]]:
+        """Load metadata for ranked ids in one batch, preserving rank order."""
+        async def load():
+            images = await self.repo.find_by_ids(image_ids)
+            return [self._to_result(images[img_id]) for img_id in image_ids if img_id in images]
+
+        return await _flights["hydrate"].do(("ids", tuple(image_ids)), load)
+
+    async def _hydrate_hits(self, hits: List[Tuple[str, Optional[float]]]) -> List[Dict[str, Any]]:
+        """Hydrate (id, score) hits and attach each score as similarityScore."""
+        scores = dict(hits)
+        results = await self._hydrate([img_id for img_id, _ in hits])
+        # Copy: hydrated dicts can be shared with concurrent callers
+        return [{**r, "similarityScore": scores.get(r["id"])} for r in results]
+
+    @staticmethod
+    def _min_score(min_score: Optional[float]) -> float:
+        return settings.DEFAULT_SIMILARITY_THRESHOLD if min_score is None else min_score
+
+    async def _find_image(self, media_id: str) -> Optional[Image]:
+        return await _flights["hydrate"].do(("id", media_id), lambda: self.repo.find_by_id(media_id))
+
+    async def text_embedding(self, query: str):
+        """
+        Embed a text query; concurrent requests for the same normalized text
+        share one inference, and the vector is cached for later requests.
+        """
+        key = self._text_query_key(query)
+
+        async def embed():
+            ensure_within_deadline()
+            return await asyncio.to_thread(Image.generate_text_embedding, query)
+
+        return await embedding_cache.get_or_load(key, lambda: _flights["embedding"].do(key, embed))
+
+    async def ranked_page(
+        self,
+        query_id: Optional[str],
+        user_id: str,
+        scope: Optional[str],
+        page: int,
+        page_size: int,
+        run_search: Callable[[], Awaitable[List[Dict[str, Any]]]],
+        embed: Optional[Callable[[], Awaitable[Optional[List[float]]]]] = None,
+        min_score: Optional[float] = None,
+        exclude_id: Optional[str] = None,
+        search: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[Dict[str, Any]], int, str, Optional[str]]:
+        """
+        Serve one page of a ranked search through a short-lived result session.
+
+        Without a valid query_id the full pipeline (`run_search`) runs once and
+        its ranked ids are stored under a new queryId. With one, only the
+        requested slice is hydrated; items deleted or made private since are
+        dropped from the page. `search` describes the request (endpoint,
+        query, scope, collection, min_score); a query_id stored for another
+        search is ignored and the search runs anew. The following page is prefetched into the
+        metadata cache in the background. Pages of a session whose search
+        returned partial results are marked partial too.
+
+        When `embed` is given, the query vector is stored with the session and
+        the page that reaches its end also gets a cursor for continue_page,
+        which pages on through the vector store's full ranking.
+
+        Returns:
+            (items, total, query_id, next_cursor)
+        """
+        start = (page - 1) * page_size
+        end = start + page_size
+
+        session = await self._load_session(query_id, user_id, search) if query_id else None
+        if session is None:
+            results = await run_search()
+            ids = [r["id"] for r in results]
+            scores = [r.get("similarityScore") for r in results]
+            continuation = None
+            if embed is not None and all(score is not None for score in scores):
+                vector = await embed()
+                if vector is not None:
+                    continuation = {"vector": vector, "min_score": self._min_score(min_score), "exclude": exclude_id}
+            query_id = await self._store_session(ids, scores, user_id, scope, continuation, is_partial(), search)
+            items = results[start:end]
+        else:
+            ids = session["ids"]
+            scores = session.get("scores") or [None] * len(ids)
+            continuation = session.get("continuation")
+            if session.get("partial"):
+                mark_partial("session")
+            items = await self._hydrate_hits(list(zip(ids[start:end], scores[start:end])))
+            if scope:
+                items = await self.filter_results(items, scope, user_id)
+
+        next_cursor = None
+        if continuation and end >= len(ids):
+            after = (scores[-1], ids[-1]) if ids else None
+            next_cursor = encode_search_cursor(SearchCursor(query_id, len(ids), after, None))
+        self._prefetch(ids[end:end + page_size])
+        return items, len(ids), query_id, next_cursor
+
+    async def continue_page(
+        self,
+        cursor: str,
+        user_id: str,
+        scope: Optional[str],
+        page_size: int,
+        search: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[Dict[str, Any]], int, str, Optional[str]]:
+        """
+        Serve the page a next_cursor points to, past the end of a result session.
+
+        Hits come from vector_store.search_page: exact scores, ordered after
+        the last hit already served, under a point in time that the cursor
+        carries from page to page, so each request fetches only its own hits
+        however deep it is. Ids the session already listed (near its end the
+        approximate and exact rankings can disagree slightly) and items
+        outside the scope are skipped.
+
+        Raises:
+            InvalidCursor: The cursor is malformed or belongs to another search
+            PageExpired: The session or the point in time has expired
+
+        Returns:
+            (items, offset of the first item, query_id, next_cursor)
+        """
+        position = decode_search_cursor(cursor)
+        session = await self._load_session(position.query_id, user_id)
+        if session and not self._same_search(session, search):
+            raise InvalidCursor("Cursor belongs to another search")
+        continuation = session.get("continuation") if session else None
+        if not continuation:
+            raise PageExpired("Search session expired, please search again")
+
+        skip = set(session["ids"])
+        if continuation.get("exclude"):
+            skip.add(continuation["exclude"])
+
+        after, pit_id = position.after, position.pit_id
+        items: List[Dict[str, Any]] = []
+        exhausted = False
+        for _ in range(MAX_PAGE_FETCHES):
+            hits, pit_id = await self.vector_store.search_page(
+                continuation["vector"], page_size, min_score=continuation["min_score"], after=after, pit_id=pit_id
+            )
+            exhausted = len(hits) < page_size
+            if hits:
+                last_id, last_score = hits[-1]
+                after = (last_score, last_id)
+            fresh = await self._hydrate_hits([hit for hit in hits if hit[0] not in skip])
+            items.extend(await self.filter_results(fresh, scope, user_id) if scope else fresh)
+            if exhausted or len(items) >= page_size:
+                break
+
+        if len(items) > page_size:
+            # Resume right after the last item served; skipped hits are re-read and skipped again
+            items = items[:page_size]
+            after = (items[-1]["similarityScore"], items[-1]["id"])
+            exhausted = False
+
+        next_cursor = None
+        if not exhausted:
+            next_cursor = encode_search_cursor(
+                SearchCursor(position.query_id, position.offset + len(items), after, pit_id)
+            )
+        return items, position.offset, position.query_id, next_cursor
+
+    async def _store_session(
+        self,
+        ids: List[str],
+        scores: List[Optional[float]],
+        user_id: str,
+        scope: Optional[str],
+        continuation: Optional[Dict[str, Any]] = None,
+        partial: bool = False,
+        search: Optional[Dict[str, Any]] = None
+    ) -> str:
+        query_id = f"q_{uuid.uuid4().hex}"
+        session = {"ids": ids, "scores": scores, "user_id": user_id, "scope": scope, "search": search}
+        if continuation:
+            session["continuation"] = continuation
+        if partial:
+            session["partial"] = True
+        await session_cache.set(query_id, session)
+        return query_id
+
+    async def _load_session(
+        self,
+        query_id: str,
+        user_id: str,
+        search: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return the session if it exists, belongs to this user and, given `search`, was stored for it."""
+        session = await session_cache.get(query_id)
+        if not isinstance(session, dict) or session.get("user_id") != user_id:
+            return None
+        if not self._same_search(session, search):
+            return None
+        return session
+
+    @staticmethod
+    def _same_search(session: Dict[str, Any], search: Optional[Dict[str, Any]]) -> bool:
+        """
+        Whether a session was stored for the search described by `search`.
+        A query of None (a later image page sent without the image) matches
+        any query of the same endpoint.
+        """
+        if search is None:
+            return True
+        stored = session.get("search") or {}
+        return all(
+            stored.get(field) == value
+            for field, value in search.items()
+            if not (field == "query" and value is None)
+        )
+
+    def _prefetch(self, ids: List[str]):
+        """Warm the metadata cache for the next page without delaying this one."""
+        if not ids:
+            return
+
+        async def warm():
+            try:
+                await self.repo.find_by_ids(ids)
+            except Exception as e:
+                print(f"Warning: Failed to prefetch search page: {e}")
+
+        task = asyncio.create_task(warm())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def filter_results(
+        self,
+        results: List[Dict[str, Any]],
+        scope: str,
+        user_id: str,
+        collection_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Restrict hydrated results to a collection and a visibility scope.
+
+        Scopes:
+            public: public media only
+            private: the user's own media only
+            all: public media plus the user's own media
+        """
+        if collection_id:
+            member_ids = await self._collection_member_ids(collection_id)
+            results = [r for r in results if r["id"] in member_ids]
+
+        if scope == 'public':
+            return [r for r in results if r["visibility"] == 'public']
+        if scope == 'private':
+            return [r for r in results if r["ownerId"] == user_id]
+        return [r for r in results if r["visibility"] == 'public' or r["ownerId"] == user_id]
+
+    async def _collection_member_ids(self, collection_id: str) -> Set[str]:
+        collection = await self.collection_repo.find_by_id(collection_id)
+        return {str(img.id) for img in (collection.images or [])} if collection else set()
+
+    @staticmethod
+    def _text_query_key(query: str) -> str:
+        """Cache key for the embedding of a text query: model plus normalized text."""
+        normalized = " ".join(query.lower().split())
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        return f"text:{settings.DEFAULT_CLIP_MODEL}:{digest}"
+
+    async def search_text_scoped(
+        self,
+        query: str,
+        scope: str,
+        user_id: str,
+        collection_id: Optional[str] = None,
+        top_k: int = 10,
+        retrieval: Optional[str] = None,
+        min_score: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Text search restricted to a scope (and optionally a collection).
+
+        Results are cached per query, retrieval mode, score threshold, scope,
+        collection and (for non-public scopes) user. Uploads, updates, deletes and collection
+        changes bump the generations the entry depends on, which invalidates it.
+        """
+        retrieval = retrieval or settings.SEARCH_RETRIEVAL_MODE
+        min_score = self._min_score(min_score)
+        owner = user_id if scope != 'public' else ""
+        key = await search_cache.scoped_key(
+            f"{self._text_query_key(query)}:{retrieval}:{min_score}:{scope}:{collection_id or ''}:{owner}:{top_k}",
+            result_scopes(scope, user_id, collection_id)
+        )
+
+        async def run_search():
+            results = None
+            if retrieval == "vector":
+                results = await self._search_small_scope(
+                    lambda: self.text_embedding(query), scope, user_id, collection_id, top_k, min_score
+                )
+            if results is None:
+                results = await self.search_by_text(query, top_k=top_k, retrieval=retrieval, min_score=min_score)
+            return await self.filter_results(results, scope, user_id, collection_id)
+
+        results = await search_cache.get(key)
+        if results is not MISS:
+            return results
+
+        async def load():
+            results = await run_search()
+            if not is_partial():
+                # Results that missed shards aren't served to later requests
+                await search_cache.set(key, results)
+            return results
+
+        return await _coalesced(("scoped", key), load)
+
+    async def search_image_scoped(
+        self,
+        image_file: bytes,
+        scope: str,
+        user_id: str,
+        collection_id: Optional[str] = None,
+        top_k: int = 10,
+        min_score: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """Image search restricted to a scope (and optionally a collection)."""
+        min_score = self._min_score(min_score)
+        results = await self._search_small_scope(
+            lambda: self.image_embedding(image_file), scope, user_id, collection_id, top_k, min_score
+        )
+        if results is None:
+            results = await self.search_by_image(image_file, top_k=top_k, min_score=min_score)
+        return await self.filter_results(results, scope, user_id, collection_id)
+
+    async def _search_small_scope(
+        self,
+        embed: Callable[[], Awaitable[List[float]]],
+        scope: str,
+        user_id: str,
+        collection_id: Optional[str],
+        top_k: int,
+        min_score: float
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Exact search over every member of a collection or private library,
+        or None if the scope isn't small enough and the global index is used.
+        A private library too large for that is searched on its owner's
+        shard when the vector store is owner-routed.
+        """
+        data = await scoped_index.load(scope, user_id, collection_id)
+        if data is None:
+            if scope == "private" and not collection_id:
+                hits = await self.vector_store.search_owned(await embed(), user_id, top_k, min_score)
+                if hits is not None:
+                    return await self._hydrate_hits(hits)
+            return None
+        hits = scoped_index.rank(data, await embed(), top_k, min_score)
+        return await self._hydrate_hits(hits)
+
+    async def search_by_text(
+        self,
+        query: str,
+        top_k: int = 10,
+        retrieval: str = "vector",
+        min_score: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Args:
+            retrieval: "vector" for CLIP similarity only, "rrf" or "linear" to
+                fuse it with BM25 over title, description and tags in ES
+            min_score: Minimum similarity score in [0, 1]; hits below it are
+                never returned by ES (default DEFAULT_SIMILARITY_THRESHOLD)
+        """
+        min_score = self._min_score(min_score)
+
+        async def run():
+            query_embedding = await self.text_embedding(query)
+            if retrieval == "vector":
+                hits = await self.vector_store.search_similar(
+                    query_embedding, top_k, min_score=min_score, with_scores=True
+                )
+            else:
+                image_ids = await self.vector_store.search_hybrid(
+                    query,
+                    query_embedding,
+                    top_k,
+                    mode=retrieval,
+                    vector_weight=settings.HYBRID_VECTOR_WEIGHT,
+                    min_score=min_score
+                )
+                hits = [(img_id, None) for img_id in image_ids]
+            return await self._hydrate_hits(hits)
+
+        return await _coalesced((self._text_query_key(query), retrieval, min_score, top_k), run)
+
+    @staticmethod
+    def _image_key(image_file: bytes) -> str:
+        return f"image:{settings.DEFAULT_CLIP_MODEL}:{hashlib.sha1(image_file).hexdigest()}"
+
+    async def image_embedding(self, image_file: bytes):
+        """Embed an uploaded image; identical uploads share one inference and its cached vector."""
+        key = self._image_key(image_file)
+
+        async def embed():
+            # Save temp file
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as temp_file:
+                temp_file.write(image_file)
+                temp_path = temp_file.name
+            try:
+                ensure_within_deadline()
+                return await asyncio.to_thread(Image.generate_image_embedding, temp_path)
+            finally:
+                os.unlink(temp_path)
+
+        return await embedding_cache.get_or_load(key, lambda: _flights["embedding"].do(key, embed))
+
+    async def media_embedding(self, media_id: str):
+        """
+        Embedding of an existing media item, or None if the item doesn't exist.
+
+        Uses the embedding stored in Elasticsearch; it is regenerated from the
+        source text only if the item was never indexed.
+        """
+        source_image = await self._find_image(media_id)
+        if not source_image:
+            return None
+
+        async def embed():
+            stored = await self.vector_store.get_embedding(media_id, owner_id=source_image.owner_id)
+            if stored is not None:
+                return stored
+            ensure_within_deadline()
+            return await asyncio.to_thread(source_image.generate_embedding)
+
+        return await _flights["embedding"].do(f"media:{media_id}", embed)
+
+    async def search_by_image(
+        self,
+        image_file: bytes,
+        top_k: int = 10,
+        min_score: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        min_score = self._min_score(min_score)
+
+        async def run():
+            query_embedding = await self.image_embedding(image_file)
+            hits = await self.vector_store.search_similar(query_embedding, top_k, min_score=min_score, with_scores=True)
+            return await self._hydrate_hits(hits)
+
+        return await _coalesced((self._image_key(image_file), min_score, top_k), run)
+
+    async def search_by_vector(
+        self,
+        query_embedding: List[float],
+        top_k: int = 10,
+        min_score: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """Search with a client-supplied embedding; no model inference runs."""
+        hits = await self.vector_store.search_similar(
+            query_embedding, top_k, min_score=self._min_score(min_score), with_scores=True
+        )
+        return await self._hydrate_hits(hits)
+
+    async def composite_embedding(self, query: str, image_file: bytes, text_weight: float = 0.5) -> List[float]:
+        """Normalized text and image vectors (embedded concurrently) combined with `text_weight`."""
+        text_vector, image_vector = await asyncio.gather(
+            self.text_embedding(query),
+            self.image_embedding(image_file)
+        )
+        return combine_vectors([text_vector, image_vector], [text_weight, 1 - text_weight])
+
+    async def search_composite(
+        self,
+        query: str,
+        image_file: bytes,
+        text_weight: float = 0.5,
+        top_k: int = 10,
+        min_score: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search with an image refined by text ("this, but at night").
+
+        Both inputs are embedded concurrently, their normalized vectors are
+        combined with `text_weight` (the image gets 1 - text_weight), and a
+        single similarity query plus one hydration pass produce the results.
+        """
+        min_score = self._min_score(min_score)
+
+        async def run():
+            query_embedding = await self.composite_embedding(query, image_file, text_weight)
+            hits = await self.vector_store.search_similar(query_embedding, top_k, min_score=min_score, with_scores=True)
+            return await self._hydrate_hits(hits)
+
+        key = (self._text_query_key(query), self._image_key(image_file), round(text_weight, 3), min_score, top_k)
+        return await _coalesced(key, run)
+
+    async def search_by_media_id(
+        self,
+        media_id: str,
+        top_k: int = 10,
+        min_score: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
         """
         Find similar media items by using the embedding of an existing media item.
+        A fresh precomputed neighbour list is used when available, otherwise a
+        live similarity query runs.
 
         Args:
             media_id: The ID of the media item to find similar items for
             top_k: Number of similar items to return
+            min_score: Minimum similarity score in [0, 1]
 
         Returns:
             List of similar media items with metadata
         """
-        # Get the source media item
-        source_image = await self.repo.find_by_id(media_id)
-        if not source_image:
-            return []
-
-        # Get the embedding from Elasticsearch or regenerate it
-        # For now, we'll regenerate it from the source text
-        # In production, you might want to store embeddings in MongoDB or retrieve from ES
-        query_embedding = source_image.generate_embedding()
-
-        # Search for similar images
-        image_ids = await self.es_client.search_similar(query_embedding, top_k + 1)
-
-        images = []
-        for img_id in image_ids:
-            # Skip the source image itself
-            if img_id == media_id:
-                continue
-
-            img = await self.repo.find_by_id(img_id)
-            if img:
-                images.append({
-                    "id": str(img.id),
-                    "filename": img.title or "Untitled",
-                    "title": img.title,
-                    "description": img.description,
-                    "mediaUrl": img.file_path or "",
-                    "thumbnailUrl": img.thumbnail_url or img.file_path or "",
-                    "mediaType": "image",
-                    "fileSize": img.file_size or 0,
-                    "uploadDate": img.created_at.isoformat() if img.created_at else "",
-                    "tags": img.tags or [],
-                    "visibility": img.visibility or "public",
-                    "ownerId": str(img.owner_id) if img.owner_id else ""
-                })
-
-            # Stop once we have enough results (excluding the source)
-            if len(images) >= top_k:
-                break
+        min_score = self._min_score(min_score)
+
+        async def run():
+            # Serve the precomputed list when it is fresh and long enough
+            neighbor_hits = await neighbor_service.neighbors_for(media_id, top_k, min_score)
+            if neighbor_hits is not None:
+                return await self._hydrate_hits(neighbor_hits)
+
+            query_embedding = await self.media_embedding(media_id)
+            if query_embedding is None:
+                return []
+
+            # Search for similar images
+            hits = await self.vector_store.search_similar(
+                query_embedding, top_k + 1, min_score=min_score, with_scores=True
+            )
+
+            # Skip the source image itself and stop once we have enough results
+            hits = [(img_id, score) for img_id, score in hits if img_id != media_id]
+            return (await self._hydrate_hits(hits))[:top_k]
+
+        return await _coalesced((f"media:{media_id}", min_score, top_k), run)
+
+    async def stream_search(
+        self,
+        embed: Callable[[], Awaitable[Optional[List[float]]]],
+        top_k: int,
+        scope: Optional[str],
+        user_id: str,
+        collection_id: Optional[str] = None,
+        exclude_id: Optional[str] = None,
+        chunk_size: int = 20,
+        min_score: Optional[float] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run a search and yield events as soon as each stage produces output.
+
+        Events:
+            {"event": "stage", "stage": "embed" | "search", "ms": ...}
+            {"event": "results", "items": [...]}  one per hydrated chunk, in rank order
+            {"event": "done", "total": ..., "ms": ...}
+
+        Args:
+            embed: Returns the query embedding, or None when there is nothing to search
+            exclude_id: Id to drop from the hits (the source of a similar search)
+        """
+        started = time.perf_counter()
+
+        def elapsed() -> int:
+            return int((time.perf_counter() - started) * 1000)
+
+        query_embedding = await embed()
+        yield {"event": "stage", "stage": "embed", "ms": elapsed()}
+
+        hits = []
+        if query_embedding is not None:
+            hits = await self.vector_store.search_similar(
+                query_embedding,
+                top_k + (1 if exclude_id else 0),
+                min_score=self._min_score(min_score),
+                with_scores=True
+            )
+            hits = [(img_id, score) for img_id, score in hits if img_id != exclude_id][:top_k]
+        if collection_id:
+            members = await self._collection_member_ids(collection_id)
+            hits = [(img_id, score) for img_id, score in hits if img_id in members]
+        yield {"event": "stage", "stage": "search", "ms": elapsed(), "hits": len(hits)}
+
+        total = 0
+        for start in range(0, len(hits), chunk_size):
+            items = await self._hydrate_hits(hits[start:start + chunk_size])
+            if scope:
+                items = await self.filter_results(items, scope, user_id)
+            if items:
+                total += len(items)
+                yield {"event": "results", "items": items}
+
+        yield {"event": "done", "total": total, "ms": elapsed()}
+
+    async def search_batch(
+        self,
+        queries: List[Dict[str, Any]],
+        scope: Optional[str] = None,
+        user_id: Optional[str] = None,
+        min_score: Optional[float] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Run several text and/or media-id searches together.
+
+        All text queries are embedded in one model call, media-id queries use
+        their stored vectors (fetched with one _mget), the vector queries go
+        to Elasticsearch in one _msearch, and the union of hit ids is
+        hydrated once.
+
+        Args:
+            queries: Dicts with either "text" or "media_id", and "top_k"
+            scope: Visibility scope applied to every query (None = unfiltered)
+            user_id: Requesting user, for the private and all scopes
+            min_score: Minimum similarity score in [0, 1] for every query
+
+        Returns:
+            One result list per query, in request order
+        """
+        ensure_within_deadline()
+        media_ids = [q["media_id"] for q in queries if q.get("media_id")]
+        embeddings: Dict[str, List[float]] = {}
+
+        stored = await self.vector_store.get_embeddings(list(dict.fromkeys(media_ids)))
+        embeddings.update({f"media:{media_id}": vector for media_id, vector in stored.items()})
+
+        # Text queries plus the text of media items that were never indexed
+        texts: Dict[str, str] = {}
+        for q in queries:
+            if q.get("text"):
+                texts.setdefault(self._text_query_key(q["text"]), q["text"])
+        unindexed = [media_id for media_id in media_ids if f"media:{media_id}" not in embeddings]
+        for media_id, image in (await self.repo.find_by_ids(unindexed)).items():
+            texts[f"media:{media_id}"] = f"{image.title} {image.description or ''}".strip()
+
+        if texts:
+            ensure_within_deadline()
+            vectors = await asyncio.to_thread(Image.generate_text_embeddings, list(texts.values()))
+            embeddings.update(zip(texts.keys(), vectors))
+
+        # Queries without an embedding (unknown media id) get no results
+        keys = [
+            self._text_query_key(q["text"]) if q.get("text") else f"media:{q['media_id']}"
+            for q in queries
+        ]
+        runnable = [i for i, key in enumerate(keys) if key in embeddings]
+        hits = await self.vector_store.msearch_similar(
+            [embeddings[keys[i]] for i in runnable],
+            # One extra hit for media queries, which drop their source item
+            [queries[i]["top_k"] + (0 if queries[i].get("text") else 1) for i in runnable],
+            min_score=self._min_score(min_score),
+            with_scores=True
+        )
+        ranked: List[List[Tuple[str, float]]] = [[] for _ in queries]
+        for i, query_hits in zip(runnable, hits):
+            source = queries[i].get("media_id")
+            ranked[i] = [(img_id, score) for img_id, score in query_hits if img_id != source][:queries[i]["top_k"]]
 
-        return images
+        images = await self.repo.find_by_ids(list(dict.fromkeys(img_id for hits in ranked for img_id, _ in hits)))
+        results = []
+        for query_hits in ranked:
+            items = [
+                {**self._to_result(images[img_id]), "similarityScore": score}
+                for img_id, score in query_hits
+                if img_id in images
+            ]
+            if scope:
+                items = await self.filter_results(items, scope, user_id)
+            results.append(items)
+        return results
@@ -0,0 +1,182 @@
+"""
+Admission control for inference-heavy endpoints.
+
+Each endpoint class (e.g. "search", "upload") gets a concurrency limit, a
+bounded wait queue and a request deadline. Requests that can't be queued are
+rejected with 503 immediately; requests whose deadline passes while waiting,
+or before inference starts, are dropped. A Redis token bucket per user keeps
+one client from taking the whole capacity (429).
+"""
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+
+from fastapi import Depends, HTTPException, status
+
+from app.cache.redis_client import redis_client
+from app.config import settings
+from app.models.user import User
+from app.util.current_user import get_current_user
+from app.util.resilience import request_deadline, remaining_budget
+
+
+def _overloaded(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER)},
+    )
+
+
+def ensure_within_deadline():
+    """Drop the current request if its deadline has already passed. Call before expensive work."""
+    remaining = remaining_budget()
+    if remaining is not None and remaining <= 0:
+        raise _overloaded("Request deadline exceeded before processing started")
+
+
+class EndpointLimiter:
+    """Concurrency limit with a bounded queue and per-request deadline."""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, deadline_ms: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.deadline = deadline_ms / 1000
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._active = 0
+        self._waiting = 0
+        self._stats = {"admitted": 0, "rejected_queue_full": 0, "rejected_deadline": 0}
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._active + self._waiting >= self.max_concurrency + self.max_queue:
+            self._stats["rejected_queue_full"] += 1
+            raise _overloaded(f"Too many concurrent {self.name} requests, please retry shortly")
+
+        deadline = time.monotonic() + self.deadline
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.deadline)
+        except asyncio.TimeoutError:
+            self._stats["rejected_deadline"] += 1
+            raise _overloaded(f"Timed out waiting for a {self.name} slot")
+        finally:
+            self._waiting -= 1
+
+        self._stats["admitted"] += 1
+        self._active += 1
+        try:
+            with request_deadline(deadline):
+                yield
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "active": self._active,
+            "waiting": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+
+class UserRateLimiter:
+    """Per-user token bucket kept in Redis. Fails open when Redis is unavailable."""
+
+    # KEYS[1] bucket key; ARGV: refill rate (tokens/s), burst size, now (s)
+    SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._stats = {"allowed": 0, "throttled": 0}
+
+    async def check(self, user_id: str, endpoint_class: str):
+        if self.rate <= 0:
+            return
+        result = await redis_client.eval(
+            self.SCRIPT,
+            [f"ratelimit:{endpoint_class}:{user_id}"],
+            [self.rate, self.burst, time.time()]
+        )
+        if result is None:
+            return
+        allowed, wait = result
+        if int(allowed):
+            self._stats["allowed"] += 1
+            return
+        self._stats["throttled"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(1, math.ceil(float(wait))))},
+        )
+
+    def stats(self) -> dict:
+        return dict(self._stats)
+
+
+limiters: Dict[str, EndpointLimiter] = {
+    "search": EndpointLimiter(
+        "search",
+        settings.ADMISSION_SEARCH_CONCURRENCY,
+        settings.ADMISSION_SEARCH_QUEUE,
+        settings.ADMISSION_SEARCH_DEADLINE_MS,
+    ),
+    "upload": EndpointLimiter(
+        "upload",
+        settings.ADMISSION_UPLOAD_CONCURRENCY,
+        settings.ADMISSION_UPLOAD_QUEUE,
+        settings.ADMISSION_UPLOAD_DEADLINE_MS,
+    ),
+}
+rate_limiter = UserRateLimiter(settings.RATE_LIMIT_RATE, settings.RATE_LIMIT_BURST)
+
+
+def admit(endpoint_class: str):
+    """
+    Route dependency that rate-limits the caller and holds a slot of the
+    given endpoint class for the duration of the request.
+
+    Usage:
+        @router.post("/search/text", dependencies=[Depends(admit("search"))])
+    """
+    limiter = limiters[endpoint_class]
+
+    async def dependency(current_user: User = Depends(get_current_user)):
+        await rate_limiter.check(str(current_user.id), endpoint_class)
+        async with limiter.slot():
+            yield
+
+    return dependency
+
+
+def stats() -> dict:
+    return {
+        "limiters": {name: limiter.stats() for name, limiter in limiters.items()},
+        "rate_limiter": rate_limiter.stats(),
+    }
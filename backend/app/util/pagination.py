@@ -0,0 +1,94 @@
+"""
+Opaque cursors for keyset pagination over (created_at, _id), and for
+paging search results past their ranked session.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import NamedTuple, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client-supplied cursor cannot be decoded."""
+
+
+def _encode(payload: dict) -> str:
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode(cursor: str) -> dict:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+
+
+def encode_cursor(created_at: Optional[datetime], doc_id) -> str:
+    """Encode the sort key of the last item on a page into an opaque token."""
+    return _encode({
+        "c": created_at.isoformat() if created_at else None,
+        "i": str(doc_id),
+    })
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], ObjectId]:
+    """Decode a token produced by encode_cursor back into (created_at, _id)."""
+    try:
+        payload = _decode(cursor)
+        created_at = datetime.fromisoformat(payload["c"]) if payload.get("c") else None
+        return created_at, ObjectId(payload["i"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def keyset_filter(cursor: str) -> dict:
+    """
+    Build a MongoDB filter selecting documents that sort strictly after the
+    cursor in (created_at DESC, _id DESC) order.
+
+    Documents without created_at sort last in descending order, so they are
+    always "after" a dated cursor.
+    """
+    created_at, doc_id = decode_cursor(cursor)
+    if created_at is None:
+        return {"created_at": None, "_id": {"$lt": doc_id}}
+    return {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": doc_id}},
+            {"created_at": None},
+        ]
+    }
+
+
+class SearchCursor(NamedTuple):
+    query_id: str  # ranked session the search continues
+    offset: int  # results served before the page this cursor points to
+    after: Optional[Tuple[float, str]]  # (score, image_id) of the last ranked hit
+    pit_id: Optional[str]  # vector store point in time, if one is open
+
+
+def encode_search_cursor(cursor: SearchCursor) -> str:
+    return _encode({
+        "q": cursor.query_id,
+        "o": cursor.offset,
+        "a": list(cursor.after) if cursor.after else None,
+        "p": cursor.pit_id,
+    })
+
+
+def decode_search_cursor(cursor: str) -> SearchCursor:
+    """Decode a token produced by encode_search_cursor."""
+    try:
+        payload = _decode(cursor)
+        after = payload.get("a")
+        return SearchCursor(
+            str(payload["q"]),
+            int(payload["o"]),
+            (float(after[0]), str(after[1])) if after else None,
+            payload.get("p"),
+        )
+    except (ValueError, KeyError, TypeError, IndexError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
@@ -0,0 +1,53 @@
+"""
+Time partitions of a vector index version: <version>-YYYY.MM (month) or
+<version>-YYYY (year), by upload time.
+
+Image ids are MongoDB ObjectIds, created on insert like created_at, so the
+partition of a document follows from its id alone: writes, point lookups
+and deletes need no extra read. Ids that are not ObjectIds stay in the
+version's own index.
+"""
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from bson import ObjectId
+
+PARTITION_FORMATS = {"month": "%Y.%m", "year": "%Y"}
+
+
+def check_scheme(partition_by: str):
+    if partition_by not in PARTITION_FORMATS:
+        raise ValueError(
+            f"ES_INDEX_PARTITIONS must be empty or one of {', '.join(PARTITION_FORMATS)}, got {partition_by!r}"
+        )
+
+
+def uploaded_at(image_id: str) -> Optional[datetime]:
+    """When the image was inserted, from its ObjectId, or None for other ids."""
+    if not ObjectId.is_valid(image_id):
+        return None
+    return ObjectId(image_id).generation_time
+
+
+def partition_name(index: str, when: datetime, partition_by: str) -> str:
+    return f"{index}-{when.strftime(PARTITION_FORMATS[partition_by])}"
+
+
+def partition_of(index: str, image_id: str, partition_by: Optional[str]) -> str:
+    """The index holding image_id in a version laid out by `partition_by` (None = unpartitioned)."""
+    when = uploaded_at(image_id) if partition_by else None
+    return partition_name(index, when, partition_by) if when else index
+
+
+def recent_partitions(index: str, partition_by: str, count: int, now: Optional[datetime] = None) -> List[str]:
+    """The partitions of the last `count` periods, newest first, whether or not they exist."""
+    now = now or datetime.now(timezone.utc)
+    year, month = now.year, now.month
+    names = []
+    for _ in range(count):
+        names.append(partition_name(index, datetime(year, month, 1), partition_by))
+        if partition_by == "year":
+            year -= 1
+        else:
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return names
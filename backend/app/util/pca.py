@@ -0,0 +1,88 @@
+"""
+Learned PCA projection of CLIP embeddings to a short vector for
+first-stage (coarse) kNN; candidates are rescored on the full vector.
+
+Fitted offline by scripts/fit_pca.py over stored embeddings and saved next
+to the model cache, one file per model and output size.
+"""
+import hashlib
+import os
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.util.vectors import normalize_rows
+
+
+class PCAProjection:
+    def __init__(self, mean: np.ndarray, components: np.ndarray, model: str, explained: float = 0.0):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)  # (dims, full dims)
+        self.model = model
+        self.explained = explained  # fraction of variance kept
+
+    @property
+    def dims(self) -> int:
+        return len(self.components)
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the fit, so an index is never queried with a refitted projection."""
+        return hashlib.sha1(self.mean.tobytes() + self.components.tobytes()).hexdigest()[:16]
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, dims: int, model: str) -> "PCAProjection":
+        """Principal components of the L2-normalized vectors."""
+        matrix = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        if dims >= matrix.shape[1] or dims > len(matrix):
+            raise ValueError(f"Cannot fit {dims} components to {len(matrix)} vectors of {matrix.shape[1]} dims")
+        mean = matrix.mean(axis=0)
+        _, singular, vt = np.linalg.svd(matrix - mean, full_matrices=False)
+        variance = singular ** 2
+        return cls(mean, vt[:dims], model, float(variance[:dims].sum() / variance.sum()))
+
+    def project(self, vectors: Sequence[Sequence[float]]) -> np.ndarray:
+        """Short, L2-normalized vectors, comparable by cosine similarity."""
+        matrix = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        return normalize_rows((matrix - self.mean) @ self.components.T)
+
+    @staticmethod
+    def path_for(model: str, dims: int) -> str:
+        return os.path.join(settings.MODEL_CACHE_DIR, "pca", f"{model.replace('/', '__')}-{dims}.npz")
+
+    def save(self, path: str = None) -> str:
+        path = path or self.path_for(self.model, self.dims)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(f, mean=self.mean, components=self.components, model=self.model, explained=self.explained)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "PCAProjection":
+        with np.load(path) as data:
+            return cls(data["mean"], data["components"], str(data["model"]), float(data["explained"]))
+
+
+def two_stage_rank(
+    ids: Sequence[str],
+    matrix: np.ndarray,
+    short: np.ndarray,
+    query: Sequence[float],
+    short_query: np.ndarray,
+    top_k: int,
+    candidates: int
+) -> List[Tuple[str, float]]:
+    """
+    What the index does: take the `candidates` nearest rows by the short
+    vectors, then rank those exactly on the row-normalized full `matrix`.
+    """
+    coarse = short @ short_query
+    if len(coarse) > candidates:
+        keep = np.argpartition(-coarse, candidates - 1)[:candidates]
+    else:
+        keep = np.arange(len(coarse))
+    q = np.asarray(query, dtype=np.float32)
+    scores = (matrix[keep] @ (q / np.linalg.norm(q)) + 1.0) / 2.0
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    return [(ids[keep[i]], float(scores[i])) for i in order]
@@ -0,0 +1,262 @@
+"""
+Tail-latency and failure protection for calls to Elasticsearch, MongoDB
+and the storage provider.
+
+- Per-call timeouts come from the deadline of the request being served
+  (set by admission control, see app.util.admission), so a slow
+  dependency can't hold a request past its budget.
+- A circuit breaker per dependency opens after consecutive failures and
+  rejects calls with CircuitOpen (503) until a trial call succeeds.
+- hedged() sends a duplicate of a slow call once the first hasn't
+  answered within a delay (e.g. the recent p95) and takes the first answer.
+- Backends flag results they could only partly compute with mark_partial();
+  routes that opened track_partial() report them as partial.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.config import settings
+
+# Monotonic deadline of the request being served, set while it holds an admission slot
+_deadline: ContextVar[Optional[float]] = ContextVar("admission_deadline", default=None)
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable, please retry shortly")
+        self.name = name
+        self.retry_after = retry_after
+
+
+@contextmanager
+def request_deadline(deadline: float):
+    """Bound dependency calls made inside the block by a time.monotonic() deadline."""
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None if unbounded."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def call_timeout(default: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds a dependency call may take: what is left of the request's
+    deadline, capped at `default`. None means unbounded (no deadline and no
+    default, e.g. in scripts). Raises TimeoutError (504) if nothing is left.
+    """
+    remaining = remaining_budget()
+    if remaining is None:
+        return default
+    if remaining <= 0:
+        raise TimeoutError("Request deadline exceeded")
+    return remaining if default is None else min(default, remaining)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker: closed -> open after `failure_threshold`
+    failures in a row, half-open after `reset_after` seconds (one trial call
+    is let through), closed again when the trial succeeds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_after: float,
+        is_failure: Callable[[BaseException], bool] = lambda e: True
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.is_failure = is_failure
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+        self._stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0, "budget_timeouts": 0}
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_after:
+            return "open"
+        return "half_open"
+
+    def _before(self):
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and not self._trial:
+            self._trial = True
+            return
+        self._stats["rejected"] += 1
+        retry_after = self.reset_after - (time.monotonic() - self._opened_at)
+        raise CircuitOpen(self.name, max(retry_after, 0.0))
+
+    def _record(self, failed: bool):
+        self._trial = False
+        if not failed:
+            self._failures = 0
+            self._opened_at = None
+            return
+        self._stats["failures"] += 1
+        self._failures += 1
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                print(f"⚡ Circuit for {self.name} opened after {self._failures} failures")
+                self._stats["opened"] += 1
+            # A failed trial keeps it open for another reset_after
+            self._opened_at = time.monotonic()
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """
+        Run `fn` through the breaker, cancelled after `timeout` seconds, the
+        dependency's own limit (None = none), or earlier at the request's
+        deadline (see call_timeout). Only a timeout at the dependency's own
+        limit is a failure; one cut short by the request's remaining budget,
+        e.g. after it waited in the admission queue, raises TimeoutError
+        (504) without counting against the dependency.
+        """
+        limit = call_timeout(timeout)
+        cut_by_budget = limit is not None and (timeout is None or limit < timeout)
+        self._before()
+        self._stats["calls"] += 1
+        try:
+            result = await (asyncio.wait_for(fn(), limit) if limit is not None else fn())
+        except asyncio.CancelledError:
+            # The caller went away; says nothing about the dependency
+            self._trial = False
+            raise
+        except TimeoutError as e:
+            if cut_by_budget:
+                self._trial = False
+                self._stats["budget_timeouts"] += 1
+                raise
+            self._record(self.is_failure(e))
+            raise
+        except Exception as e:
+            self._record(self.is_failure(e))
+            raise
+        self._record(False)
+        return result
+
+    def stats(self) -> dict:
+        return {**self._stats, "state": self.state, "consecutive_failures": self._failures}
+
+
+class LatencyWindow:
+    """Latencies of the last `size` calls, for percentile-based hedging delays."""
+
+    def __init__(self, size: int = 500, min_samples: int = 50):
+        self.samples = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The q-quantile (0-1), or None until min_samples calls were seen."""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+_hedge_stats = {"hedged": 0, "hedge_won": 0}
+
+
+async def hedged(attempt: Callable[[int], Awaitable[Any]], delay: Optional[float]) -> Any:
+    """
+    Run attempt(0); if it hasn't finished after `delay` seconds, also run
+    attempt(1) and return whichever succeeds first. The other is cancelled.
+    With delay None only attempt(0) runs.
+    """
+    first = asyncio.ensure_future(attempt(0))
+    if delay is None:
+        return await first
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return first.result()
+        _hedge_stats["hedged"] += 1
+        tasks.append(asyncio.ensure_future(attempt(1)))
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not first:
+                        _hedge_stats["hedge_won"] += 1
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+# Dependencies guarded by a breaker, keyed by name
+breakers: Dict[str, CircuitBreaker] = {}
+
+
+def breaker(name: str, is_failure: Callable[[BaseException], bool] = lambda e: True) -> CircuitBreaker:
+    """The process-wide breaker for a dependency, created on first use."""
+    if name not in breakers:
+        breakers[name] = CircuitBreaker(
+            name, settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS, is_failure
+        )
+    return breakers[name]
+
+
+# Reasons the current request's results are incomplete; None outside track_partial()
+_partial: ContextVar[Optional[List[str]]] = ContextVar("partial_results", default=None)
+
+
+@contextmanager
+def track_partial():
+    """Collect mark_partial() calls made while serving the enclosed search."""
+    token = _partial.set([])
+    try:
+        yield
+    finally:
+        _partial.reset(token)
+
+
+def mark_partial(reason: str):
+    """Flag the current request's results as incomplete (e.g. shards timed out)."""
+    reasons = _partial.get()
+    if reasons is not None and reason not in reasons:
+        reasons.append(reason)
+
+
+def is_partial() -> bool:
+    return bool(_partial.get())
+
+
+def partial_reasons() -> List[str]:
+    """What mark_partial() has recorded for the enclosing track_partial() so far."""
+    return list(_partial.get() or [])
+
+
+def stats() -> dict:
+    return {
+        "breakers": {name: b.stats() for name, b in breakers.items()},
+        "hedging": dict(_hedge_stats),
+    }
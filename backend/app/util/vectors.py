@@ -0,0 +1,93 @@
+"""
+Client-supplied query vectors: base64-encoded little-endian float32 arrays.
+"""
+import base64
+import binascii
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+class InvalidVector(ValueError):
+    """Raised when a client-supplied vector cannot be used as a query."""
+
+
+def encode_vector(vector) -> str:
+    """Encode a vector the way decode_vector expects it (for clients and tests)."""
+    return base64.b64encode(np.asarray(vector, dtype="<f4").tobytes()).decode("ascii")
+
+
+def decode_vector(encoded: str, dims: int) -> List[float]:
+    """
+    Decode a base64 float32 vector and check it can be compared by cosine
+    similarity against an index of `dims` dimensions.
+    """
+    try:
+        raw = base64.b64decode(encoded, validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidVector("Vector is not valid base64") from e
+
+    if len(raw) != dims * 4:
+        raise InvalidVector(f"Expected {dims} float32 values ({dims * 4} bytes), got {len(raw)} bytes")
+
+    vector = np.frombuffer(raw, dtype="<f4")
+    if not np.all(np.isfinite(vector)):
+        raise InvalidVector("Vector contains NaN or infinite values")
+    if not np.any(vector):
+        raise InvalidVector("Vector must not be all zeros")
+    return vector.tolist()
+
+
+def combine_vectors(vectors: Sequence[Sequence[float]], weights: Sequence[float]) -> List[float]:
+    """
+    Weighted sum of L2-normalized vectors, normalized again.
+
+    Normalizing first keeps one modality from dominating just because its
+    embeddings have a larger norm; the result is a unit vector usable with
+    cosine similarity.
+    """
+    combined = np.zeros(len(vectors[0]), dtype=np.float32)
+    for vector, weight in zip(vectors, weights):
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        if norm:
+            combined += weight * (v / norm)
+    norm = np.linalg.norm(combined)
+    if not norm:
+        raise InvalidVector("Combined vector is all zeros")
+    return (combined / norm).tolist()
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row of a float32 matrix (zero rows stay zero)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def rank_exact(
+    ids: Sequence[str],
+    matrix: np.ndarray,
+    query: Sequence[float],
+    top_k: int,
+    min_score: float = 0.0
+) -> List[Tuple[str, float]]:
+    """
+    Exact cosine ranking of `query` against the row-normalized `matrix`.
+
+    Scores use the search scale, (1 + cosine) / 2. Returns up to top_k
+    (id, score) pairs scoring at least min_score, best first.
+    """
+    if not len(ids):
+        return []
+    q = np.asarray(query, dtype=np.float32)
+    norm = np.linalg.norm(q)
+    if not norm:
+        return []
+    scores = (matrix @ (q / norm) + 1.0) / 2.0
+
+    candidates = np.flatnonzero(scores >= min_score)
+    if len(candidates) > top_k:
+        candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+    order = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return [(ids[i], float(scores[i])) for i in order]
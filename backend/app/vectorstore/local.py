@@ -0,0 +1,473 @@
+"""
+Local vector store: float32 vectors in memory-mapped files, no cluster.
+
+Layout under LOCAL_VECTOR_STORE_PATH:
+    vectors.f32  rows of `dims` little-endian float32, L2-normalized, append-only
+    ids.log      append-only record log, one line per write:
+                 "+<TAB>id" adds a row (row number = number of "+" lines before it)
+                 "-<TAB>id" tombstones the id's current row
+    ivf.npz      optional coarse partitioning (centroids and row assignments)
+
+Re-indexing an id appends a new row and tombstones the old one; compact()
+reclaims the space. Writers hold an exclusive file lock and every process
+replays records appended by others before it reads, so several API workers
+can share one directory.
+
+Search is exact by default: the matrix is scanned block_rows rows at a time,
+one matrix product per block, keeping each block's best top_k with
+argpartition. Once train_ivf() has partitioned the rows, only the nprobe
+partitions whose centroids are closest to the query are scanned.
+"""
+import asyncio
+import fcntl
+import heapq
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.util.vectors import normalize_rows
+
+VECTORS_FILE = "vectors.f32"
+LOG_FILE = "ids.log"
+IVF_FILE = "ivf.npz"
+LOCK_FILE = ".lock"
+
+
+class LocalVectorStore:
+    def __init__(
+        self,
+        path: str = None,
+        dims: int = None,
+        block_rows: int = None,
+        nprobe: int = None
+    ):
+        self.path = path or settings.LOCAL_VECTOR_STORE_PATH
+        self.embedding_dims = dims or int(os.getenv("EMBEDDING_DIMS", "512"))
+        self.block_rows = block_rows or settings.LOCAL_VECTOR_STORE_BLOCK_ROWS
+        self.nprobe = settings.LOCAL_VECTOR_STORE_NPROBE if nprobe is None else nprobe
+        self._lock = threading.Lock()
+        self._warned_hybrid = False
+        os.makedirs(self.path, exist_ok=True)
+        self._reset()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _reset(self):
+        self._ids: List[str] = []         # row -> image id
+        self._rows: Dict[str, int] = {}   # image id -> live row
+        self._live = np.zeros(0, dtype=bool)
+        self._matrix: Optional[np.ndarray] = None
+        self._log_offset = 0
+        self._log_inode = None
+        self._centroids: Optional[np.ndarray] = None
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._ivf_mtime = None
+
+    # --- reading the files (callers hold self._lock) ---
+
+    def _sync(self):
+        """Replay records appended since the last sync, by any process."""
+        try:
+            stat = os.stat(self._file(LOG_FILE))
+        except FileNotFoundError:
+            if self._ids:
+                self._reset()
+            return
+        if stat.st_ino != self._log_inode or stat.st_size < self._log_offset:
+            # First load, or the files were replaced by compact()
+            self._reset()
+            self._log_inode = stat.st_ino
+        if stat.st_size > self._log_offset:
+            with open(self._file(LOG_FILE), "rb") as f:
+                f.seek(self._log_offset)
+                data = f.read()
+            # A partly written last line is picked up by a later sync
+            end = data.rfind(b"\n") + 1
+            self._replay(data[:end].decode("utf-8").splitlines())
+            self._log_offset += end
+        self._load_ivf()
+
+    def _replay(self, lines: List[str]):
+        first_new = len(self._ids)
+        new_live: List[bool] = []
+        for line in lines:
+            op, image_id = line.split("\t", 1)
+            old = self._rows.pop(image_id, None)
+            if old is not None:
+                if old >= first_new:
+                    new_live[old - first_new] = False
+                else:
+                    self._live[old] = False
+            if op == "+":
+                self._rows[image_id] = len(self._ids)
+                self._ids.append(image_id)
+                new_live.append(True)
+        if new_live:
+            self._live = np.concatenate([self._live, np.array(new_live, dtype=bool)])
+            self._matrix = np.memmap(
+                self._file(VECTORS_FILE), dtype="<f4", mode="r", shape=(len(self._ids), self.embedding_dims)
+            )
+            self._assign_new_rows()
+
+    def _load_ivf(self):
+        try:
+            mtime = os.stat(self._file(IVF_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            self._centroids, self._assign, self._ivf_mtime = None, np.zeros(0, dtype=np.int32), None
+            return
+        if mtime == self._ivf_mtime:
+            return
+        with np.load(self._file(IVF_FILE)) as data:
+            centroids, assign = data["centroids"], data["assign"]
+        self._ivf_mtime = mtime
+        if len(assign) > len(self._ids):
+            # Trained on files that have since been compacted
+            self._centroids, self._assign = None, np.zeros(0, dtype=np.int32)
+            return
+        self._centroids, self._assign = centroids, assign
+        self._assign_new_rows()
+
+    def _assign_new_rows(self):
+        """Put rows appended after train_ivf() into their nearest partition."""
+        if self._centroids is None or len(self._assign) == len(self._ids):
+            return
+        self._assign = np.concatenate([self._assign, self._nearest_centroid(self._matrix, len(self._assign))])
+
+    def _nearest_centroid(self, matrix: np.ndarray, start: int = 0, centroids: np.ndarray = None) -> np.ndarray:
+        centroids = self._centroids if centroids is None else centroids
+        parts = [
+            np.argmax(matrix[block:block + self.block_rows] @ centroids.T, axis=1).astype(np.int32)
+            for block in range(start, len(matrix), self.block_rows)
+        ]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int32)
+
+    def _snapshot(self):
+        with self._lock:
+            self._sync()
+            return self._ids, self._matrix, self._live, self._centroids, self._assign
+
+    # --- writing ---
+
+    def _write(self, vectors: List[Tuple[str, np.ndarray]], deletes: Sequence[str] = ()):
+        """Append rows and tombstones under the cross-process lock."""
+        with self._lock, open(self._file(LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._sync()
+                records = [f"-\t{image_id}\n" for image_id in deletes if image_id in self._rows]
+                if vectors:
+                    matrix = normalize_rows(np.asarray([v for _, v in vectors], dtype="<f4"))
+                    row_bytes = self.embedding_dims * 4
+                    fd = os.open(self._file(VECTORS_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+                    try:
+                        # Drop bytes a crashed writer left past the last logged row
+                        os.ftruncate(fd, len(self._ids) * row_bytes)
+                        os.pwrite(fd, matrix.tobytes(), len(self._ids) * row_bytes)
+                    finally:
+                        os.close(fd)
+                    records += [f"+\t{image_id}\n" for image_id, _ in vectors]
+                if records:
+                    with open(self._file(LOG_FILE), "ab") as log:
+                        log.write("".join(records).encode("utf-8"))
+                self._sync()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _check_dims(self, embedding: Sequence[float]) -> bool:
+        if len(embedding) != self.embedding_dims:
+            print(f"❌ Embedding dimension mismatch: got {len(embedding)}, expected {self.embedding_dims}")
+            return False
+        return True
+
+    # --- ranking ---
+
+    def _probe_rows(self, query: np.ndarray, centroids: np.ndarray, assign: np.ndarray) -> Optional[np.ndarray]:
+        """Rows in the nprobe partitions nearest the query, or None to scan everything."""
+        if centroids is None or not self.nprobe or self.nprobe >= len(centroids):
+            return None
+        probe = np.argpartition(-(centroids @ query), self.nprobe - 1)[:self.nprobe]
+        return np.flatnonzero(np.isin(assign, probe))
+
+    def _scan(
+        self,
+        ids: List[str],
+        matrix: np.ndarray,
+        live: np.ndarray,
+        queries: np.ndarray,
+        rows: Optional[np.ndarray],
+        top_k: int,
+        min_score: float
+    ) -> List[List[Tuple[str, float]]]:
+        """Blocked exact top_k of each (normalized) query over `rows`, or all rows."""
+        best_rows = [np.zeros(0, dtype=np.int64) for _ in queries]
+        best_scores = [np.zeros(0, dtype=np.float32) for _ in queries]
+        total = len(matrix) if rows is None else len(rows)
+        for start in range(0, total, self.block_rows):
+            if rows is None:
+                block_rows = np.arange(start, min(start + self.block_rows, total))
+                block = matrix[start:start + self.block_rows]
+            else:
+                block_rows = rows[start:start + self.block_rows]
+                block = matrix[block_rows]
+            scores = (block @ queries.T + 1.0) / 2.0
+            alive = live[block_rows]
+            for j in range(len(queries)):
+                keep = np.flatnonzero(alive & (scores[:, j] >= min_score))
+                merged_rows = np.concatenate([best_rows[j], block_rows[keep]])
+                merged_scores = np.concatenate([best_scores[j], scores[keep, j]])
+                if len(merged_rows) > top_k:
+                    top = np.argpartition(-merged_scores, top_k - 1)[:top_k]
+                    merged_rows, merged_scores = merged_rows[top], merged_scores[top]
+                best_rows[j], best_scores[j] = merged_rows, merged_scores
+
+        results = []
+        for hit_rows, hit_scores in zip(best_rows, best_scores):
+            order = np.argsort(-hit_scores, kind="stable")
+            results.append([(ids[hit_rows[i]], float(hit_scores[i])) for i in order])
+        return results
+
+    def _rank(self, query_embeddings: List[List[float]], top_k: int, min_score: Optional[float]) -> List[List[Tuple[str, float]]]:
+        ids, matrix, live, centroids, assign = self._snapshot()
+        if matrix is None or top_k <= 0 or not query_embeddings:
+            return [[] for _ in query_embeddings]
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = normalize_rows(queries)
+        threshold = min_score if min_score else -np.inf
+        if centroids is None or not self.nprobe or self.nprobe >= len(centroids):
+            # Exact: all queries share one pass over the matrix
+            return self._scan(ids, matrix, live, queries, None, top_k, threshold)
+        return [
+            self._scan(ids, matrix, live, query[None, :], self._probe_rows(query, centroids, assign), top_k, threshold)[0]
+            for query in queries
+        ]
+
+    def _page(
+        self,
+        query_embedding: List[float],
+        size: int,
+        min_score: Optional[float],
+        after: Optional[Tuple[float, str]]
+    ) -> List[Tuple[str, float]]:
+        """Exact hits ordered by (score desc, id) strictly after `after`, always scanning every row."""
+        ids, matrix, live, _, _ = self._snapshot()
+        if matrix is None or size <= 0:
+            return []
+        query = normalize_rows(np.asarray([query_embedding], dtype=np.float32))[0]
+        threshold = min_score if min_score else -np.inf
+        best: List[Tuple[float, str]] = []
+        for start in range(0, len(matrix), self.block_rows):
+            scores = (matrix[start:start + self.block_rows] @ query + 1.0) / 2.0
+            keep = np.flatnonzero(live[start:start + len(scores)] & (scores >= threshold))
+            if after is not None:
+                keep = keep[scores[keep] <= after[0]]
+            keys = [(-float(scores[i]), ids[start + i]) for i in keep]
+            if after is not None:
+                keys = [key for key in keys if key > (-after[0], after[1])]
+            best = heapq.nsmallest(size, best + keys)
+        return [(image_id, -negative) for negative, image_id in best]
+
+    # --- VectorStore ---
+
+    async def create_index(self):
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            self._sync()
+        print(f"✅ Local vector store at {self.path}: {len(self._rows)} vectors, {self.embedding_dims} dims")
+
+    async def index_image(
+        self,
+        image_id: str,
+        embedding: List[float],
+        title: Optional[str] = None,
+        description: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        owner_id: Optional[str] = None
+    ):
+        """Store the vector; the lexical fields and owner are only used by Elasticsearch."""
+        if not self._check_dims(embedding):
+            raise ValueError(f"Expected a {self.embedding_dims}-dimensional embedding")
+        await asyncio.to_thread(self._write, [(image_id, embedding)])
+
+    async def bulk_index(self, docs: List[dict]) -> int:
+        vectors = [(doc["image_id"], doc["embedding"]) for doc in docs if self._check_dims(doc["embedding"])]
+        if vectors:
+            await asyncio.to_thread(self._write, vectors)
+        return len(vectors)
+
+    async def delete_document(self, image_id: str, owner_id: Optional[str] = None):
+        await asyncio.to_thread(self._write, [], [image_id])
+
+    async def search_similar(
+        self,
+        query_embedding: List[float],
+        top_k: int = 10,
+        min_score: Optional[float] = None,
+        with_scores: bool = False
+    ) -> list:
+        if not self._check_dims(query_embedding):
+            return []
+        hits = (await asyncio.to_thread(self._rank, [query_embedding], top_k, min_score))[0]
+        return hits if with_scores else [image_id for image_id, _ in hits]
+
+    async def search_owned(
+        self,
+        query_embedding: List[float],
+        owner_id: str,
+        top_k: int = 10,
+        min_score: Optional[float] = None
+    ) -> Optional[List[Tuple[str, float]]]:
+        """Owners aren't stored locally."""
+        return None
+
+    async def msearch_similar(
+        self,
+        query_embeddings: List[List[float]],
+        top_ks: List[int],
+        min_score: Optional[float] = None,
+        with_scores: bool = False
+    ) -> List[list]:
+        valid = [i for i, embedding in enumerate(query_embeddings) if self._check_dims(embedding)]
+        results: List[list] = [[] for _ in query_embeddings]
+        if not valid:
+            return results
+        hits = await asyncio.to_thread(
+            self._rank, [query_embeddings[i] for i in valid], max(top_ks[i] for i in valid), min_score
+        )
+        for i, item_hits in zip(valid, hits):
+            item_hits = item_hits[:top_ks[i]]
+            results[i] = item_hits if with_scores else [image_id for image_id, _ in item_hits]
+        return results
+
+    async def search_page(
+        self,
+        query_embedding: List[float],
+        size: int,
+        min_score: Optional[float] = None,
+        after: Optional[Tuple[float, str]] = None,
+        pit_id: Optional[str] = None
+    ) -> Tuple[List[Tuple[str, float]], Optional[str]]:
+        """Exact even with IVF partitions; there is no point in time, so pages see concurrent writes."""
+        if not self._check_dims(query_embedding):
+            return [], None
+        after = (float(after[0]), after[1]) if after else None
+        return await asyncio.to_thread(self._page, query_embedding, size, min_score, after), None
+
+    async def get_embeddings(self, image_ids: List[str], owner_id: Optional[str] = None) -> Dict[str, List[float]]:
+        """Stored vectors are L2-normalized, so they match the indexed ones up to scale."""
+        with self._lock:
+            self._sync()
+            return {
+                image_id: self._matrix[self._rows[image_id]].tolist()
+                for image_id in image_ids
+                if image_id in self._rows
+            }
+
+    async def get_embedding(self, image_id: str, owner_id: Optional[str] = None) -> Optional[List[float]]:
+        return (await self.get_embeddings([image_id])).get(image_id)
+
+    async def update_metadata(
+        self,
+        image_id: str,
+        title: Optional[str],
+        description: Optional[str],
+        tags: Optional[List[str]],
+        owner_id: Optional[str] = None
+    ):
+        """No lexical fields are stored locally; nothing to update."""
+
+    async def search_hybrid(
+        self,
+        query_text: str,
+        query_embedding: List[float],
+        top_k: int = 10,
+        mode: str = "rrf",
+        vector_weight: float = 0.7,
+        min_score: Optional[float] = None
+    ) -> List[str]:
+        """There is no BM25 side locally, so hybrid retrieval is vector-only."""
+        if not self._warned_hybrid:
+            print("⚠️  Local vector store has no lexical index; hybrid search uses vectors only")
+            self._warned_hybrid = True
+        return await self.search_similar(query_embedding, top_k, min_score=min_score)
+
+    async def close(self):
+        with self._lock:
+            self._reset()
+
+    # --- maintenance (scripts/build_local_vector_store.py) ---
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._sync()
+            return {
+                "rows": len(self._ids),
+                "vectors": len(self._rows),
+                "tombstones": len(self._ids) - len(self._rows),
+                "ivf_lists": 0 if self._centroids is None else len(self._centroids),
+                "nprobe": self.nprobe,
+            }
+
+    def train_ivf(self, n_lists: int, iterations: int = 10, sample_size: int = 100_000, seed: int = 0) -> int:
+        """
+        Partition the stored rows into n_lists clusters (spherical k-means on a
+        sample) and save the assignments. Returns the number of rows assigned.
+        """
+        with self._lock:
+            self._sync()
+            matrix, live = self._matrix, self._live
+        live_rows = np.flatnonzero(live)
+        if len(live_rows) < n_lists:
+            raise ValueError(f"Need at least {n_lists} vectors to train {n_lists} partitions, have {len(live_rows)}")
+
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(matrix[np.sort(rng.choice(live_rows, min(sample_size, len(live_rows)), replace=False))])
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            # Keep empty partitions where they were
+            empty = np.bincount(labels, minlength=n_lists) == 0
+            sums[empty] = centroids[empty]
+            centroids = normalize_rows(sums)
+
+        assign = self._nearest_centroid(matrix, centroids=centroids)
+        tmp = self._file(IVF_FILE + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, centroids=centroids, assign=assign)
+        os.replace(tmp, self._file(IVF_FILE))
+        with self._lock:
+            self._ivf_mtime = None
+            self._sync()
+        return len(assign)
+
+    def compact(self) -> int:
+        """
+        Rewrite the files without tombstoned rows. Drops the IVF partitions,
+        which refer to row numbers; retrain afterwards. Returns the live row count.
+        """
+        with self._lock, open(self._file(LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._sync()
+                rows = sorted(self._rows.items(), key=lambda item: item[1])
+                with open(self._file(VECTORS_FILE + ".tmp"), "wb") as f:
+                    for start in range(0, len(rows), self.block_rows):
+                        block = [row for _, row in rows[start:start + self.block_rows]]
+                        f.write(np.asarray(self._matrix[block], dtype="<f4").tobytes())
+                with open(self._file(LOG_FILE + ".tmp"), "wb") as f:
+                    f.write("".join(f"+\t{image_id}\n" for image_id, _ in rows).encode("utf-8"))
+                if os.path.exists(self._file(IVF_FILE)):
+                    os.remove(self._file(IVF_FILE))
+                # Readers only reopen the vectors when the log changes, so swap it last
+                os.replace(self._file(VECTORS_FILE + ".tmp"), self._file(VECTORS_FILE))
+                os.replace(self._file(LOG_FILE + ".tmp"), self._file(LOG_FILE))
+                self._reset()
+                self._sync()
+                return len(self._rows)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,145 @@
+"""
+Vector store interface and backend selection.
+
+Search, similar items, neighbour lists and uploads only need the calls in
+VectorStore, so the backend is picked by VECTOR_STORE:
+
+    elasticsearch: ESClient, the cluster index (default)
+    local: LocalVectorStore, memory-mapped files on this machine, for
+        tests, benchmarks, edge deployments and running without a cluster
+
+Scores on every backend are (1 + cosine) / 2, in [0, 1].
+"""
+from typing import Dict, List, Optional, Protocol, Tuple, runtime_checkable
+
+from app.config import settings
+
+VECTOR_STORES = ("elasticsearch", "local")
+
+
+class PageExpired(LookupError):
+    """Raised when a search_page cursor (e.g. an Elasticsearch point in time) has expired."""
+
+
+@runtime_checkable
+class VectorStore(Protocol):
+    embedding_dims: int
+
+    async def create_index(self) -> None: ...
+
+    async def index_image(
+        self,
+        image_id: str,
+        embedding: List[float],
+        title: Optional[str] = None,
+        description: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        owner_id: Optional[str] = None
+    ) -> None: ...
+
+    async def bulk_index(self, docs: List[dict]) -> int:
+        """Index many {"image_id", "embedding", ...} docs; returns how many were indexed."""
+        ...
+
+    async def delete_document(self, image_id: str, owner_id: Optional[str] = None) -> None: ...
+
+    async def search_similar(
+        self,
+        query_embedding: List[float],
+        top_k: int = 10,
+        min_score: Optional[float] = None,
+        with_scores: bool = False
+    ) -> list: ...
+
+    async def search_owned(
+        self,
+        query_embedding: List[float],
+        owner_id: str,
+        top_k: int = 10,
+        min_score: Optional[float] = None
+    ) -> Optional[List[Tuple[str, float]]]:
+        """
+        (image_id, score) hits among one owner's images, or None if the
+        backend can't confine a search to an owner.
+        """
+        ...
+
+    async def msearch_similar(
+        self,
+        query_embeddings: List[List[float]],
+        top_ks: List[int],
+        min_score: Optional[float] = None,
+        with_scores: bool = False
+    ) -> List[list]: ...
+
+    async def search_page(
+        self,
+        query_embedding: List[float],
+        size: int,
+        min_score: Optional[float] = None,
+        after: Optional[Tuple[float, str]] = None,
+        pit_id: Optional[str] = None
+    ) -> Tuple[List[Tuple[str, float]], Optional[str]]:
+        """
+        Up to `size` (image_id, score) hits of the exact ranking, ordered by
+        score desc then image_id, that sort after `after`. Returns the hits
+        and the point-in-time id to pass with the next page (None when the
+        backend has none or fewer than `size` hits were left).
+        """
+        ...
+
+    async def get_embeddings(self, image_ids: List[str], owner_id: Optional[str] = None) -> Dict[str, List[float]]:
+        """Stored vectors of image_ids; owner_id, if all belong to it, lets the backend narrow the lookup."""
+        ...
+
+    async def get_embedding(self, image_id: str, owner_id: Optional[str] = None) -> Optional[List[float]]: ...
+
+    async def update_metadata(
+        self,
+        image_id: str,
+        title: Optional[str],
+        description: Optional[str],
+        tags: Optional[List[str]],
+        owner_id: Optional[str] = None
+    ) -> None: ...
+
+    async def search_hybrid(
+        self,
+        query_text: str,
+        query_embedding: List[float],
+        top_k: int = 10,
+        mode: str = "rrf",
+        vector_weight: float = 0.7,
+        min_score: Optional[float] = None
+    ) -> List[str]: ...
+
+    def stats(self) -> dict: ...
+
+    async def close(self) -> None: ...
+
+
+_store: Optional[VectorStore] = None
+
+
+def get_vector_store() -> VectorStore:
+    """The process-wide vector store for the configured backend."""
+    global _store
+    if _store is None:
+        if settings.VECTOR_STORE == "local":
+            from app.vectorstore.local import LocalVectorStore
+            _store = LocalVectorStore()
+        elif settings.VECTOR_STORE == "elasticsearch":
+            from app.elasticsearch.client import ESClient
+            _store = ESClient()
+        else:
+            raise ValueError(f"VECTOR_STORE must be one of {', '.join(VECTOR_STORES)}, got {settings.VECTOR_STORE!r}")
+        print(f"🧭 Vector store: {settings.VECTOR_STORE}")
+    return _store
+
+
+async def close_vector_store():
+    """Close the process-wide store (its connection pool); called on shutdown."""
+    global _store
+    if _store is not None:
+        await _store.close()
+        _store = None
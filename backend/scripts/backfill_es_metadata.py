@@ -0,0 +1,72 @@
+"""
+Copy title, description and tags from MongoDB into the Elasticsearch index
+so hybrid (BM25 + kNN) text search can match them.
+
+Adds the text fields to the index mapping if needed, then partial-updates
+existing documents with _bulk requests. Embeddings are left untouched and
+images that were never indexed are skipped.
+
+Usage:
+    python scripts/backfill_es_metadata.py
+    python scripts/backfill_es_metadata.py --batch-size 1000
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.persistance.db import init_db
+from app.models.image import Image
+from app.elasticsearch.client import ESClient
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--batch-size', type=int, default=500, help='Documents per _bulk request')
+    args = ap.parse_args()
+
+    print("Initializing database connection...")
+    await init_db()
+    print("✅ Database initialized")
+
+    es_client = ESClient()
+    await es_client.create_index()
+
+    started = time.perf_counter()
+    seen = 0
+    updated = 0
+    after = None
+    projection = {"_id": 1, "title": 1, "description": 1, "tags": 1, "owner_id": 1}
+    while True:
+        query = {"_id": {"$gt": after}} if after else {}
+        cursor = Image.get_pymongo_collection().find(query, projection).sort("_id", 1).limit(args.batch_size)
+        docs = [doc async for doc in cursor]
+        if not docs:
+            break
+        after = docs[-1]["_id"]
+
+        seen += len(docs)
+        updated += await es_client.bulk_update_metadata([
+            {
+                "image_id": str(doc["_id"]),
+                "title": doc.get("title"),
+                "description": doc.get("description"),
+                "tags": doc.get("tags"),
+                "owner_id": doc.get("owner_id"),
+            }
+            for doc in docs
+        ])
+        print(f"   {updated}/{seen} documents updated")
+
+    await es_client.es.indices.refresh(index=es_client.read_indices(recent=0))
+    print(f"✅ Updated {updated} of {seen} images in {time.perf_counter() - started:.1f}s "
+          f"({seen - updated} not indexed)")
+    await es_client.es.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark: login throughput alongside concurrent search latency.
+
+Fires a sustained burst of /auth/login requests while a separate loop issues
+/use/search/text requests, then reports login throughput (and how many were
+shed with 503) next to the search latency distribution. Run it before and
+after changing PASSWORD_HASH_WORKERS or the ARGON2_* costs to see how much
+hashing load leaks into search latency.
+
+Run (from backend, against a running API):
+  python scripts/bench_login.py \
+    --base-url http://localhost:8000/api/v1 \
+    --email bench@example.com \
+    --password secret \
+    --login-concurrency 32 \
+    --duration 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from typing import List
+
+import aiohttp
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def get_token(session: aiohttp.ClientSession, base_url: str, email: str, password: str) -> str:
+    async with session.post(f"{base_url}/auth/login", json={"email": email, "password": password}) as resp:
+        if resp.status != 200:
+            print(f"❌ Login failed ({resp.status}): {await resp.text()}")
+            sys.exit(1)
+        return (await resp.json())["accessToken"]
+
+
+async def login_worker(session, base_url, email, password, deadline, results):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        async with session.post(f"{base_url}/auth/login", json={"email": email, "password": password}) as resp:
+            await resp.read()
+            results.setdefault(resp.status, []).append(time.perf_counter() - start)
+
+
+async def search_worker(session, base_url, token, query, deadline, latencies, errors):
+    headers = {"Authorization": f"Bearer {token}"}
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        async with session.post(
+            f"{base_url}/use/search/text",
+            params={"query": query, "page_size": 20},
+            headers=headers
+        ) as resp:
+            await resp.read()
+            if resp.status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors.append(resp.status)
+
+
+async def run(args):
+    timeout = aiohttp.ClientTimeout(total=60)
+    connector = aiohttp.TCPConnector(limit=args.login_concurrency + args.search_concurrency + 4)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        token = await get_token(session, args.base_url, args.email, args.password)
+
+        # Baseline: search latency with no login load
+        baseline: List[float] = []
+        baseline_errors: List[int] = []
+        await search_worker(
+            session, args.base_url, token, args.query,
+            time.perf_counter() + args.baseline, baseline, baseline_errors
+        )
+
+        login_results = {}
+        latencies: List[float] = []
+        errors: List[int] = []
+        deadline = time.perf_counter() + args.duration
+        started = time.perf_counter()
+        await asyncio.gather(
+            *[
+                login_worker(session, args.base_url, args.email, args.password, deadline, login_results)
+                for _ in range(args.login_concurrency)
+            ],
+            *[
+                search_worker(session, args.base_url, token, args.query, deadline, latencies, errors)
+                for _ in range(args.search_concurrency)
+            ]
+        )
+        elapsed = time.perf_counter() - started
+
+    ok = login_results.get(200, [])
+    shed = login_results.get(503, [])
+    print("=" * 60)
+    print(f"Login load: {args.login_concurrency} concurrent for {elapsed:.1f}s")
+    print(f"  successful logins:  {len(ok)} ({len(ok) / elapsed:.1f}/s)")
+    print(f"  shed with 503:      {len(shed)}")
+    other = {code: len(v) for code, v in login_results.items() if code not in (200, 503)}
+    if other:
+        print(f"  other statuses:     {other}")
+    if ok:
+        print(f"  login p50/p95:      {percentile(ok, 50) * 1000:.0f} / {percentile(ok, 95) * 1000:.0f} ms")
+    print("Search latency (ms)        p50     p95     p99    mean")
+    for label, values in (("  baseline", baseline), ("  under login load", latencies)):
+        if not values:
+            print(f"{label:<24} no successful requests")
+            continue
+        print(
+            f"{label:<24} {percentile(values, 50) * 1000:6.0f}  {percentile(values, 95) * 1000:6.0f}  "
+            f"{percentile(values, 99) * 1000:6.0f}  {statistics.mean(values) * 1000:6.0f}"
+        )
+    if errors or baseline_errors:
+        print(f"  search errors: {len(baseline_errors) + len(errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput vs search latency benchmark")
+    parser.add_argument("--base-url", default="http://localhost:8000/api/v1")
+    parser.add_argument("--email", required=True, help="Email of an existing test user")
+    parser.add_argument("--password", required=True, help="Password of the test user")
+    parser.add_argument("--query", default="a dog playing in the park", help="Text search query")
+    parser.add_argument("--login-concurrency", type=int, default=32)
+    parser.add_argument("--search-concurrency", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of combined load")
+    parser.add_argument("--baseline", type=float, default=5.0, help="Seconds of search-only baseline")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Build or maintain the local (memory-mapped) vector store used when
+VECTOR_STORE=local.
+
+Copies every indexed embedding from Elasticsearch (read with _mget, in
+MongoDB _id order), optionally compacts away tombstoned rows and trains
+the coarse IVF partitions that let searches scan only the nearest
+LOCAL_VECTOR_STORE_NPROBE partitions. Compacting rewrites the files in
+place; run it while the API is stopped.
+
+Usage:
+    python scripts/build_local_vector_store.py --copy-from-es
+    python scripts/build_local_vector_store.py --compact --ivf-lists 1024
+    python scripts/build_local_vector_store.py --stats
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.persistance.db import init_db
+from app.models.image import Image
+from app.elasticsearch.client import ESClient
+from app.vectorstore.local import LocalVectorStore
+
+
+async def copy_from_es(store: LocalVectorStore, batch_size: int) -> int:
+    print("Initializing database connection...")
+    await init_db()
+    print("✅ Database initialized")
+
+    es_client = ESClient()
+    copied = 0
+    seen = 0
+    after = None
+    try:
+        while True:
+            query = {"_id": {"$gt": after}} if after else {}
+            cursor = Image.get_pymongo_collection().find(query, {"_id": 1}).sort("_id", 1).limit(batch_size)
+            ids = [doc["_id"] async for doc in cursor]
+            if not ids:
+                break
+            after = ids[-1]
+            seen += len(ids)
+
+            embeddings = await es_client.get_embeddings([str(img_id) for img_id in ids])
+            copied += await store.bulk_index([
+                {"image_id": img_id, "embedding": embedding} for img_id, embedding in embeddings.items()
+            ])
+            print(f"   {copied}/{seen} vectors copied")
+    finally:
+        await es_client.close()
+    return copied
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--path', default=settings.LOCAL_VECTOR_STORE_PATH, help='Local vector store directory')
+    ap.add_argument('--copy-from-es', action='store_true', help='Copy all indexed embeddings from Elasticsearch')
+    ap.add_argument('--batch-size', type=int, default=500, help='Images per _mget when copying')
+    ap.add_argument('--compact', action='store_true', help='Drop tombstoned rows (API must be stopped)')
+    ap.add_argument('--ivf-lists', type=int, default=settings.LOCAL_VECTOR_STORE_IVF_LISTS,
+                    help='Train this many IVF partitions (0 = keep exact search)')
+    ap.add_argument('--stats', action='store_true', help='Only print store statistics')
+    args = ap.parse_args()
+
+    store = LocalVectorStore(path=args.path)
+    if not args.stats:
+        started = time.perf_counter()
+        if args.copy_from_es:
+            copied = await copy_from_es(store, args.batch_size)
+            print(f"✅ Copied {copied} vectors in {time.perf_counter() - started:.1f}s")
+        if args.compact:
+            print(f"✅ Compacted to {store.compact()} vectors")
+        if args.ivf_lists:
+            assigned = store.train_ivf(args.ivf_lists)
+            print(f"✅ Trained {args.ivf_lists} IVF partitions over {assigned} rows")
+    print(f"📊 {store.stats()}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
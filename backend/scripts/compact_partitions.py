@@ -0,0 +1,74 @@
+"""
+Force-merge old time partitions of the index in use into one segment per
+shard.
+
+With ES_INDEX_PARTITIONS set, new index versions keep one index per upload
+month (or year), see scripts/reindex_embeddings.py. Past periods receive
+almost no writes, so each can be merged once: one segment means one HNSW
+graph per shard to search instead of one per segment. The newest --keep
+periods are left alone.
+
+Compacted partitions stay writable, so deletes, visibility changes and
+metadata edits keep applying to them. A delete only marks the document in
+the merged segment; an edit adds a small segment, which the next run merges
+again.
+
+Usage:
+    python scripts/compact_partitions.py [--keep 1] [--dry-run]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.elasticsearch.client import ESClient
+from app.util.partitions import recent_partitions
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--keep', type=int, default=1, help='Newest periods left alone (the current one at least)')
+    ap.add_argument('--dry-run', action='store_true', help='Only list what would be compacted')
+    args = ap.parse_args()
+
+    es_client = ESClient()
+    try:
+        await es_client.create_index()
+        if not es_client.partition_by:
+            print(f"⚠️  {es_client.index_name} is not partitioned; set ES_INDEX_PARTITIONS and "
+                  f"build a new version with scripts/reindex_embeddings.py --swap")
+            return
+
+        versions = await es_client.index_versions()
+        current = recent_partitions(es_client.index_name, es_client.partition_by, max(args.keep, 1))
+        # Names sort by period; anything newer than the kept periods is still being written
+        old = [name for name in versions[es_client.index_name]["partitions"] if name < min(current)]
+        if not old:
+            print(f"✅ No partitions of {es_client.index_name} older than {min(current)}")
+            return
+
+        indices = ",".join(old)
+        shard_counts = await es_client.es.indices.get_settings(
+            index=indices, name="index.number_of_shards", flat_settings=True
+        )
+        stats = await es_client.es.indices.stats(index=indices, metric="segments")
+        for name in old:
+            shards = int(shard_counts.get(name, {}).get("settings", {}).get("index.number_of_shards", 1))
+            segments = stats["indices"].get(name, {}).get("primaries", {}).get("segments", {}).get("count", 0)
+            if segments <= shards:
+                print(f"   {name}: already compacted")
+                continue
+            if args.dry_run:
+                print(f"   {name}: would merge {segments} segments")
+                continue
+            await es_client.es.options(request_timeout=3600).indices.forcemerge(index=name, max_num_segments=1)
+            print(f"✅ {name}: merged {segments} segments into one per shard")
+    finally:
+        await es_client.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+"""
+Build the precomputed "similar items" lists for public images.
+
+Each list holds the NEIGHBORS_TOP_K nearest images by stored embedding and
+is served by /use/search/similar/{media_id} while younger than
+NEIGHBORS_MAX_AGE. Uploads update the affected lists incrementally; run
+this periodically (e.g. nightly with --stale-only) and after re-indexing.
+
+Usage:
+    python scripts/compute_neighbors.py
+    python scripts/compute_neighbors.py --stale-only
+    python scripts/compute_neighbors.py --media-id 6751f0c2a1b2c3d4e5f60718
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.persistance.db import init_db
+from app.services.neighborservice import NeighborService
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--stale-only', action='store_true', help='Only rebuild missing or expired lists')
+    ap.add_argument('--page-size', type=int, default=500, help='Public image ids read per page')
+    ap.add_argument('--media-id', nargs='+', help='Rebuild only these media ids')
+    args = ap.parse_args()
+
+    print("Initializing database connection...")
+    await init_db()
+    print("✅ Database initialized")
+
+    service = NeighborService()
+    started = time.perf_counter()
+    if args.media_id:
+        written = await service.compute(args.media_id)
+    else:
+        written = await service.refresh_all(page_size=args.page_size, stale_only=args.stale_only)
+    print(f"✅ Wrote {written} neighbour lists in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -26,7 +26,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.models.image import Image
 from app.services.cloudinaryservice import cloudinary_service
-from app.elasticsearch.client import ESClient
+from app.vectorstore.store import get_vector_store
 from app.config import settings
 from beanie import init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -62,7 +62,7 @@ class DataIngestionPipeline:
         self.user_id = user_id
         self.batch_size = batch_size
         self.skip_cloudinary = skip_cloudinary
-        self.es_client = None
+        self.vector_store = None
         self.stats = {
             'total': 0,
             'processed': 0,
@@ -74,7 +74,7 @@ class DataIngestionPipeline:
         }
 
     async def initialize(self):
-        """Initialize database and Elasticsearch connections."""
+        """Initialize the database and the vector store."""
         logger.info("Initializing connections...")
 
         # Initialize MongoDB
@@ -84,9 +84,9 @@ class DataIngestionPipeline:
             document_models=[Image]
         )
 
-        # Initialize Elasticsearch
-        self.es_client = ESClient()
-        await self.es_client.create_index()
+        # Initialize the vector store (Elasticsearch or local, per VECTOR_STORE)
+        self.vector_store = get_vector_store()
+        await self.vector_store.create_index()
 
         logger.info("✓ Connections initialized")
 
@@ -177,15 +177,19 @@ class DataIngestionPipeline:
             # Save to MongoDB
             await image_doc.save()
 
-            # Index in Elasticsearch
+            # Index in the vector store
             try:
-                await self.es_client.index_image(
+                await self.vector_store.index_image(
                     image_id=str(image_doc.id),
-                    embedding=image_embedding
+                    embedding=image_embedding,
+                    title=image_doc.title,
+                    description=image_doc.description,
+                    tags=image_doc.tags,
+                    owner_id=image_doc.owner_id
                 )
                 self.stats['indexed'] += 1
             except Exception as e:
-                logger.warning(f"Elasticsearch indexing failed for {filename}: {e}")
+                logger.warning(f"Vector indexing failed for {filename}: {e}")
                 # Continue - we still have MongoDB record
 
             self.stats['processed'] += 1
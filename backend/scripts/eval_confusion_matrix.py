@@ -130,8 +130,12 @@ def save_confusion(y_true: List[int], y_pred: List[int], labels: List[int], id_t
 async def eval_text(search_service: SearchService, cat_id_to_name, file_to_cat, labels, out_dir: Path, top_k: int):
     y_true: List[int] = []
     y_pred: List[int] = []
-    for cat_id, cat_name in cat_id_to_name.items():
-        results = await search_service.search_by_text(cat_name, top_k=top_k)
+    # One batch: a single embedding call and a single _msearch for all categories
+    categories = list(cat_id_to_name.items())
+    batch = await search_service.search_batch(
+        [{"text": cat_name, "top_k": top_k} for _, cat_name in categories]
+    )
+    for (cat_id, _), results in zip(categories, batch):
         for r in results:
             pred_cat = infer_class_from_filename(r.get("filename") or r.get("mediaUrl", ""), file_to_cat)
             if pred_cat is None:
@@ -0,0 +1,100 @@
+"""
+Fit the PCA projection used for two-stage retrieval and measure its recall.
+
+Fits on a random sample of stored embeddings of the configured model, then
+ranks held-out query embeddings the way a two-stage index does (kNN on the
+short vector for top_k * oversample candidates, exact rescoring on the full
+vector) and compares with exact search over the same sample. The fit is
+saved under MODEL_CACHE_DIR/pca/.
+
+To serve from it, set SEARCH_PCA_DIMS to the fitted size and build a new
+index version with scripts/reindex_embeddings.py --swap (vectors are copied
+from the current index, not re-embedded).
+
+Usage:
+    python scripts/fit_pca.py --dims 128
+    python scripts/fit_pca.py --dims 64 --sample 50000 --oversample 8 --dry-run
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path to import app modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.persistance.db import init_db
+from app.models.image import Image
+from app.elasticsearch.client import ESClient
+from app.util.pca import PCAProjection, two_stage_rank
+from app.util.vectors import normalize_rows, rank_exact
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--dims', type=int, required=True, help='Short vector size, e.g. 64-128')
+    ap.add_argument('--sample', type=int, default=20000, help='Stored embeddings to fit on')
+    ap.add_argument('--queries', type=int, default=200, help='Held-out embeddings used as queries')
+    ap.add_argument('--top-k', type=int, default=10)
+    ap.add_argument('--oversample', type=float, nargs='+', default=[settings.SEARCH_PCA_OVERSAMPLE],
+                    help='Candidate multipliers to measure recall for')
+    ap.add_argument('--dry-run', action='store_true', help='Measure only, do not save the fit')
+    args = ap.parse_args()
+
+    print("Initializing database connection...")
+    await init_db()
+    print("✅ Database initialized")
+
+    es_client = ESClient()
+    await es_client.create_index()
+    try:
+        cursor = Image.get_pymongo_collection().aggregate([
+            {"$sample": {"size": args.sample + args.queries}}, {"$project": {"_id": 1}}
+        ])
+        ids = [str(doc["_id"]) async for doc in cursor]
+        embeddings = {}
+        for start in range(0, len(ids), 1000):
+            embeddings.update(await es_client.get_embeddings(ids[start:start + 1000]))
+    finally:
+        await es_client.close()
+
+    ids = list(embeddings)
+    if len(ids) <= args.queries + args.dims:
+        print(f"❌ Only {len(ids)} stored embeddings; need more than --queries + --dims")
+        return
+    query_ids, corpus_ids = ids[:args.queries], ids[args.queries:]
+    corpus = np.asarray([embeddings[img_id] for img_id in corpus_ids], dtype=np.float32)
+    queries = np.asarray([embeddings[img_id] for img_id in query_ids], dtype=np.float32)
+
+    projection = PCAProjection.fit(corpus, args.dims, settings.DEFAULT_CLIP_MODEL)
+    full_dims = corpus.shape[1]
+    print(f"\n📐 {full_dims} -> {args.dims} dims keeps {projection.explained:.1%} of the variance "
+          f"(indexed vectors {args.dims / full_dims:.0%} of the size)")
+
+    matrix = normalize_rows(corpus)
+    short = projection.project(corpus)
+    short_queries = projection.project(queries)
+    truth = [{img_id for img_id, _ in rank_exact(corpus_ids, matrix, query, args.top_k)} for query in queries]
+
+    print(f"🎯 Recall@{args.top_k} vs exact search ({len(corpus_ids):,} vectors, {len(query_ids)} queries)")
+    for oversample in args.oversample:
+        candidates = int(np.ceil(args.top_k * oversample))
+        recall = statistics.mean(
+            len({img_id for img_id, _ in two_stage_rank(
+                corpus_ids, matrix, short, query, short_query, args.top_k, candidates
+            )} & expected) / len(expected)
+            for query, short_query, expected in zip(queries, short_queries, truth)
+        )
+        print(f"   oversample {oversample:>4}: {candidates} candidates, recall {recall:.3f}")
+
+    if not args.dry_run:
+        path = projection.save()
+        print(f"✅ Saved fit {projection.fingerprint} to {path}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
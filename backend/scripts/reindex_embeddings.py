@@ -0,0 +1,179 @@
+"""
+Re-embed every image with another CLIP model into a new versioned index,
+while the current one keeps serving, then swap the search alias.
+
+The target is the newest <alias>_vN index whose model, dims, PCA fit
+(SEARCH_PCA_DIMS, see scripts/fit_pca.py), time partitioning
+(ES_INDEX_PARTITIONS) and owner routing (ES_ROUTE_BY_OWNER) match,
+created on first run.
+Images are re-embedded from their stored URLs in MongoDB _id order; when
+another version already holds this model's embeddings (e.g. only the
+index layout changes) they are copied from it instead. The last _id done
+is saved in the target index's _meta, so an interrupted run resumes where
+it stopped. With --swap the alias is switched atomically once coverage
+(MongoDB images present in the target) reaches --min-coverage.
+
+Switching models without downtime:
+    1. python scripts/reindex_embeddings.py --model openai/clip-vit-large-patch14 --rate 20
+    2. python scripts/reindex_embeddings.py --model openai/clip-vit-large-patch14 --swap
+    3. Set DEFAULT_CLIP_MODEL (and EMBEDDING_DIMS) and restart the API
+    4. Run step 1 again to pick up images uploaded by the old API after the swap
+
+Each API process reads the index that holds its own model's embeddings,
+so old and new processes both serve correct results during the rollout.
+
+Usage:
+    python scripts/reindex_embeddings.py --model <model> [--batch-size 16] [--rate 20] [--swap]
+    python scripts/reindex_embeddings.py --status
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+ap = argparse.ArgumentParser()
+ap.add_argument('--model', help='CLIP model to re-embed with (default DEFAULT_CLIP_MODEL)')
+ap.add_argument('--batch-size', type=int, default=16, help='Images embedded per batch')
+ap.add_argument('--rate', type=float, default=0, help='Max images per second (0 = unlimited)')
+ap.add_argument('--swap', action='store_true', help='Swap the alias once coverage is reached')
+ap.add_argument('--min-coverage', type=float, default=1.0, help='Coverage required for --swap (0-1)')
+ap.add_argument('--status', action='store_true', help='Only list index versions')
+args = ap.parse_args()
+
+# The embedders load DEFAULT_CLIP_MODEL on import
+if args.model:
+    os.environ["DEFAULT_CLIP_MODEL"] = args.model
+
+# Add parent directory to path to import app modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from bson import ObjectId
+from PIL import Image as PILImage
+
+from app.config import settings
+from app.persistance.db import init_db
+from app.models.image import Image, image_embedder
+from app.elasticsearch.client import ESClient
+
+
+def embed(images: list) -> list:
+    """(image_id, embedding) for each image that could be embedded."""
+    with_url = [img for img in images if img.get("file_path")]
+    embedded = []
+    try:
+        vectors = image_embedder.process_images([img["file_path"] for img in with_url])
+        embedded = list(zip(with_url, vectors))
+    except Exception:
+        # One unreachable URL fails the batch; retry one by one
+        for img in with_url:
+            try:
+                embedded.append((img, image_embedder.process_images([img["file_path"]])[0]))
+            except Exception as e:
+                print(f"   ⚠️  Skipping {img['_id']}: {e}")
+    for img in images:
+        if not img.get("file_path"):
+            # No stored file: same text fallback as ImageService.create_image
+            text = f"{img.get('title', '')} {img.get('description') or ''}".strip()
+            embedded.append((img, Image.generate_text_embedding(text)))
+    return [(str(img["_id"]), vector) for img, vector in embedded]
+
+
+async def coverage(es_client: ESClient, index: str, batch_size: int = 1000) -> tuple:
+    """(images present in index, images in MongoDB)."""
+    present = total = 0
+    after = None
+    while True:
+        query = {"_id": {"$gt": after}} if after else {}
+        cursor = Image.get_pymongo_collection().find(query, {"_id": 1}).sort("_id", 1).limit(batch_size)
+        ids = [doc["_id"] async for doc in cursor]
+        if not ids:
+            return present, total
+        after = ids[-1]
+        total += len(ids)
+        present += len(await es_client.existing_ids([str(img_id) for img_id in ids], index=index))
+
+
+async def main():
+    es_client = ESClient()
+    try:
+        versions = await es_client.index_versions()
+        if args.status:
+            for name, version in sorted(versions.items()):
+                print(f"   {name}: {version}")
+            return
+
+        print("Initializing database connection...")
+        await init_db()
+        print("✅ Database initialized")
+
+        model = settings.DEFAULT_CLIP_MODEL
+        dims = len(image_embedder.get_image_embeddings(PILImage.new("RGB", (224, 224))))
+        matching = sorted(name for name, v in versions.items() if es_client.builds(v, model, dims))
+        target = matching[-1] if matching else await es_client.create_version(model, dims)
+        versions = await es_client.index_versions()
+        after = versions[target]["backfill_after"]
+        source = next((
+            name for name, v in sorted(versions.items())
+            if name != target and v["model"] == model and v["dims"] == dims
+        ), None)
+        print(f"🔁 Re-embedding into {target} with {model} ({dims} dims)"
+              + (f", copying vectors from {source}" if source else "")
+              + (f", resuming after {after}" if after else ""))
+
+        # Writes go to the target version, not the alias
+        es_client.use_index(target, versions[target])
+        started = time.perf_counter()
+        done = 0
+        projection = {"_id": 1, "file_path": 1, "title": 1, "description": 1, "tags": 1, "owner_id": 1}
+        while True:
+            batch_started = time.perf_counter()
+            query = {"_id": {"$gt": ObjectId(after)}} if after else {}
+            cursor = Image.get_pymongo_collection().find(query, projection).sort("_id", 1).limit(args.batch_size)
+            images = [doc async for doc in cursor]
+            if not images:
+                break
+
+            vectors = await es_client.get_embeddings(
+                [str(img["_id"]) for img in images], index=source, version=versions[source]
+            ) if source else {}
+            missing = [img for img in images if str(img["_id"]) not in vectors]
+            if missing:
+                vectors.update(await asyncio.to_thread(embed, missing))
+            done += await es_client.bulk_index([
+                {
+                    "image_id": str(img["_id"]),
+                    "embedding": vectors[str(img["_id"])],
+                    "title": img.get("title"),
+                    "description": img.get("description"),
+                    "tags": img.get("tags"),
+                    "owner_id": img.get("owner_id"),
+                }
+                for img in images if str(img["_id"]) in vectors
+            ])
+            after = str(images[-1]["_id"])
+            await es_client.set_backfill_checkpoint(target, versions[target]["meta"], after)
+            print(f"   {done} images re-embedded ({done / (time.perf_counter() - started):.1f}/s)")
+
+            if args.rate:
+                await asyncio.sleep(max(0.0, len(images) / args.rate - (time.perf_counter() - batch_started)))
+
+        present, total = await coverage(es_client, target)
+        ratio = present / total if total else 1.0
+        print(f"📊 Coverage of {target}: {present}/{total} ({ratio:.1%})")
+
+        if args.swap:
+            if versions.get(target, {}).get("live"):
+                print(f"✅ {target} is already live")
+            elif ratio >= args.min_coverage:
+                await es_client.swap_alias(target)
+                print(f"✅ Now set DEFAULT_CLIP_MODEL={model} and EMBEDDING_DIMS={dims} and restart the API")
+            else:
+                print(f"⏸️  Not swapping: coverage below {args.min_coverage:.0%}")
+    finally:
+        await es_client.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
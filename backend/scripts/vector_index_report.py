@@ -0,0 +1,144 @@
+"""
+Compare vector index types on our own embeddings: memory footprint and
+recall against exact search.
+
+Memory is estimated for the live index size with the formulas from the
+Elasticsearch kNN tuning guide (RAM needed to keep the quantized vectors
+and the HNSW graph in the page cache; quantized types also keep the float
+vectors on disk for rescoring). Recall is measured by loading a random
+sample of stored embeddings into a temporary index per type and comparing
+kNN hits for held-out query embeddings with an exact NumPy ranking.
+
+Usage:
+    python scripts/vector_index_report.py
+    python scripts/vector_index_report.py --sample 20000 --queries 500 --top-k 20
+    python scripts/vector_index_report.py --types int8_hnsw bbq_hnsw --oversample 5
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path to import app modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.persistance.db import init_db
+from app.models.image import Image
+from app.elasticsearch.client import ESClient, VECTOR_INDEX_TYPES
+from app.util.vectors import normalize_rows, rank_exact
+
+
+def footprint(index_type: str, n: int, dims: int, m: int) -> dict:
+    """Estimated bytes: RAM for vectors + graph, and disk for the vectors."""
+    vectors = {
+        "hnsw": n * dims * 4,
+        "int8_hnsw": n * (dims + 4),
+        "int4_hnsw": n * (dims / 2 + 4),
+        "bbq_hnsw": n * (dims / 8 + 14),
+    }[index_type]
+    graph = n * 4 * m
+    disk = vectors + (n * dims * 4 if index_type != "hnsw" else 0)
+    return {"ram": vectors + graph, "disk": disk}
+
+
+def mb(n: float) -> str:
+    return f"{n / 2 ** 20:,.1f} MB"
+
+
+async def sample_embeddings(es_client: ESClient, size: int) -> dict:
+    cursor = Image.get_pymongo_collection().aggregate([{"$sample": {"size": size}}, {"$project": {"_id": 1}}])
+    ids = [str(doc["_id"]) async for doc in cursor]
+    embeddings = {}
+    for start in range(0, len(ids), 1000):
+        embeddings.update(await es_client.get_embeddings(ids[start:start + 1000]))
+    return embeddings
+
+
+async def measure(index_type: str, oversample: float, corpus: dict, queries: list, truth: list, top_k: int, dims: int) -> dict:
+    bench = ESClient()
+    bench.index_name = f"{bench.alias}_report_{index_type}"
+    bench.index_type = index_type
+    bench.oversample = oversample
+    bench.search_method = "knn"
+    try:
+        if await bench.es.indices.exists(index=bench.index_name):
+            await bench.es.indices.delete(index=bench.index_name)
+        await bench.es.indices.create(index=bench.index_name, mappings=bench._mapping("report", dims, index_type, oversample))
+        items = list(corpus.items())
+        for start in range(0, len(items), 1000):
+            await bench.bulk_index([
+                {"image_id": img_id, "embedding": embedding} for img_id, embedding in items[start:start + 1000]
+            ])
+        # One segment, like a settled production index
+        await bench.es.indices.forcemerge(index=bench.index_name, max_num_segments=1)
+        await bench.es.indices.refresh(index=bench.index_name)
+
+        recalls, latencies = [], []
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            hits = await bench.search_similar(query, top_k)
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(len(set(hits) & set(expected)) / len(expected) if expected else 1.0)
+        return {
+            "recall": statistics.mean(recalls),
+            "p50_ms": statistics.median(latencies),
+            "num_candidates": bench._num_candidates(top_k),
+        }
+    finally:
+        await bench.es.indices.delete(index=bench.index_name, ignore_unavailable=True)
+        await bench.close()
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--sample', type=int, default=10000, help='Stored embeddings loaded per test index')
+    ap.add_argument('--queries', type=int, default=200, help='Held-out embeddings used as queries')
+    ap.add_argument('--top-k', type=int, default=10)
+    ap.add_argument('--types', nargs='+', default=list(VECTOR_INDEX_TYPES), choices=VECTOR_INDEX_TYPES)
+    ap.add_argument('--oversample', type=float, default=settings.ES_VECTOR_OVERSAMPLE)
+    args = ap.parse_args()
+
+    print("Initializing database connection...")
+    await init_db()
+    print("✅ Database initialized")
+
+    es_client = ESClient()
+    await es_client.create_index()
+    try:
+        total = (await es_client.es.count(index=es_client.read_indices(recent=0)))["count"]
+        dims = es_client.embedding_dims
+
+        print(f"\n📦 Estimated footprint for {total:,} vectors of {dims} dims (m={es_client.hnsw_m})")
+        for index_type in args.types:
+            size = footprint(index_type, total, dims, es_client.hnsw_m)
+            print(f"   {index_type:<10} RAM {mb(size['ram']):>14}   disk {mb(size['disk']):>14}")
+
+        embeddings = await sample_embeddings(es_client, args.sample + args.queries)
+    finally:
+        await es_client.close()
+
+    ids = list(embeddings)
+    if len(ids) <= args.queries:
+        print(f"❌ Only {len(ids)} stored embeddings; need more than --queries")
+        return
+    query_ids, corpus_ids = ids[:args.queries], ids[args.queries:]
+    corpus = {img_id: embeddings[img_id] for img_id in corpus_ids}
+    queries = [embeddings[img_id] for img_id in query_ids]
+    matrix = normalize_rows(np.asarray([corpus[img_id] for img_id in corpus_ids], dtype=np.float32))
+    truth = [[img_id for img_id, _ in rank_exact(corpus_ids, matrix, query, args.top_k)] for query in queries]
+
+    print(f"\n🎯 Recall@{args.top_k} vs exact search ({len(corpus):,} vectors, {len(queries)} queries, "
+          f"oversample {args.oversample})")
+    for index_type in args.types:
+        result = await measure(index_type, args.oversample, corpus, queries, truth, args.top_k, dims)
+        print(f"   {index_type:<10} recall {result['recall']:.3f}   p50 {result['p50_ms']:.1f} ms   "
+              f"num_candidates {result['num_candidates']}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+
+from app.cache.redis_client import redis_client
+from app.util import admission
+from app.util.admission import EndpointLimiter, UserRateLimiter, admit
+from app.util.current_user import get_current_user
+from app.util.resilience import remaining_budget
+
+
+async def _hold(limiter: EndpointLimiter, release: asyncio.Event):
+    async with limiter.slot():
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_with_retry_after():
+    limiter = EndpointLimiter("test", max_concurrency=1, max_queue=1, deadline_ms=1000)
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(limiter, release))
+    waiter = asyncio.create_task(_hold(limiter, release))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(HTTPException) as rejected:
+        async with limiter.slot():
+            pass
+    assert rejected.value.status_code == 503
+    assert "Retry-After" in rejected.value.headers
+    assert limiter.stats()["rejected_queue_full"] == 1
+
+    release.set()
+    await asyncio.gather(holder, waiter)
+    assert limiter.stats()["admitted"] == 2
+
+
+@pytest.mark.asyncio
+async def test_queued_request_expires_at_its_deadline():
+    limiter = EndpointLimiter("test", max_concurrency=1, max_queue=4, deadline_ms=50)
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(limiter, release))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(HTTPException) as expired:
+        async with limiter.slot():
+            pass
+    assert expired.value.status_code == 503
+    assert limiter.stats()["rejected_deadline"] == 1
+    assert limiter.stats()["waiting"] == 0
+
+    release.set()
+    await holder
+
+
+async def _get(app: FastAPI, path: str):
+    """Drive one GET through the ASGI app; returns (status, json body)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [], "client": ("test", 1), "server": ("test", 80),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    status = next(m["status"] for m in messages if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body")
+    return status, json.loads(body)
+
+
+@pytest.mark.asyncio
+async def test_deadline_is_visible_inside_the_endpoint(monkeypatch):
+    monkeypatch.setitem(admission.limiters, "test", EndpointLimiter("test", 1, 1, deadline_ms=2000))
+    app = FastAPI()
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id="user-1")
+
+    @app.get("/budget", dependencies=[Depends(admit("test"))])
+    async def budget():
+        return {"remaining": remaining_budget()}
+
+    status, body = await _get(app, "/budget")
+    assert status == 200
+    assert body["remaining"] is not None and 0 < body["remaining"] <= 2.0
+    assert remaining_budget() is None
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_fails_open_when_redis_errors(monkeypatch):
+    class BrokenRedis:
+        async def eval(self, *args):
+            raise ConnectionError("redis down")
+
+    monkeypatch.setattr(redis_client, "redis", BrokenRedis())
+    limiter = UserRateLimiter(rate=0.001, burst=1)
+    for _ in range(3):
+        await limiter.check("user-1", "search")
+    assert limiter.stats() == {"allowed": 0, "throttled": 0}
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_throttles_with_retry_after(monkeypatch):
+    class EmptyBucket:
+        async def eval(self, *args):
+            return [0, "2.5"]
+
+    monkeypatch.setattr(redis_client, "redis", EmptyBucket())
+    with pytest.raises(HTTPException) as throttled:
+        await UserRateLimiter(rate=1, burst=1).check("user-1", "search")
+    assert throttled.value.status_code == 429
+    assert throttled.value.headers["Retry-After"] == "3"
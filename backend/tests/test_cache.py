@@ -0,0 +1,196 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from app.cache.memory import MemoryTier
+from app.cache.serializers import JSONSerializer, NumpySerializer, PickleSerializer, ZlibCompressed
+from app.cache.singleflight import SingleFlight
+from app.cache.tiered import TieredCache, MISS
+from app.util.resilience import call_timeout, request_deadline
+
+
+def test_memory_tier_evicts_least_recently_used():
+    tier = MemoryTier(max_entries=2)
+    tier.set("a", b"1")
+    tier.set("b", b"2")
+    tier.get("a")
+    tier.set("c", b"3")
+    assert tier.get("b") is None
+    assert tier.get("a") == b"1"
+    assert tier.get("c") == b"3"
+    assert tier.evictions == 1
+
+
+def test_memory_tier_respects_byte_budget():
+    tier = MemoryTier(max_bytes=1000)
+    for i in range(10):
+        tier.set(str(i), b"x" * 200)
+    assert tier.size_bytes <= 1000
+    assert tier.get("9") is not None
+    assert tier.get("0") is None
+
+
+def test_memory_tier_expires_entries():
+    tier = MemoryTier()
+    tier.set("a", b"1", ttl=-1)
+    assert tier.get("a") is None
+    assert len(tier) == 0
+
+
+@pytest.mark.parametrize("serializer, value", [
+    (JSONSerializer(), {"ids": ["a", "b"], "total": 2}),
+    (PickleSerializer(), [("a", 0.5), ("b", 0.25)]),
+    (ZlibCompressed(JSONSerializer(), threshold=10), {"text": "y" * 500}),
+    (ZlibCompressed(JSONSerializer()), None),
+])
+def test_serializers_round_trip(serializer, value):
+    assert serializer.loads(serializer.dumps(value)) == value
+
+
+def test_numpy_serializer_round_trip():
+    matrix = np.random.rand(3, 4).astype(np.float32)
+    serializer = NumpySerializer()
+    assert np.array_equal(serializer.loads(serializer.dumps(matrix)), matrix)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_concurrent_calls():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "done"
+
+    results = await asyncio.gather(*[flight.do("k", work) for _ in range(5)])
+    assert results == ["done"] * 5
+    assert calls == 1
+    assert flight.stats()["shared"] == 4
+
+
+@pytest.mark.asyncio
+async def test_single_flight_survives_leader_cancellation():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return "done"
+
+    leader = asyncio.create_task(flight.do("k", work))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("k", work))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    assert await follower == "done"
+    assert leader.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_single_flight_reruns_for_followers_when_leader_deadline_expires():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        call_timeout()
+        return "done"
+
+    async def leader():
+        with request_deadline(time.monotonic() + 0.01):
+            return await flight.do("k", work)
+
+    leading = asyncio.create_task(leader())
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("k", work))
+
+    assert await follower == "done"
+    with pytest.raises(TimeoutError):
+        await leading
+    assert calls == 2
+    assert flight.stats()["retried"] == 1
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_other_failures():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("bad query")
+
+    results = await asyncio.gather(*[flight.do("k", work) for _ in range(3)], return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_single_flight_cancels_work_nobody_waits_for():
+    flight = SingleFlight()
+    started = asyncio.Event()
+    cancelled = False
+
+    async def work():
+        nonlocal cancelled
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+
+    caller = asyncio.create_task(flight.do("k", work))
+    await started.wait()
+    caller.cancel()
+    await asyncio.sleep(0.01)
+    assert cancelled
+    assert flight._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_tiered_cache_without_redis():
+    cache = TieredCache("test_local", ttl=60)
+    assert await cache.get("k") is MISS
+    await cache.set_many({"k": [1, 2], "none": None})
+    assert await cache.get_many(["k", "none", "other"]) == {"k": [1, 2], "none": None}
+    await cache.delete("k")
+    assert await cache.get("k") is MISS
+    assert cache.stats()["local_hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_tiered_cache_get_or_load_caches_negative_results():
+    cache = TieredCache("test_negative", ttl=60)
+    loads = 0
+
+    async def loader():
+        nonlocal loads
+        loads += 1
+        return None
+
+    assert await cache.get_or_load("missing", loader, negative_ttl=30) is None
+    assert await cache.get_or_load("missing", loader, negative_ttl=30) is None
+    assert loads == 1
+
+
+@pytest.mark.asyncio
+async def test_generation_bump_changes_scoped_keys():
+    cache = TieredCache("test_generations", ttl=60)
+    before = await cache.scoped_key("query", scopes=["public", "user:1"])
+    await cache.set(before, ["a"])
+    await cache.bump("user:1")
+    after = await cache.scoped_key("query", scopes=["public", "user:1"])
+    assert before != after
+    assert await cache.get(after) is MISS
@@ -32,3 +32,20 @@ async def test_index_and_search():
 
     # Cleanup
     await client.delete_document(test_id)
+
+@pytest.mark.asyncio
+async def test_msearch_and_get_embeddings():
+    client = ESClient()
+    test_id = "test_image_456"
+    test_embedding = [0.2] * 512
+    await client.index_image(test_id, test_embedding)
+
+    stored = await client.get_embedding(test_id)
+    assert stored is not None and len(stored) == 512
+
+    # One valid query and one with the wrong dimension
+    results = await client.msearch_similar([stored, [0.2] * 3], [5, 5])
+    assert test_id in results[0]
+    assert results[1] == []
+
+    await client.delete_document(test_id)
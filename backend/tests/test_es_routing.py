@@ -0,0 +1,176 @@
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+
+from app.elasticsearch.client import ESClient
+
+IMAGE = str(ObjectId.from_datetime(datetime(2025, 3, 14, tzinfo=timezone.utc)))
+OTHER = str(ObjectId.from_datetime(datetime(2025, 3, 15, tzinfo=timezone.utc)))
+
+LAYOUTS = [
+    # (partition_by, routed, index holding IMAGE)
+    (None, False, "media_v1"),
+    (None, True, "media_v1"),
+    ("month", False, "media_v1-2025.03"),
+    ("month", True, "media_v1-2025.03"),
+]
+
+
+class FakeIndices:
+    def __init__(self):
+        self.created = []
+
+    async def refresh(self, index):
+        pass
+
+    async def get(self, index):
+        return {index: {"mappings": {"properties": {}}, "aliases": {"media": {}},
+                        "settings": {"index": {"number_of_shards": "4", "uuid": "x"}}}}
+
+    async def create(self, index, mappings, settings, aliases):
+        self.created.append({"index": index, "settings": settings, "aliases": aliases})
+
+
+class FakeES:
+    """Records the write and read calls the client makes."""
+
+    def __init__(self, owners=None):
+        self.indices = FakeIndices()
+        self.owners = owners or {}
+        self.calls = []
+
+    async def index(self, **kwargs):
+        self.calls.append(("index", kwargs))
+
+    async def update(self, **kwargs):
+        self.calls.append(("update", kwargs))
+
+    async def delete(self, **kwargs):
+        self.calls.append(("delete", kwargs))
+
+    async def bulk(self, operations, **kwargs):
+        self.calls.append(("bulk", operations))
+        actions = operations[::2]
+        return {"items": [{op: {"status": 200}} for action in actions for op in action]}
+
+    async def mget(self, docs, source):
+        self.calls.append(("mget", docs))
+        return {"docs": [{**doc, "found": True, "_source": {"embedding": [1.0]}} for doc in docs]}
+
+    async def search(self, index, query, size, source):
+        # Owner lookup across every shard
+        self.calls.append(("search", index))
+        ids = query["ids"]["values"]
+        return {"hits": {"hits": [
+            {"_id": img_id, "_routing": self.owners[img_id], "_source": {"embedding": [1.0]}}
+            for img_id in ids if img_id in self.owners
+        ]}}
+
+
+def _client(partition_by, routed, owners=None) -> ESClient:
+    client = ESClient()
+    client.es = FakeES(owners)
+    client.alias, client.index_name = "media", "media_v1"
+    client.partition_by, client.routed = partition_by, routed
+    client._partitions = {"media_v1-2025.03"}
+    return client
+
+
+def _target(index, routing=None):
+    return {"index": index, "routing": routing} if routing else {"index": index}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("partition_by, routed, index", LAYOUTS)
+async def test_index_image_targets_partition_and_owner_shard(partition_by, routed, index):
+    client = _client(partition_by, routed)
+
+    await client.index_image(IMAGE, [1.0], title="t", owner_id="owner-1")
+    op, kwargs = client.es.calls[0]
+    assert op == "index"
+    assert {k: kwargs.get(k) for k in ("index", "routing")} == {"index": index, "routing": "owner-1" if routed else None}
+    assert kwargs["document"].get("owner_id") == ("owner-1" if routed else None)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("partition_by, routed, index", LAYOUTS)
+async def test_bulk_index_routes_each_document(partition_by, routed, index):
+    client = _client(partition_by, routed)
+
+    indexed = await client.bulk_index([
+        {"image_id": IMAGE, "embedding": [1.0], "owner_id": "owner-1"},
+        # No owner: spread by its own id
+        {"image_id": OTHER, "embedding": [1.0]},
+    ])
+    assert indexed == 2
+    _, operations = client.es.calls[0]
+    actions = [op["index"] for op in operations[::2]]
+    expected = [{"_index": index, "_id": IMAGE}, {"_index": index, "_id": OTHER}]
+    if routed:
+        expected[0]["routing"], expected[1]["routing"] = "owner-1", OTHER
+    assert actions == expected
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("partition_by, routed, index", LAYOUTS)
+async def test_update_and_delete_with_known_owner_skip_the_lookup(partition_by, routed, index):
+    client = _client(partition_by, routed)
+
+    await client.update_metadata(IMAGE, "t", None, ["tag"], owner_id="owner-1")
+    await client.delete_document(IMAGE, owner_id="owner-1")
+    expected = _target(index, "owner-1" if routed else None)
+    (update, update_kwargs), (delete, delete_kwargs) = client.es.calls
+    assert (update, delete) == ("update", "delete")
+    assert {k: v for k, v in update_kwargs.items() if k in ("index", "routing")} == expected
+    assert {k: v for k, v in delete_kwargs.items() if k in ("index", "routing")} == expected
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("partition_by, search_index", [(None, "media_v1"), ("month", "media_v1,media_v1-*")])
+async def test_unknown_owner_is_looked_up_then_falls_back_to_the_id(partition_by, search_index):
+    client = _client(partition_by, routed=True, owners={IMAGE: "owner-1"})
+
+    await client.delete_document(IMAGE)
+    # Not found by the lookup: written with its own id as routing, like bulk_index does
+    await client.bulk_update_metadata([{"image_id": IMAGE, "title": "t"}, {"image_id": OTHER, "title": "u"}])
+
+    calls = client.es.calls
+    assert calls[0] == ("search", search_index)
+    assert calls[1][0] == "delete" and calls[1][1]["routing"] == "owner-1"
+    assert calls[2] == ("search", search_index)
+    _, operations = calls[3]
+    assert [op["update"]["routing"] for op in operations[::2]] == ["owner-1", OTHER]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("partition_by, routed, index", LAYOUTS)
+async def test_get_embedding_reads_partition_and_owner_shard(partition_by, routed, index):
+    client = _client(partition_by, routed)
+
+    assert await client.get_embedding(IMAGE, owner_id="owner-1") == [1.0]
+    op, docs = client.es.calls[0]
+    expected = {"_index": index, "_id": IMAGE}
+    if routed:
+        expected["routing"] = "owner-1"
+    assert (op, docs) == ("mget", [expected])
+
+
+@pytest.mark.asyncio
+async def test_routed_get_without_owner_searches_every_shard():
+    client = _client("month", routed=True, owners={IMAGE: "owner-1"})
+
+    assert await client.get_embeddings([IMAGE, OTHER]) == {IMAGE: [1.0]}
+    assert client.es.calls == [("search", "media_v1,media_v1-*")]
+
+
+@pytest.mark.asyncio
+async def test_first_write_to_a_period_creates_its_partition():
+    client = _client("month", routed=True)
+    new = str(ObjectId.from_datetime(datetime(2025, 4, 1, tzinfo=timezone.utc)))
+
+    await client.index_image(new, [1.0], owner_id="owner-1")
+    assert client.es.indices.created == [
+        {"index": "media_v1-2025.04", "settings": {"number_of_shards": "4"}, "aliases": {"media": {}}}
+    ]
+    assert client.es.calls[0][1]["index"] == "media_v1-2025.04"
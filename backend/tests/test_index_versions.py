@@ -0,0 +1,123 @@
+import copy
+
+import pytest
+
+from app.elasticsearch.client import ESClient
+
+MODEL = "openai/clip-vit-base-patch32"
+
+
+def _index(meta=None, dims=512, aliases=None):
+    mappings = {"properties": {"embedding": {"type": "dense_vector", "dims": dims}}}
+    if meta is not None:
+        mappings["_meta"] = meta
+    return {"mappings": mappings, "aliases": aliases or {}}
+
+
+class FakeIndices:
+    def __init__(self, indices):
+        self.indices = indices
+        self.put_mappings = []
+        self.alias_actions = None
+
+    async def get(self, index, **kwargs):
+        return copy.deepcopy(self.indices)
+
+    async def put_mapping(self, index, meta=None, properties=None):
+        self.put_mappings.append({"index": index, "meta": meta, "properties": properties})
+        if meta is not None:
+            self.indices[index]["mappings"]["_meta"] = meta
+
+    async def update_aliases(self, actions):
+        self.alias_actions = actions
+
+
+class FakeES:
+    def __init__(self, indices):
+        self.indices = FakeIndices(indices)
+
+
+def _client(indices, model=MODEL, dims=512) -> ESClient:
+    client = ESClient()
+    client.es = FakeES(indices)
+    client.alias = client.index_name = "media_embeddings"
+    client.model, client.embedding_dims = model, dims
+    client.pca_dims, client.partition_scheme, client.route_by_owner = 0, "", False
+    return client
+
+
+@pytest.mark.asyncio
+async def test_index_versions_groups_partitions_under_their_version():
+    client = _client({
+        "media_embeddings_v1": _index({"model": MODEL, "dims": 512}, aliases={"media_embeddings": {}}),
+        "media_embeddings_v2": _index({"model": MODEL, "dims": 512, "partition_by": "month"}),
+        "media_embeddings_v2-2025.02": _index({"model": MODEL, "dims": 512}),
+        "media_embeddings_v2-2025.01": _index({"model": MODEL, "dims": 512}),
+    })
+
+    versions = await client.index_versions()
+    assert sorted(versions) == ["media_embeddings_v1", "media_embeddings_v2"]
+    assert versions["media_embeddings_v1"]["live"] and not versions["media_embeddings_v2"]["live"]
+    assert versions["media_embeddings_v2"]["partition_by"] == "month"
+    assert versions["media_embeddings_v2"]["partitions"] == ["media_embeddings_v2-2025.01", "media_embeddings_v2-2025.02"]
+
+
+@pytest.mark.asyncio
+async def test_legacy_index_is_stamped_with_the_configured_model():
+    indices = {"media_embeddings": _index()}
+    client = _client(indices)
+
+    await client.create_index()
+    assert indices["media_embeddings"]["mappings"]["_meta"] == {"model": MODEL, "dims": 512}
+    assert client.index_name == "media_embeddings"
+
+    # Another model of the same dims is no longer served from it
+    other = _client(indices, model="laion/other-clip")
+    await other.create_index()
+    assert other.es.indices.put_mappings == []
+    assert not other._serves((await other.index_versions())["media_embeddings"], other.model, 512)
+
+
+@pytest.mark.asyncio
+async def test_legacy_index_of_other_dims_is_left_alone():
+    indices = {"media_embeddings": _index(dims=768)}
+    client = _client(indices)
+
+    await client.create_index()
+    assert "_meta" not in indices["media_embeddings"]["mappings"]
+    assert client.es.indices.put_mappings == []
+
+
+@pytest.mark.asyncio
+async def test_swap_alias_moves_partitions_and_drops_a_legacy_index():
+    client = _client({
+        "media_embeddings": _index({"model": MODEL, "dims": 512}),
+        "media_embeddings_v1": _index({"model": MODEL, "dims": 512, "partition_by": "year"},
+                                      aliases={"media_embeddings": {}}),
+        "media_embeddings_v1-2024": _index({"model": MODEL, "dims": 512}),
+        "media_embeddings_v2": _index({"model": MODEL, "dims": 512, "partition_by": "year"}),
+        "media_embeddings_v2-2025": _index({"model": MODEL, "dims": 512}),
+    })
+
+    await client.swap_alias("media_embeddings_v2")
+    assert client.es.indices.alias_actions == [
+        {"remove_index": {"index": "media_embeddings"}},
+        {"remove": {"index": "media_embeddings_v1", "alias": "media_embeddings"}},
+        {"remove": {"index": "media_embeddings_v1-2024", "alias": "media_embeddings", "must_exist": False}},
+        {"add": {"index": "media_embeddings_v2", "alias": "media_embeddings", "is_write_index": True}},
+        {"add": {"index": "media_embeddings_v2-2025", "alias": "media_embeddings"}},
+    ]
+
+
+def test_builds_requires_the_new_version_layout():
+    client = _client({})
+    version = {"model": MODEL, "dims": 512, "pca": None, "partition_by": None, "routing": None}
+
+    assert client.builds(version, MODEL, 512)
+    assert not client.builds({**version, "model": None}, MODEL, 512)
+    assert not client.builds({**version, "dims": 768}, MODEL, 512)
+    assert not client.builds({**version, "partition_by": "month"}, MODEL, 512)
+    assert not client.builds({**version, "routing": "owner_id"}, MODEL, 512)
+
+    client.partition_scheme, client.route_by_owner = "month", True
+    assert client.builds({**version, "partition_by": "month", "routing": "owner_id"}, MODEL, 512)
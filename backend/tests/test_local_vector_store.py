@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from app.util.vectors import normalize_rows, rank_exact
+from app.vectorstore.local import LocalVectorStore
+from app.vectorstore.store import VectorStore
+
+DIMS = 16
+
+
+def _vectors(n, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, DIMS)).astype(np.float32)
+
+
+async def _filled(path, n=200, **kwargs):
+    store = LocalVectorStore(path=str(path), dims=DIMS, **kwargs)
+    vectors = _vectors(n)
+    await store.bulk_index([{"image_id": f"img{i}", "embedding": v.tolist()} for i, v in enumerate(vectors)])
+    return store, vectors
+
+
+def test_is_a_vector_store(tmp_path):
+    assert isinstance(LocalVectorStore(path=str(tmp_path), dims=DIMS), VectorStore)
+
+
+@pytest.mark.asyncio
+async def test_search_matches_exact_ranking(tmp_path):
+    # Small blocks so the top-k is merged across blocks
+    store, vectors = await _filled(tmp_path, block_rows=32)
+    query = _vectors(1, seed=1)[0]
+
+    hits = await store.search_similar(query.tolist(), top_k=10, with_scores=True)
+    expected = rank_exact([f"img{i}" for i in range(len(vectors))], normalize_rows(vectors), query, 10)
+    assert [img_id for img_id, _ in hits] == [img_id for img_id, _ in expected]
+    assert np.allclose([s for _, s in hits], [s for _, s in expected], atol=1e-5)
+
+    ids = await store.search_similar(query.tolist(), top_k=10, min_score=hits[4][1])
+    assert ids == [img_id for img_id, _ in hits[:5]]
+
+
+@pytest.mark.asyncio
+async def test_search_page_continues_after_key(tmp_path):
+    store, vectors = await _filled(tmp_path, block_rows=32)
+    query = _vectors(1, seed=2)[0].tolist()
+    ranking = await store.search_similar(query, top_k=len(vectors), with_scores=True)
+
+    pages, after = [], None
+    while True:
+        hits, pit_id = await store.search_page(query, 30, after=after)
+        assert pit_id is None
+        pages.extend(hits)
+        if len(hits) < 30:
+            break
+        after = (hits[-1][1], hits[-1][0])
+    assert [img_id for img_id, _ in pages] == [img_id for img_id, _ in ranking]
+
+    hits, _ = await store.search_page(query, 5, min_score=ranking[2][1])
+    assert [img_id for img_id, _ in hits] == [img_id for img_id, _ in ranking[:3]]
+
+
+@pytest.mark.asyncio
+async def test_delete_reindex_and_reopen(tmp_path):
+    store, vectors = await _filled(tmp_path, n=20)
+    await store.delete_document("img3")
+    await store.index_image("img5", vectors[7].tolist())
+
+    assert "img3" not in await store.search_similar(vectors[3].tolist(), top_k=20)
+    assert (await store.search_similar(vectors[7].tolist(), top_k=2)) in (["img7", "img5"], ["img5", "img7"])
+    assert await store.get_embedding("img3") is None
+
+    reopened = LocalVectorStore(path=str(tmp_path), dims=DIMS)
+    assert reopened.stats()["vectors"] == 19
+    assert reopened.stats()["tombstones"] == 2
+    assert np.allclose(await reopened.get_embedding("img5"), normalize_rows(vectors[7:8])[0], atol=1e-6)
+
+    assert reopened.compact() == 19
+    assert reopened.stats()["tombstones"] == 0
+    # The first instance notices the rewritten files
+    assert (await store.search_similar(vectors[0].tolist(), top_k=1)) == ["img0"]
+
+
+@pytest.mark.asyncio
+async def test_msearch_and_dimension_mismatch(tmp_path):
+    store, vectors = await _filled(tmp_path, n=50)
+    results = await store.msearch_similar([vectors[1].tolist(), [0.1] * 3, vectors[2].tolist()], [1, 5, 3])
+    assert results[0] == ["img1"]
+    assert results[1] == []
+    assert len(results[2]) == 3 and results[2][0] == "img2"
+
+
+@pytest.mark.asyncio
+async def test_ivf_finds_clustered_neighbours(tmp_path):
+    rng = np.random.default_rng(2)
+    centers = rng.standard_normal((8, DIMS)).astype(np.float32) * 10
+    vectors = np.concatenate([c + rng.standard_normal((50, DIMS)).astype(np.float32) for c in centers])
+    store = LocalVectorStore(path=str(tmp_path), dims=DIMS, nprobe=2)
+    await store.bulk_index([{"image_id": f"img{i}", "embedding": v.tolist()} for i, v in enumerate(vectors)])
+
+    assert store.train_ivf(8) == len(vectors)
+    # Rows added after training are assigned to a partition too
+    await store.index_image("late", (centers[3] + 0.01).tolist())
+
+    hits = await store.search_similar(centers[3].tolist(), top_k=10)
+    expected = rank_exact(
+        [f"img{i}" for i in range(len(vectors))] + ["late"],
+        normalize_rows(np.concatenate([vectors, centers[3:4] + 0.01])),
+        centers[3], 10
+    )
+    assert hits == [img_id for img_id, _ in expected]
@@ -0,0 +1,49 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.routes import media
+from app.util.resilience import request_deadline
+
+
+class SlowStorage:
+    """Cloudinary stand-in whose upload outlives the request waiting for it."""
+
+    def __init__(self):
+        self.finished = threading.Event()
+        self.deleted = []
+
+    def upload_image(self, file_path, user_id, tags=None):
+        time.sleep(0.1)
+        self.finished.set()
+        return {"public_id": f"nexus/{user_id}/photo"}
+
+    def delete_image(self, public_id):
+        self.deleted.append(public_id)
+        return {"result": "ok"}
+
+
+@pytest.mark.asyncio
+async def test_upload_abandoned_at_the_deadline_is_deleted(monkeypatch):
+    storage = SlowStorage()
+    monkeypatch.setattr(media, "cloudinary_service", storage)
+
+    with request_deadline(time.monotonic() + 0.02):
+        with pytest.raises(TimeoutError):
+            await media._store_upload(file_path="/tmp/photo.png", user_id="u1", tags=[])
+
+    await asyncio.gather(*media._abandoned_uploads)
+    assert storage.finished.is_set()
+    assert storage.deleted == ["nexus/u1/photo"]
+
+
+@pytest.mark.asyncio
+async def test_completed_upload_is_kept(monkeypatch):
+    storage = SlowStorage()
+    monkeypatch.setattr(media, "cloudinary_service", storage)
+
+    result = await media._store_upload(file_path="/tmp/photo.png", user_id="u1", tags=[])
+    assert result["public_id"] == "nexus/u1/photo"
+    assert storage.deleted == []
@@ -0,0 +1,103 @@
+from datetime import datetime
+from typing import Dict, List
+
+import pytest
+
+from app.config import settings
+from app.models.neighbors import SCORE_SCALE, Neighbors
+from app.repositories.neighborrepository import NeighborRepository
+from app.services.neighborservice import NeighborService
+
+
+def _list(media_id: str, ids: List[str], scores: List[float], top_k: int = 3) -> Neighbors:
+    # model_construct: the Beanie document isn't bound to a database here
+    return Neighbors.model_construct(
+        media_id=media_id, neighbor_ids=ids, scores=scores, score_scale=SCORE_SCALE, top_k=top_k,
+        model="clip", computed_at=datetime.utcnow()
+    )
+
+
+class MemoryNeighborRepository:
+    def __init__(self, lists: List[Neighbors]):
+        self.lists: Dict[str, Neighbors] = {n.media_id: n for n in lists}
+
+    async def find_many(self, media_ids):
+        return {m: self.lists[m] for m in media_ids if m in self.lists}
+
+    async def find_containing(self, media_id):
+        return [n for n in self.lists.values() if media_id in n.neighbor_ids]
+
+    async def upsert_many(self, lists):
+        self.lists.update({n.media_id: n for n in lists})
+
+    async def delete(self, media_id):
+        self.lists.pop(media_id, None)
+
+
+def _service(lists: List[Neighbors], own: Neighbors = None) -> NeighborService:
+    service = NeighborService(vector_store=object())
+    service.repo = MemoryNeighborRepository(lists)
+
+    async def search(media_ids):
+        return [own] if own else []
+
+    service._search = search
+    return service
+
+
+@pytest.mark.asyncio
+async def test_add_image_inserts_by_score_and_truncates():
+    service = _service(
+        [
+            _list("a", ["x", "y", "z"], [0.9, 0.7, 0.6]),
+            _list("b", ["x", "y"], [0.95, 0.9]),
+            _list("c", ["x", "y", "z"], [0.99, 0.98, 0.97]),
+        ],
+        own=_list("new", ["a", "b", "c"], [0.8, 0.5, 0.9]),
+    )
+
+    await service.add_image("new", public=True)
+    lists = service.repo.lists
+    # Ranked between x and y, z falls off the full list
+    assert lists["a"].neighbor_ids == ["x", "new", "y"]
+    assert lists["a"].scores == [0.9, 0.8, 0.7]
+    # Room left: appended after weaker-than-itself neighbours
+    assert lists["b"].neighbor_ids == ["x", "y", "new"]
+    # Full list whose last score beats it is left alone
+    assert lists["c"].neighbor_ids == ["x", "y", "z"]
+    assert lists["new"].neighbor_ids == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_private_upload_gets_no_list_of_its_own():
+    service = _service([_list("a", ["x"], [0.9])], own=_list("new", ["a"], [0.95]))
+
+    await service.add_image("new", public=False)
+    assert "new" not in service.repo.lists
+    assert service.repo.lists["a"].neighbor_ids == ["new", "x"]
+
+
+@pytest.mark.asyncio
+async def test_remove_image_strips_it_from_other_lists():
+    service = _service([
+        _list("gone", ["a"], [0.9]),
+        _list("a", ["x", "gone", "y"], [0.9, 0.8, 0.7]),
+        _list("b", ["x"], [0.9]),
+    ])
+
+    await service.remove_image("gone")
+    lists = service.repo.lists
+    assert "gone" not in lists
+    assert lists["a"].neighbor_ids == ["x", "y"]
+    assert lists["a"].scores == [0.9, 0.7]
+    assert lists["b"].neighbor_ids == ["x"]
+
+
+def test_lists_without_the_current_score_scale_are_stale(monkeypatch):
+    monkeypatch.setattr(settings, "DEFAULT_CLIP_MODEL", "clip")
+    current = _list("a", ["x"], [0.9])
+    legacy = _list("b", ["x"], [0.8])
+    legacy.score_scale = None
+
+    assert NeighborRepository.is_fresh(current)
+    assert not NeighborRepository.is_fresh(legacy)
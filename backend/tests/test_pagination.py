@@ -0,0 +1,50 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.util.pagination import (
+    encode_cursor, decode_cursor, keyset_filter, InvalidCursor,
+    SearchCursor, encode_search_cursor, decode_search_cursor,
+)
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 12, 11, 12, 0, 0, 123456)
+    doc_id = ObjectId()
+    cursor = encode_cursor(created_at, doc_id)
+    assert decode_cursor(cursor) == (created_at, doc_id)
+
+
+def test_cursor_without_created_at():
+    doc_id = ObjectId()
+    cursor = encode_cursor(None, doc_id)
+    assert keyset_filter(cursor) == {"created_at": None, "_id": {"$lt": doc_id}}
+
+
+def test_keyset_filter_includes_undated_documents():
+    created_at = datetime(2025, 12, 11)
+    doc_id = ObjectId()
+    clauses = keyset_filter(encode_cursor(created_at, doc_id))["$or"]
+    assert {"created_at": {"$lt": created_at}} in clauses
+    assert {"created_at": created_at, "_id": {"$lt": doc_id}} in clauses
+    assert {"created_at": None} in clauses
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", "eyJ4IjoxfQ"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_search_cursor_round_trip():
+    cursor = SearchCursor("q_abc", 200, (0.6123456789, "507f1f77bcf86cd799439011"), "pit-id==")
+    assert decode_search_cursor(encode_search_cursor(cursor)) == cursor
+    fresh = SearchCursor("q_abc", 0, None, None)
+    assert decode_search_cursor(encode_search_cursor(fresh)) == fresh
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", encode_cursor(None, ObjectId())])
+def test_invalid_search_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_search_cursor(cursor)
@@ -0,0 +1,22 @@
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from app.util.partitions import partition_of, recent_partitions
+
+
+def test_partition_follows_upload_time():
+    image_id = str(ObjectId.from_datetime(datetime(2025, 3, 14, tzinfo=timezone.utc)))
+
+    assert partition_of("media_v2", image_id, "month") == "media_v2-2025.03"
+    assert partition_of("media_v2", image_id, "year") == "media_v2-2025"
+    assert partition_of("media_v2", image_id, None) == "media_v2"
+    # Ids that aren't ObjectIds carry no time and stay in the version's own index
+    assert partition_of("media_v2", "test_image_123", "month") == "media_v2"
+
+
+def test_recent_partitions_cross_year():
+    now = datetime(2025, 2, 10, tzinfo=timezone.utc)
+
+    assert recent_partitions("media_v2", "month", 3, now) == ["media_v2-2025.02", "media_v2-2025.01", "media_v2-2024.12"]
+    assert recent_partitions("media_v2", "year", 2, now) == ["media_v2-2025", "media_v2-2024"]
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.auth.passwordhasher import PasswordHasher
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify():
+    hasher = PasswordHasher(workers=1, memory_cost=8192)
+    try:
+        hashed = await hasher.hash("secret")
+        assert await hasher.verify("secret", hashed)
+        assert not await hasher.verify("wrong", hashed)
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_outdated_hash_is_rehashed():
+    old = PasswordHasher(workers=1, memory_cost=4096)
+    new = PasswordHasher(workers=1, memory_cost=8192)
+    try:
+        hashed = await old.hash("secret")
+        valid, new_hash = await new.verify_and_update("secret", hashed)
+        assert valid
+        assert new_hash is not None and "m=8192" in new_hash
+    finally:
+        old.shutdown()
+        new.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_saturated_pool_sheds_load():
+    hasher = PasswordHasher(workers=1, max_pending=2, memory_cost=8192)
+    try:
+        results = await asyncio.gather(*[hasher.hash("secret") for _ in range(4)], return_exceptions=True)
+        shed = [r for r in results if isinstance(r, HTTPException)]
+        assert len(shed) == 2
+        assert all(r.status_code == 503 for r in shed)
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_existing_hashes_are_not_rehashed_by_default():
+    # Hashes stored before the pool existed came from passlib's defaults
+    legacy = CryptContext(schemes=["argon2"], deprecated="auto").hash("secret")
+    hasher = PasswordHasher(workers=1)
+    try:
+        assert await hasher.verify_and_update("secret", legacy) == (True, None)
+    finally:
+        hasher.shutdown()
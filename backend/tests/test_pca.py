@@ -0,0 +1,42 @@
+import numpy as np
+
+from app.util.pca import PCAProjection, two_stage_rank
+from app.util.vectors import normalize_rows, rank_exact
+
+
+def _low_rank(n, dims=64, rank=8, seed=0):
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((rank, dims))
+    return (rng.standard_normal((n, rank)) @ basis + 0.05 * rng.standard_normal((n, dims))).astype(np.float32)
+
+
+def test_fit_and_project():
+    vectors = _low_rank(500)
+    projection = PCAProjection.fit(vectors, 8, "test/model")
+
+    short = projection.project(vectors)
+    assert short.shape == (500, 8)
+    assert np.allclose(np.linalg.norm(short, axis=1), 1.0, atol=1e-5)
+    assert projection.explained > 0.95
+
+
+def test_save_and_load_keep_fingerprint(tmp_path):
+    projection = PCAProjection.fit(_low_rank(100), 4, "test/model")
+    loaded = PCAProjection.load(projection.save(str(tmp_path / "pca.npz")))
+
+    assert loaded.fingerprint == projection.fingerprint
+    assert loaded.model == "test/model"
+    assert np.allclose(loaded.project(_low_rank(3, seed=1)), projection.project(_low_rank(3, seed=1)))
+
+
+def test_two_stage_rank_recovers_exact_top_k():
+    vectors = _low_rank(1000)
+    ids = [f"img{i}" for i in range(len(vectors))]
+    projection = PCAProjection.fit(vectors, 8, "test/model")
+    matrix, short = normalize_rows(vectors), projection.project(vectors)
+
+    query = _low_rank(1, seed=2)[0]
+    hits = two_stage_rank(ids, matrix, short, query, projection.project([query])[0], 10, 80)
+    expected = rank_exact(ids, matrix, query, 10)
+    assert [img_id for img_id, _ in hits] == [img_id for img_id, _ in expected]
+    assert np.allclose([s for _, s in hits], [s for _, s in expected])
@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+import pytest
+
+from app.util.resilience import CircuitBreaker, CircuitOpen, LatencyWindow, hedged, request_deadline
+
+
+async def _fail():
+    raise ConnectionError("down")
+
+
+async def _ok():
+    return "ok"
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_and_recovers():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_after=0.05)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            await breaker.call(_fail)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen):
+        await breaker.call(_ok)
+
+    await asyncio.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert await breaker.call(_ok) == "ok"
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_breaker_ignores_non_failures_and_times_out():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_after=10, is_failure=lambda e: not isinstance(e, KeyError))
+
+    async def rejected():
+        raise KeyError("bad request")
+
+    with pytest.raises(KeyError):
+        await breaker.call(rejected)
+    assert breaker.state == "closed"
+
+    with pytest.raises(TimeoutError):
+        await breaker.call(lambda: asyncio.sleep(1), timeout=0.01)
+    assert breaker.state == "open"
+
+
+@pytest.mark.asyncio
+async def test_breaker_ignores_timeouts_of_an_exhausted_request_budget():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_after=10)
+
+    # Most of the budget went on queueing: the call gets 10 ms of its 1 s
+    with request_deadline(time.monotonic() + 0.01):
+        with pytest.raises(TimeoutError):
+            await breaker.call(lambda: asyncio.sleep(1), timeout=1.0)
+    assert breaker.state == "closed"
+    assert breaker.stats()["budget_timeouts"] == 1
+
+    # With its full timeout available, timing out is the dependency's fault
+    with request_deadline(time.monotonic() + 5):
+        with pytest.raises(TimeoutError):
+            await breaker.call(lambda: asyncio.sleep(1), timeout=0.01)
+    assert breaker.state == "open"
+
+
+@pytest.mark.asyncio
+async def test_hedged_returns_first_answer():
+    calls = []
+
+    async def attempt(n):
+        calls.append(n)
+        await asyncio.sleep(0.2 if n == 0 else 0.01)
+        return n
+
+    assert await hedged(attempt, delay=0.02) == 1
+    assert calls == [0, 1]
+
+    calls.clear()
+    assert await hedged(attempt, delay=None) == 0
+    assert calls == [0]
+
+
+def test_latency_window_percentile():
+    window = LatencyWindow(size=100, min_samples=10)
+    for ms in range(5):
+        window.record(ms / 1000)
+    assert window.percentile(0.95) is None
+    for ms in range(5, 100):
+        window.record(ms / 1000)
+    assert window.percentile(0.95) == pytest.approx(0.095)
@@ -0,0 +1,136 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.cache.search_cache import invalidate_collection, invalidate_media, result_scopes, search_cache
+from app.cache.tiered import MISS
+from app.routes import use
+from app.services.searchservice import SearchService
+from app.util.resilience import is_partial, mark_partial, track_partial
+
+
+def _result(image_id, owner, visibility):
+    return {"id": image_id, "ownerId": owner, "visibility": visibility}
+
+
+RESULTS = [
+    _result("mine-public", "u1", "public"),
+    _result("mine-private", "u1", "private"),
+    _result("theirs-public", "u2", "public"),
+    _result("theirs-private", "u2", "private"),
+]
+
+
+def test_result_scopes():
+    assert result_scopes("public", "u1") == ["public"]
+    assert result_scopes("private", "u1") == ["user:u1"]
+    assert result_scopes("all", "u1", "c1") == ["public", "user:u1", "collection:c1"]
+
+
+@pytest.mark.asyncio
+async def test_media_change_invalidates_scoped_entries():
+    private_key = await search_cache.scoped_key("q:private", result_scopes("private", "u1"))
+    public_key = await search_cache.scoped_key("q:public", result_scopes("public", "u1"))
+    await search_cache.set(private_key, ["mine-private"])
+    await search_cache.set(public_key, ["theirs-public"])
+
+    # Made private: the owner's scope changes, public results are untouched
+    await invalidate_media("u1", ["private"])
+    assert await search_cache.scoped_key("q:private", result_scopes("private", "u1")) != private_key
+    assert await search_cache.scoped_key("q:public", result_scopes("public", "u1")) == public_key
+
+    await invalidate_media("u1", ["private", "public"])
+    assert await search_cache.scoped_key("q:public", result_scopes("public", "u1")) != public_key
+
+
+@pytest.mark.asyncio
+async def test_collection_change_invalidates_collection_entries():
+    key = await search_cache.scoped_key("q", result_scopes("public", "u1", "c1"))
+    await search_cache.set(key, ["a"])
+    await invalidate_collection("c1")
+    new_key = await search_cache.scoped_key("q", result_scopes("public", "u1", "c1"))
+    assert new_key != key
+    assert await search_cache.get(new_key) is MISS
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("scope, expected", [
+    ("public", ["mine-public", "theirs-public"]),
+    ("private", ["mine-public", "mine-private"]),
+    ("all", ["mine-public", "mine-private", "theirs-public"]),
+])
+async def test_filter_results_by_scope(scope, expected):
+    filtered = await SearchService().filter_results(RESULTS, scope, "u1")
+    assert [r["id"] for r in filtered] == expected
+
+
+class ShardTimeoutStore:
+    """Vector store whose similarity search misses a shard."""
+
+    def __init__(self):
+        self.searches = 0
+
+    async def search_similar(self, query_embedding, top_k, min_score=None, with_scores=False):
+        self.searches += 1
+        await asyncio.sleep(0.01)
+        mark_partial("elasticsearch")
+        return [("theirs-public", 0.9)]
+
+
+@pytest.mark.asyncio
+async def test_coalesced_partial_search_is_neither_cached_nor_reported_complete():
+    service = SearchService()
+    service.vector_store = ShardTimeoutStore()
+
+    async def text_embedding(query):
+        return [1.0, 0.0]
+
+    async def hydrate_hits(hits):
+        return [{**_result(img_id, "u2", "public"), "similarityScore": score} for img_id, score in hits]
+
+    service.text_embedding = text_embedding
+    service._hydrate_hits = hydrate_hits
+
+    async def search():
+        with track_partial():
+            results = await service.search_text_scoped("partial shards", "public", "u1", top_k=5, retrieval="vector")
+            return results, is_partial()
+
+    outcomes = await asyncio.gather(*[search() for _ in range(3)])
+    assert service.vector_store.searches == 1
+    assert all(partial for _, partial in outcomes)
+
+    # Not cached: the next request searches again
+    await search()
+    assert service.vector_store.searches == 2
+
+
+class RankedStore:
+    """Vector store ranking every test result, best first."""
+
+    async def search_similar(self, query_embedding, top_k, min_score=None, with_scores=False):
+        return [(r["id"], 0.9) for r in RESULTS][:top_k]
+
+
+@pytest.mark.asyncio
+async def test_similar_stream_hides_other_users_private_media(monkeypatch):
+    async def media_embedding(media_id):
+        return [1.0, 0.0]
+
+    async def hydrate_hits(hits):
+        by_id = {r["id"]: r for r in RESULTS}
+        return [{**by_id[img_id], "similarityScore": score} for img_id, score in hits]
+
+    monkeypatch.setattr(use.search_service, "vector_store", RankedStore())
+    monkeypatch.setattr(use.search_service, "media_embedding", media_embedding)
+    monkeypatch.setattr(use.search_service, "_hydrate_hits", hydrate_hits)
+
+    response = await use.find_similar_stream(
+        media_id="source", top_k=10, chunk_size=2, format="ndjson", min_score=None,
+        current_user=SimpleNamespace(id="u1")
+    )
+    events = [json.loads(line) async for line in response.body_iterator]
+    streamed = [item["id"] for event in events if event["event"] == "results" for item in event["items"]]
+    assert streamed == ["mine-public", "mine-private", "theirs-public"]
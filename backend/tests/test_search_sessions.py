@@ -0,0 +1,124 @@
+import io
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.routes import use
+from app.routes.use import _require_upload, _search_params
+from app.services.searchservice import SearchService
+from app.util.pagination import InvalidCursor, SearchCursor, encode_search_cursor
+
+TEXT = _search_params("text", "red car", "public", None, None, retrieval="vector")
+
+
+def _service():
+    service = SearchService()
+
+    async def hydrate_hits(hits):
+        return [{"id": img_id, "similarityScore": score, "visibility": "public", "ownerId": "u2"} for img_id, score in hits]
+
+    service._hydrate_hits = hydrate_hits
+    return service
+
+
+def _search(ids):
+    calls = []
+
+    async def run_search():
+        calls.append(1)
+        return [{"id": img_id, "similarityScore": 0.9, "visibility": "public", "ownerId": "u2"} for img_id in ids]
+
+    return run_search, calls
+
+
+@pytest.mark.asyncio
+async def test_same_search_pages_through_its_session():
+    service = _service()
+    run_search, calls = _search(["a", "b", "c"])
+
+    items, total, query_id, _ = await service.ranked_page(None, "u1", "public", 1, 2, run_search, search=TEXT)
+    assert [r["id"] for r in items] == ["a", "b"] and total == 3
+
+    items, _, same_id, _ = await service.ranked_page(query_id, "u1", "public", 2, 2, run_search, search=TEXT)
+    assert [r["id"] for r in items] == ["c"]
+    assert same_id == query_id
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("user_id, search", [
+    ("u2", TEXT),
+    ("u1", {**TEXT, "scope": "all"}),
+    ("u1", {**TEXT, "query": "blue car"}),
+    ("u1", {**TEXT, "min_score": 0.8}),
+    ("u1", {**TEXT, "endpoint": "image"}),
+])
+async def test_query_id_of_another_search_starts_a_new_one(user_id, search):
+    service = _service()
+    first, _ = _search(["a", "b"])
+    _, _, query_id, _ = await service.ranked_page(None, "u1", "public", 1, 2, first, search=TEXT)
+
+    second, calls = _search(["x", "y"])
+    items, _, new_id, _ = await service.ranked_page(query_id, user_id, search["scope"], 2, 2, second, search=search)
+    assert len(calls) == 1
+    assert new_id != query_id
+    assert items == []
+
+
+@pytest.mark.asyncio
+async def test_image_pages_without_the_upload_reuse_the_session():
+    service = _service()
+    image = _search_params("image", "digest-1", "public", None, None)
+    run_search, calls = _search(["a", "b", "c"])
+    _, _, query_id, _ = await service.ranked_page(None, "u1", "public", 1, 2, run_search, search=image)
+
+    _, _, same_id, _ = await service.ranked_page(
+        query_id, "u1", "public", 2, 2, run_search, search={**image, "query": None}
+    )
+    assert same_id == query_id and len(calls) == 1
+
+    _, _, new_id, _ = await service.ranked_page(
+        query_id, "u1", "public", 2, 2, run_search, search={**image, "query": "digest-2"}
+    )
+    assert new_id != query_id and len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_cursor_of_another_search_is_rejected():
+    service = _service()
+    run_search, _ = _search(["a"])
+    _, _, query_id, _ = await service.ranked_page(None, "u1", "public", 1, 2, run_search, search=TEXT)
+    cursor = encode_search_cursor(SearchCursor(query_id, 1, (0.9, "a"), None))
+
+    with pytest.raises(InvalidCursor):
+        await service.continue_page(cursor, "u1", "all", 2, search={**TEXT, "scope": "all"})
+
+
+def test_image_search_needs_an_upload_or_a_session():
+    with pytest.raises(HTTPException) as missing:
+        _require_upload(None, None, None)
+    assert missing.value.status_code == 400
+
+    _require_upload(None, "q_1", None)
+    _require_upload(None, None, "cursor")
+
+
+@pytest.mark.asyncio
+async def test_composite_of_opposite_vectors_is_a_bad_request(monkeypatch):
+    async def text_embedding(query):
+        return [1.0, 0.0]
+
+    async def image_embedding(image_file):
+        return [-1.0, 0.0]
+
+    monkeypatch.setattr(use.search_service, "text_embedding", text_embedding)
+    monkeypatch.setattr(use.search_service, "image_embedding", image_embedding)
+
+    with pytest.raises(HTTPException) as rejected:
+        await use.search_composite(
+            query="opposite", file=UploadFile(io.BytesIO(b"image"), filename="q.png"), text_weight=0.5,
+            scope="public", collection_id=None, page=1, page_size=20, query_id=None, cursor=None,
+            min_score=None, current_user=SimpleNamespace(id="u1")
+        )
+    assert rejected.value.status_code == 400
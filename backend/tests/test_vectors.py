@@ -0,0 +1,58 @@
+import base64
+
+import numpy as np
+import pytest
+
+from app.util.vectors import (
+    encode_vector, decode_vector, combine_vectors, normalize_rows, rank_exact, InvalidVector
+)
+
+
+def test_vector_round_trip():
+    vector = np.random.rand(512).astype(np.float32)
+    assert decode_vector(encode_vector(vector), 512) == pytest.approx(vector.tolist())
+
+
+def test_vector_dimension_mismatch():
+    with pytest.raises(InvalidVector):
+        decode_vector(encode_vector([0.5] * 256), 512)
+
+
+@pytest.mark.parametrize("encoded", [
+    "not base64!",
+    encode_vector([float("nan")] + [0.1] * 511),
+    encode_vector([0.0] * 512),
+    base64.b64encode(b"\x00" * 2047).decode(),
+])
+def test_invalid_vectors(encoded):
+    with pytest.raises(InvalidVector):
+        decode_vector(encoded, 512)
+
+
+def test_combine_vectors_weights_normalized_inputs():
+    text = [10.0, 0.0]
+    image = [0.0, 0.5]
+    combined = combine_vectors([text, image], [0.5, 0.5])
+    # Equal weights after normalization, regardless of the input norms
+    assert combined == pytest.approx([2 ** -0.5, 2 ** -0.5])
+    assert combine_vectors([text, image], [1.0, 0.0]) == pytest.approx([1.0, 0.0])
+
+
+def test_rank_exact_matches_brute_force():
+    rng = np.random.default_rng(0)
+    matrix = normalize_rows(rng.standard_normal((300, 16)).astype(np.float32))
+    ids = [f"m{i}" for i in range(300)]
+    query = rng.standard_normal(16)
+
+    hits = rank_exact(ids, matrix, query, top_k=10)
+
+    scores = (matrix @ (query / np.linalg.norm(query)) + 1) / 2
+    expected = [ids[i] for i in np.argsort(-scores)[:10]]
+    assert [img_id for img_id, _ in hits] == expected
+    assert all(a[1] >= b[1] for a, b in zip(hits, hits[1:]))
+
+
+def test_rank_exact_min_score():
+    matrix = normalize_rows(np.array([[1, 0], [0, 1], [-1, 0]], dtype=np.float32))
+    hits = rank_exact(["a", "b", "c"], matrix, [1, 0], top_k=10, min_score=0.5)
+    assert hits == [("a", pytest.approx(1.0)), ("b", pytest.approx(0.5))]
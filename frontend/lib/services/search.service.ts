@@ -3,12 +3,15 @@
  * Handles text and image-based search
  */
 
-import { get, post } from '../utils/api-client';
+import { get, post, streamNdjson } from '../utils/api-client';
 import type {
   SearchTextRequest,
   SearchImageRequest,
-  PaginatedResponse,
-  MediaItemResponse,
+  SearchCompositeRequest,
+  PaginatedSearchResponse,
+  BatchSearchRequest,
+  BatchSearchResponse,
+  SearchStreamEvent,
   SearchScope,
 } from '../types/api';
 
@@ -16,23 +19,27 @@ class SearchService {
   /**
    * Search by text query
    */
-  async searchByText(request: SearchTextRequest): Promise<PaginatedResponse<MediaItemResponse>> {
+  async searchByText(request: SearchTextRequest): Promise<PaginatedSearchResponse> {
     const params = new URLSearchParams();
     params.append('query', request.query);
     if (request.scope) params.append('scope', request.scope);
     if (request.collectionId) params.append('collection_id', request.collectionId);
     if (request.page) params.append('page', request.page.toString());
     if (request.pageSize) params.append('page_size', request.pageSize.toString());
+    if (request.queryId) params.append('query_id', request.queryId);
+    if (request.cursor) params.append('cursor', request.cursor);
+    if (request.minScore !== undefined) params.append('min_score', request.minScore.toString());
+    if (request.retrieval) params.append('retrieval', request.retrieval);
 
     const endpoint = `/api/v1/use/search/text?${params.toString()}`;
 
-    return post<PaginatedResponse<MediaItemResponse>>(endpoint, undefined, { requireAuth: true });
+    return post<PaginatedSearchResponse>(endpoint, undefined, { requireAuth: true });
   }
 
   /**
    * Search by image upload
    */
-  async searchByImage(request: SearchImageRequest): Promise<PaginatedResponse<MediaItemResponse>> {
+  async searchByImage(request: SearchImageRequest): Promise<PaginatedSearchResponse> {
     const formData = new FormData();
     formData.append('file', request.file);
 
@@ -42,23 +49,76 @@ class SearchService {
     if (request.topK) params.append('top_k', request.topK.toString());
     if (request.page) params.append('page', request.page.toString());
     if (request.pageSize) params.append('page_size', request.pageSize.toString());
+    if (request.queryId) params.append('query_id', request.queryId);
+    if (request.cursor) params.append('cursor', request.cursor);
+    if (request.minScore !== undefined) params.append('min_score', request.minScore.toString());
 
     const endpoint = `/api/v1/use/search/image${params.toString() ? '?' + params.toString() : ''}`;
 
-    return post<PaginatedResponse<MediaItemResponse>>(endpoint, formData, { requireAuth: true });
+    return post<PaginatedSearchResponse>(endpoint, formData, { requireAuth: true });
+  }
+
+  /**
+   * Search by an image refined with text, fused into one vector query
+   */
+  async searchComposite(request: SearchCompositeRequest): Promise<PaginatedSearchResponse> {
+    const formData = new FormData();
+    if (request.file) formData.append('file', request.file);
+
+    const params = new URLSearchParams();
+    params.append('query', request.query);
+    if (request.textWeight !== undefined) params.append('text_weight', request.textWeight.toString());
+    if (request.scope) params.append('scope', request.scope);
+    if (request.collectionId) params.append('collection_id', request.collectionId);
+    if (request.page) params.append('page', request.page.toString());
+    if (request.pageSize) params.append('page_size', request.pageSize.toString());
+    if (request.queryId) params.append('query_id', request.queryId);
+    if (request.cursor) params.append('cursor', request.cursor);
+    if (request.minScore !== undefined) params.append('min_score', request.minScore.toString());
+
+    const endpoint = `/api/v1/use/search/composite?${params.toString()}`;
+
+    return post<PaginatedSearchResponse>(endpoint, formData, { requireAuth: true });
+  }
+
+  /**
+   * Stream text search results; onEvent receives stage timings and result
+   * chunks in rank order as soon as the server produces them
+   */
+  async searchByTextStream(
+    request: SearchTextRequest,
+    onEvent: (event: SearchStreamEvent) => void
+  ): Promise<void> {
+    const params = new URLSearchParams();
+    params.append('query', request.query);
+    if (request.scope) params.append('scope', request.scope);
+    if (request.collectionId) params.append('collection_id', request.collectionId);
+
+    const endpoint = `/api/v1/use/search/text/stream?${params.toString()}`;
+
+    return streamNdjson<SearchStreamEvent>(endpoint, onEvent, { method: 'GET', requireAuth: true });
+  }
+
+  /**
+   * Run several text and/or media-id searches in one request
+   */
+  async searchBatch(request: BatchSearchRequest): Promise<BatchSearchResponse> {
+    return post<BatchSearchResponse>('/api/v1/use/search/batch', request, { requireAuth: true });
   }
 
   /**
    * Find similar media to a given media item
    */
-  async findSimilar(mediaId: string, topK: number = 10, page: number = 1, pageSize: number = 20): Promise<PaginatedResponse<MediaItemResponse>> {
+  async findSimilar(mediaId: string, topK: number = 10, page: number = 1, pageSize: number = 20, queryId?: string, cursor?: string): Promise<PaginatedSearchResponse> {
     const params = new URLSearchParams();
     params.append('page', page.toString());
     params.append('page_size', pageSize.toString());
+    if (queryId) params.append('query_id', queryId);
+    if (cursor) params.append('cursor', cursor);
 
     const endpoint = `/api/v1/use/search/similar/${mediaId}${params.toString() ? '?' + params.toString() : ''}`;
 
-    return get<PaginatedResponse<MediaItemResponse>>(endpoint, { requireAuth: true });
+    return get<PaginatedSearchResponse>(endpoint, { requireAuth: true });
   }
 }
 
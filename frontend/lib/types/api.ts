@@ -15,6 +15,13 @@ export interface PaginatedResponse<T> {
   page: number;
   page_size: number;
   has_more: boolean;
+  next_cursor?: string | null;
+}
+
+export interface PaginatedSearchResponse extends PaginatedResponse<MediaItemResponse> {
+  queryId?: string;
+  searchTimeMs?: number;
+  partial?: boolean;
 }
 
 export interface MediaItemResponse {
@@ -44,6 +51,17 @@ export interface UploadResponse {
   thumbnailUrl: string;
 }
 
+export interface BatchSearchResponse {
+  results: { items: MediaItemResponse[]; total: number }[];
+  searchTimeMs?: number;
+}
+
+export type SearchStreamEvent =
+  | { event: 'stage'; stage: 'embed' | 'search'; ms: number; hits?: number }
+  | { event: 'results'; items: MediaItemResponse[] }
+  | { event: 'done'; total: number; ms: number }
+  | { event: 'error'; status: number; detail: string };
+
 export interface SearchResponse {
   queryId: string;
   items: MediaItemResponse[];
@@ -105,12 +123,18 @@ export interface UploadMediaRequest {
   visibility?: 'public' | 'private';
 }
 
+export type SearchRetrieval = 'vector' | 'rrf' | 'linear';
+
 export interface SearchTextRequest {
   query: string;
   scope?: SearchScope;
   collectionId?: string;
   page?: number;
   pageSize?: number;
+  queryId?: string;
+  cursor?: string;
+  minScore?: number;
+  retrieval?: SearchRetrieval;
 }
 
 export interface SearchImageRequest {
@@ -120,6 +144,33 @@ export interface SearchImageRequest {
   topK?: number;
   page?: number;
   pageSize?: number;
+  queryId?: string;
+  cursor?: string;
+  minScore?: number;
+}
+
+export interface SearchCompositeRequest {
+  query: string;
+  file?: File;
+  textWeight?: number;
+  scope?: SearchScope;
+  collectionId?: string;
+  page?: number;
+  pageSize?: number;
+  queryId?: string;
+  cursor?: string;
+  minScore?: number;
+}
+
+export interface BatchSearchQuery {
+  text?: string;
+  media_id?: string;
+  top_k?: number;
+}
+
+export interface BatchSearchRequest {
+  queries: BatchSearchQuery[];
+  scope?: SearchScope;
 }
 
 export interface CreateCollectionRequest {
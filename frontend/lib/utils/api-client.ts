@@ -181,6 +181,47 @@ export async function apiRequest<T = any>(
   }
 }
 
+/**
+ * Make a request to an NDJSON streaming endpoint and call onEvent for each line
+ * as it arrives. Resolves when the stream ends.
+ */
+export async function streamNdjson<T = any>(
+  endpoint: string,
+  onEvent: (event: T) => void,
+  options: RequestOptions = {}
+): Promise<void> {
+  const { requireAuth = false, headers = {}, ...fetchOptions } = options;
+  const url = endpoint.startsWith('http') ? endpoint : `${API_BASE_URL}${endpoint}`;
+
+  const requestHeaders: Record<string, string> = { ...headers as Record<string, string> };
+  if (requireAuth) {
+    const token = getAccessToken();
+    if (token) {
+      requestHeaders['Authorization'] = `Bearer ${token}`;
+    }
+  }
+
+  const response = await fetch(url, { ...fetchOptions, headers: requestHeaders });
+  if (!response.ok || !response.body) {
+    throw new ApiError(await extractErrorMessage(response), response.status);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop() ?? '';
+    for (const line of lines) {
+      if (line.trim()) onEvent(JSON.parse(line) as T);
+    }
+  }
+  if (buffer.trim()) onEvent(JSON.parse(buffer) as T);
+}
+
 /**
  * Extract error message from response
  */